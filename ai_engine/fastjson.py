@@ -0,0 +1,57 @@
+"""
+Pluggable JSON serialization for the AI engine.
+
+Uses orjson when it is installed and falls back to the stdlib ``json``
+module otherwise. Set ``JSON_BACKEND`` to ``orjson`` or ``json`` to force
+a backend.
+"""
+
+import json
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi.responses import JSONResponse
+
+from .utils import get_env_var
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# orjson.JSONDecodeError subclasses this, so callers can catch one type
+JSONDecodeError = json.JSONDecodeError
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+BACKENDS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[Any], Any]]] = {
+    "json": (_stdlib_dumps, json.loads),
+}
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+
+def get_backend(name: str = None) -> Tuple[Callable[[Any], bytes], Callable[[Any], Any]]:
+    """Return the (dumps, loads) pair for a backend name"""
+    name = name or get_env_var("JSON_BACKEND", "auto")
+    if name == "auto":
+        name = "orjson" if "orjson" in BACKENDS else "json"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable JSON backend: {name}")
+    return BACKENDS[name]
+
+dumps, loads = get_backend()
+
+def dumps_str(obj: Any) -> str:
+    """Serialize to a str, for APIs that require text"""
+    return dumps(obj).decode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the configured JSON backend"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -3,9 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import asyncio
-import json
 from contextlib import asynccontextmanager
 
+from .fastjson import FastJSONResponse, dumps_str, loads
 from .models import ChatRequest, ChatResponse, ModelInfo
 from .services import AIModelService, StreamingService
 from .utils import logger
@@ -25,7 +25,8 @@ app = FastAPI(
     title="ALPHA MIND AI Engine",
     description="Hybrid AI Model Gateway for ALPHA MIND Chatbot",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -88,7 +89,7 @@ async def chat_stream(request: ChatRequest):
     """Stream chat completion"""
     try:
         ai_service = app.state.ai_service
-        return StreamingService.create_streaming_response(ai_service, request)
+        return await StreamingService.create_streaming_response(ai_service, request)
     except Exception as e:
         logger.error(f"Error in streaming chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -100,7 +101,7 @@ async def websocket_chat(websocket: WebSocket, client_id: int):
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = loads(data)
             
             # Process chat message
             ai_service = app.state.ai_service
@@ -109,7 +110,7 @@ async def websocket_chat(websocket: WebSocket, client_id: int):
             # Stream response back to client
             async for chunk in ai_service.stream_chat(request):
                 await manager.send_personal_message(
-                    json.dumps(chunk.dict()), websocket
+                    dumps_str(chunk.model_dump()), websocket
                 )
                 
     except WebSocketDisconnect:
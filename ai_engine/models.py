@@ -63,6 +63,7 @@ class StreamChunk(BaseModel):
     created: int
     model: str
     choices: List[Dict[str, Any]]
+    usage: Optional[Usage] = None  # Only set on the final chunk
     
 class FileAnalysisRequest(BaseModel):
     file_path: str
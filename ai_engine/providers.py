@@ -1,18 +1,61 @@
 import asyncio
 import aiohttp
-import json
 import time
-from typing import List, AsyncGenerator, Dict, Any
+from typing import List, AsyncGenerator, Dict, Any, Optional
 import logging
 from datetime import datetime
 
+from .fastjson import JSONDecodeError, dumps_str, loads
 from .models import (
-    ChatRequest, ChatResponse, ChatChoice, Usage, 
+    ChatRequest, ChatResponse, ChatChoice, ChatMessage, Usage, 
     ModelInfo, StreamChunk, ModelProvider
 )
 
 logger = logging.getLogger(__name__)
 
+# Sentinel returned by parse_sse_line for the 'data: [DONE]' terminator
+SSE_DONE = object()
+
+def build_chat_payload(request: ChatRequest, model: str, stream: bool = False) -> Dict[str, Any]:
+    """Build an OpenAI-compatible chat completion payload"""
+    payload = {
+        "model": model,
+        "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature,
+        "stream": stream
+    }
+    if stream:
+        # Ask for token usage on the final chunk
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+def parse_sse_line(line: bytes, default_model: str) -> Optional[StreamChunk]:
+    """Parse one server-sent event line into a StreamChunk.
+
+    Returns None for lines that carry no chunk and SSE_DONE for the terminator.
+    """
+    line = line.strip()
+    if not line.startswith(b'data: '):
+        return None
+    
+    data_bytes = line[6:]  # Remove 'data: ' prefix
+    if data_bytes == b'[DONE]':
+        return SSE_DONE
+    
+    try:
+        data = loads(data_bytes)
+    except JSONDecodeError:
+        return None
+    
+    return StreamChunk(
+        id=data.get('id', ''),
+        created=data.get('created', int(time.time())),
+        model=data.get('model', default_model),
+        choices=data.get('choices', []),
+        usage=data.get('usage')
+    )
+
 class OpenRouterProvider:
     """OpenRouter API provider for cloud models"""
     
@@ -30,7 +73,8 @@ class OpenRouterProvider:
             return
         
         self.session = aiohttp.ClientSession(
-            headers={"Authorization": f"Bearer {self.api_key}"}
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json_serialize=dumps_str
         )
         logger.info("OpenRouter provider initialized")
     
@@ -41,7 +85,7 @@ class OpenRouterProvider:
         
         try:
             async with self.session.get(f"{self.base_url}/models") as response:
-                data = await response.json()
+                data = await response.json(loads=loads)
                 
                 models = []
                 for model_data in data.get('data', []):
@@ -86,16 +130,10 @@ class OpenRouterProvider:
             raise ValueError("OpenRouter not initialized")
         
         try:
-            payload = {
-                "model": request.model,
-                "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
-                "max_tokens": request.max_tokens,
-                "temperature": request.temperature,
-                "stream": False
-            }
+            payload = build_chat_payload(request, request.model)
             
             async with self.session.post(f"{self.base_url}/chat/completions", json=payload) as response:
-                data = await response.json()
+                data = await response.json(loads=loads)
                 
                 return ChatResponse(
                     id=data.get('id', ''),
@@ -129,32 +167,15 @@ class OpenRouterProvider:
             raise ValueError("OpenRouter not initialized")
         
         try:
-            payload = {
-                "model": request.model,
-                "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
-                "max_tokens": request.max_tokens,
-                "temperature": request.temperature,
-                "stream": True
-            }
+            payload = build_chat_payload(request, request.model, stream=True)
             
             async with self.session.post(f"{self.base_url}/chat/completions", json=payload) as response:
                 async for line in response.content:
-                    line = line.decode('utf-8').strip()
-                    if line.startswith('data: '):
-                        data_str = line[6:]  # Remove 'data: ' prefix
-                        if data_str == '[DONE]':
-                            break
-                        
-                        try:
-                            data = json.loads(data_str)
-                            yield StreamChunk(
-                                id=data.get('id', ''),
-                                created=data.get('created', int(time.time())),
-                                model=data.get('model', request.model),
-                                choices=data.get('choices', [])
-                            )
-                        except json.JSONDecodeError:
-                            continue
+                    chunk = parse_sse_line(line, request.model)
+                    if chunk is SSE_DONE:
+                        break
+                    if chunk is not None:
+                        yield chunk
                             
         except Exception as e:
             logger.error(f"OpenRouter stream chat failed: {e}")
@@ -169,7 +190,7 @@ class LiteLLMProvider:
         
     async def initialize(self):
         """Initialize the provider"""
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(json_serialize=dumps_str)
         logger.info("LiteLLM provider initialized")
     
     async def get_available_models(self) -> List[ModelInfo]:
@@ -224,15 +245,10 @@ class LiteLLMProvider:
             raise ValueError("LiteLLM not initialized")
         
         try:
-            payload = {
-                "model": f"local/{request.model}",
-                "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
-                "max_tokens": request.max_tokens,
-                "temperature": request.temperature
-            }
+            payload = build_chat_payload(request, f"local/{request.model}")
             
             async with self.session.post(f"{self.base_url}/v1/chat/completions", json=payload) as response:
-                data = await response.json()
+                data = await response.json(loads=loads)
                 
                 return ChatResponse(
                     id=data.get('id', ''),
@@ -266,32 +282,15 @@ class LiteLLMProvider:
             raise ValueError("LiteLLM not initialized")
         
         try:
-            payload = {
-                "model": f"local/{request.model}",
-                "messages": [{"role": msg.role, "content": msg.content} for msg in request.messages],
-                "max_tokens": request.max_tokens,
-                "temperature": request.temperature,
-                "stream": True
-            }
+            payload = build_chat_payload(request, f"local/{request.model}", stream=True)
             
             async with self.session.post(f"{self.base_url}/v1/chat/completions", json=payload) as response:
                 async for line in response.content:
-                    line = line.decode('utf-8').strip()
-                    if line.startswith('data: '):
-                        data_str = line[6:]  # Remove 'data: ' prefix
-                        if data_str == '[DONE]':
-                            break
-                        
-                        try:
-                            data = json.loads(data_str)
-                            yield StreamChunk(
-                                id=data.get('id', ''),
-                                created=data.get('created', int(time.time())),
-                                model=data.get('model', request.model),
-                                choices=data.get('choices', [])
-                            )
-                        except json.JSONDecodeError:
-                            continue
+                    chunk = parse_sse_line(line, request.model)
+                    if chunk is SSE_DONE:
+                        break
+                    if chunk is not None:
+                        yield chunk
                             
         except Exception as e:
             logger.error(f"LiteLLM stream chat failed: {e}")
@@ -1,10 +1,10 @@
 import asyncio
 import time
 from typing import List, AsyncGenerator, Dict, Any
-import json
 import logging
 from datetime import datetime
 
+from .fastjson import dumps
 from .models import (
     ChatRequest, ChatResponse, ChatChoice, Usage, 
     ModelInfo, StreamChunk, HealthStatus, ModelProvider
@@ -140,6 +140,13 @@ class AIModelService:
 class StreamingService:
     """Service for handling streaming responses"""
     
+    DONE_FRAME = b"data: [DONE]\n\n"
+    
+    @staticmethod
+    def format_frame(chunk: StreamChunk) -> bytes:
+        """Format a stream chunk as a server-sent event frame"""
+        return b"data: " + dumps(chunk.model_dump()) + b"\n\n"
+    
     @staticmethod
     async def create_streaming_response(ai_service: AIModelService, request: ChatRequest):
         """Create streaming response for FastAPI"""
@@ -147,10 +154,10 @@ class StreamingService:
         
         async def generate():
             async for chunk in ai_service.stream_chat(request):
-                yield f"data: {json.dumps(chunk.dict())}\n\n"
-            yield "data: [DONE]\n\n"
+                yield StreamingService.format_frame(chunk)
+            yield StreamingService.DONE_FRAME
         
-        return StreamingResponse(generate(), media_type="text/plain")
+        return StreamingResponse(generate(), media_type="text/event-stream")
 
 class SmartRouter:
     """Smart routing for model selection based on cost, performance, and availability"""
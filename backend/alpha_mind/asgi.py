@@ -3,6 +3,11 @@ ASGI config for alpha_mind project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+This is the production entry point: async views such as chat send do not hold
+a worker thread while they wait on the AI engine. Serve it with, e.g.:
+
+    uvicorn alpha_mind.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
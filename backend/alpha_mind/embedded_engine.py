@@ -0,0 +1,211 @@
+"""
+In-process AI engine for single-node deployments.
+
+With ``AI_ENGINE_MODE = 'embedded'`` the backend imports
+``ai_engine.services.AIModelService`` and calls it directly instead of making
+an HTTP hop to the engine. The service runs on one shared event loop in a
+background thread, because its provider sessions are bound to the loop they
+were created on. The clients here have the same interface as the HTTP clients
+in ``engine_client`` and return the same JSON-shaped data.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from .engine_client import EngineError, metrics
+
+class EmbeddedEngine:
+    """Owns the engine service and the event loop thread it runs on"""
+
+    def __init__(self, service=None):
+        engine_path = str(settings.AI_ENGINE_PATH)
+        if engine_path not in sys.path:
+            sys.path.insert(0, engine_path)
+        
+        self.service = service
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='embedded-ai-engine', daemon=True
+        )
+        self.thread.start()
+        if self.service is None:
+            self.service = self.run(self._create_service())
+
+    async def _create_service(self):
+        from ai_engine.services import AIModelService
+
+        service = AIModelService()
+        await service.initialize()
+        return service
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop and return its future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine loop and wait for its result"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    # Engine operations, executed on the engine loop
+
+    async def chat(self, payload):
+        from ai_engine.models import ChatRequest
+
+        response = await self.service.chat_completion(ChatRequest.model_validate(payload))
+        return response.model_dump(mode='json')
+
+    async def get_models(self):
+        models = await self.service.get_available_models()
+        return [model.model_dump(mode='json') for model in models]
+
+    async def health(self):
+        status = await self.service.health_check()
+        return {
+            'status': 'healthy',
+            'models': status.available_models,
+            'engine': 'ALPHA MIND AI Engine v1.0.0 (embedded)'
+        }
+
+    async def pump_stream(self, payload, queue, caller_loop):
+        """Push server-sent event lines for a completion onto a caller-loop queue"""
+        from ai_engine.models import ChatRequest
+        from ai_engine.services import StreamingService
+
+        def put(item):
+            try:
+                caller_loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # The consumer's loop has already closed
+        
+        try:
+            request = ChatRequest.model_validate(payload)
+            async for chunk in self.service.stream_chat(request):
+                put(StreamingService.format_frame(chunk).decode('utf-8').rstrip('\n'))
+            put(StreamingService.DONE_FRAME.decode('utf-8').rstrip('\n'))
+        except Exception as e:
+            put(EngineError(f"AI Engine error: {str(e)}"))
+        finally:
+            put(None)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the process-wide embedded engine, starting it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddedEngine()
+    return _engine
+
+class EmbeddedEngineClient:
+    """Sync client that calls the embedded engine directly"""
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+
+    def request(self, path, coro, timeout=None):
+        start_time = time.perf_counter()
+        success = False
+        try:
+            if timeout is None:
+                timeout = settings.AI_ENGINE_TIMEOUTS.get(path, settings.AI_ENGINE_TIMEOUT)
+            data = self.engine.run(coro, timeout)
+            success = True
+            return data
+        except Exception as e:
+            raise EngineError(f"AI Engine error: {str(e)}") from e
+        finally:
+            metrics.record(path, time.perf_counter() - start_time, success)
+
+    def chat(self, payload, timeout=None):
+        return self.request('/chat', self.engine.chat(payload), timeout)
+
+    def get_models(self):
+        return self.request('/models', self.engine.get_models())
+
+    def health(self):
+        return self.request('/health', self.engine.health())
+
+    def close(self):
+        pass
+
+class AsyncEmbeddedEngineClient:
+    """Async client that calls the embedded engine from any event loop"""
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+
+    async def request(self, path, coro, timeout=None):
+        start_time = time.perf_counter()
+        success = False
+        try:
+            if timeout is None:
+                timeout = settings.AI_ENGINE_TIMEOUTS.get(path, settings.AI_ENGINE_TIMEOUT)
+            future = asyncio.wrap_future(self.engine.submit(coro))
+            data = await asyncio.wait_for(future, timeout)
+            success = True
+            return data
+        except Exception as e:
+            raise EngineError(f"AI Engine error: {str(e)}") from e
+        finally:
+            metrics.record(path, time.perf_counter() - start_time, success)
+
+    async def chat(self, payload, timeout=None):
+        return await self.request('/chat', self.engine.chat(payload), timeout)
+
+    async def get_models(self):
+        return await self.request('/models', self.engine.get_models())
+
+    async def health(self):
+        return await self.request('/health', self.engine.health())
+
+    async def stream_chat(self, payload, timeout=None):
+        """Yield server-sent event lines, like AsyncEngineClient.stream_chat.
+
+        Closing the generator cancels generation on the engine loop.
+        """
+        path = '/chat/stream'
+        if timeout is None:
+            timeout = settings.AI_ENGINE_TIMEOUTS.get(path, settings.AI_ENGINE_TIMEOUT)
+        start_time = time.perf_counter()
+        success = False
+        queue = asyncio.Queue()
+        future = self.engine.submit(
+            self.engine.pump_stream(payload, queue, asyncio.get_running_loop())
+        )
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    raise EngineError("AI Engine stream timed out")
+                if item is None:
+                    break
+                if isinstance(item, EngineError):
+                    raise item
+                yield item
+            success = True
+        except GeneratorExit:
+            success = True
+            raise
+        finally:
+            future.cancel()
+            metrics.record(path, time.perf_counter() - start_time, success)
+
+    async def aclose(self):
+        pass
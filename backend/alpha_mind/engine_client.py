@@ -0,0 +1,249 @@
+"""
+Pooled HTTP clients for the AI engine.
+
+``get_client()`` returns a process-wide sync client and ``get_async_client()``
+an async client per event loop (under WSGI Django runs each async view in its
+own loop, so an async client is never shared across loops). An async client
+is closed when its loop shuts down, so those per-request loops do not leak
+one client each. Both keep
+keep-alive connection pools to ``settings.AI_ENGINE_URL``, or to the Unix
+domain socket in ``settings.AI_ENGINE_UDS`` when the engine runs on the same
+host. Every call is timed into ``metrics``. With ``AI_ENGINE_MODE =
+'embedded'`` both return in-process clients from ``embedded_engine`` instead.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+from . import fastjson
+from .instrumentation import record_engine_call
+
+logger = logging.getLogger(__name__)
+
+class EngineError(Exception):
+    """Raised when the AI engine cannot be reached or returns an error"""
+
+class EngineMetrics:
+    """Thread-safe per-endpoint call counts and latencies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, elapsed, success=True):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'calls': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0
+            })
+            stats['calls'] += 1
+            stats['total_time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+            if not success:
+                stats['errors'] += 1
+        record_engine_call(elapsed)
+        logger.debug(f"Engine {endpoint} took {elapsed * 1000:.1f}ms (success={success})")
+
+    def snapshot(self):
+        """Return a copy of the stats with average latency per endpoint"""
+        with self._lock:
+            return {
+                endpoint: {
+                    **stats,
+                    'avg_time': stats['total_time'] / stats['calls'] if stats['calls'] else 0.0
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+metrics = EngineMetrics()
+
+class BaseEngineClient:
+    """Configuration and encoding shared by the sync and async clients"""
+
+    def __init__(self, base_url=None, uds=None):
+        self.base_url = base_url or settings.AI_ENGINE_URL
+        self.uds = uds if uds is not None else settings.AI_ENGINE_UDS
+        self.limits = httpx.Limits(
+            max_connections=settings.AI_ENGINE_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_ENGINE_MAX_KEEPALIVE
+        )
+
+    def get_timeout(self, path, timeout=None):
+        """Per-call override, else the endpoint's configured timeout"""
+        if timeout is None:
+            timeout = settings.AI_ENGINE_TIMEOUTS.get(path, settings.AI_ENGINE_TIMEOUT)
+        return httpx.Timeout(timeout, connect=5.0)
+
+    def build_request(self, client, method, path, payload, timeout):
+        return client.build_request(
+            method,
+            path,
+            content=fastjson.dumps(payload) if payload is not None else None,
+            headers={'Content-Type': 'application/json'} if payload is not None else None,
+            timeout=self.get_timeout(path, timeout)
+        )
+
+    def decode(self, response):
+        response.raise_for_status()
+        return fastjson.loads(response.content)
+
+    def wrap_error(self, e):
+        if isinstance(e, fastjson.JSONDecodeError):
+            return EngineError(f"Invalid response from AI Engine: {str(e)}")
+        if isinstance(e, httpx.HTTPStatusError):
+            return EngineError(f"AI Engine returned {e.response.status_code}: {e.response.text[:200]}")
+        return EngineError(f"Failed to connect to AI Engine: {str(e)}")
+
+class EngineClient(BaseEngineClient):
+    """Sync client for the AI engine REST API"""
+
+    def __init__(self, base_url=None, uds=None, transport=None):
+        super().__init__(base_url, uds)
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            transport=transport or httpx.HTTPTransport(uds=self.uds or None, limits=self.limits)
+        )
+
+    def request(self, method, path, payload=None, timeout=None):
+        """Send a request and return the decoded JSON body"""
+        start_time = time.perf_counter()
+        success = False
+        try:
+            request = self.build_request(self.client, method, path, payload, timeout)
+            data = self.decode(self.client.send(request))
+            success = True
+            return data
+        except (httpx.HTTPError, fastjson.JSONDecodeError) as e:
+            raise self.wrap_error(e) from e
+        finally:
+            metrics.record(path, time.perf_counter() - start_time, success)
+
+    def chat(self, payload, timeout=None):
+        return self.request('POST', '/chat', payload, timeout)
+
+    def get_models(self):
+        return self.request('GET', '/models')
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def close(self):
+        self.client.close()
+
+class AsyncEngineClient(BaseEngineClient):
+    """Async client for the AI engine REST API"""
+
+    def __init__(self, base_url=None, uds=None, transport=None):
+        super().__init__(base_url, uds)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            transport=transport or httpx.AsyncHTTPTransport(uds=self.uds or None, limits=self.limits)
+        )
+
+    async def request(self, method, path, payload=None, timeout=None):
+        """Send a request and return the decoded JSON body"""
+        start_time = time.perf_counter()
+        success = False
+        try:
+            request = self.build_request(self.client, method, path, payload, timeout)
+            data = self.decode(await self.client.send(request))
+            success = True
+            return data
+        except (httpx.HTTPError, fastjson.JSONDecodeError) as e:
+            raise self.wrap_error(e) from e
+        finally:
+            metrics.record(path, time.perf_counter() - start_time, success)
+
+    async def chat(self, payload, timeout=None):
+        return await self.request('POST', '/chat', payload, timeout)
+
+    async def get_models(self):
+        return await self.request('GET', '/models')
+
+    async def health(self):
+        return await self.request('GET', '/health')
+
+    async def stream_chat(self, payload, timeout=None):
+        """Yield the engine's server-sent event lines for a chat completion.
+
+        Closing the generator closes the upstream connection, which stops
+        generation on the engine.
+        """
+        path = '/chat/stream'
+        start_time = time.perf_counter()
+        success = False
+        try:
+            request = self.build_request(self.client, 'POST', path, payload, timeout)
+            response = await self.client.send(request, stream=True)
+            try:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield line
+                success = True
+            except GeneratorExit:
+                # Closed by the consumer, e.g. after [DONE] or a client disconnect
+                success = True
+                raise
+            finally:
+                await response.aclose()
+        except httpx.HTTPError as e:
+            raise self.wrap_error(e) from e
+        finally:
+            metrics.record(path, time.perf_counter() - start_time, success)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+async def _close_at_shutdown(client):
+    """Parked at ``yield`` until ``loop.shutdown_asyncgens()`` closes it.
+
+    ``asyncio.run()``, which runs both asgiref's per-request loops and ASGI
+    servers, calls it once the loop's work is done.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+def get_client():
+    """Return the process-wide pooled sync engine client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if settings.AI_ENGINE_MODE == 'embedded':
+                    from .embedded_engine import EmbeddedEngineClient
+                    _client = EmbeddedEngineClient()
+                else:
+                    _client = EngineClient()
+    return _client
+
+def get_async_client():
+    """Return the pooled async engine client for the running event loop"""
+    if settings.AI_ENGINE_MODE == 'embedded':
+        from .embedded_engine import AsyncEmbeddedEngineClient
+        return AsyncEmbeddedEngineClient()
+
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncEngineClient()
+        closer = _close_at_shutdown(client)
+        # Starting the generator registers it with the loop's asyncgen hooks
+        asyncio.ensure_future(closer.__anext__())
+        entry = _async_clients[loop] = (client, closer)
+    return entry[0]
@@ -0,0 +1,69 @@
+"""
+Pluggable JSON serialization for the Django backend.
+
+Uses orjson when it is installed and falls back to the stdlib ``json``
+module otherwise; ``settings.JSON_BACKEND`` forces a backend. Output matches
+Django's ``JsonResponse`` (``DjangoJSONEncoder`` handles the types orjson
+does not serialize natively), so views can swap the import.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .instrumentation import record_serialization
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# orjson.JSONDecodeError subclasses this, so views keep catching one type
+JSONDecodeError = json.JSONDecodeError
+
+_encoder = DjangoJSONEncoder()
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder).encode('utf-8')
+
+def _orjson_dumps(obj):
+    return orjson.dumps(
+        obj,
+        default=_encoder.default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    )
+
+BACKENDS = {
+    'json': (_stdlib_dumps, json.loads),
+}
+if orjson is not None:
+    BACKENDS['orjson'] = (_orjson_dumps, orjson.loads)
+
+def get_backend(name=None):
+    """Return the (dumps, loads) pair for a backend name"""
+    name = name or getattr(settings, 'JSON_BACKEND', 'auto')
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in BACKENDS else 'json'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable JSON backend: {name}")
+    return BACKENDS[name]
+
+dumps, loads = get_backend()
+
+class JsonResponse(HttpResponse):
+    """Drop-in replacement for django.http.JsonResponse using the fast backend"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        start_time = time.perf_counter()
+        content = dumps(data)
+        record_serialization(time.perf_counter() - start_time)
+        super().__init__(content=content, **kwargs)
@@ -0,0 +1,309 @@
+"""
+Per-request performance instrumentation.
+
+``PerformanceMiddleware`` times every request and breaks the time down into
+database queries (count and time, from an execute wrapper installed on each
+connection), AI engine calls (reported by ``engine_client.metrics``) and
+JSON serialization (reported by ``fastjson.JsonResponse``). The breakdown is
+sent back in a ``Server-Timing`` header and added to per-endpoint latency
+histograms that ``render_prometheus()`` exports in the Prometheus text
+format, along with engine call and response cache counters. Timings live
+in a context variable, so they follow a request into ``sync_to_async``
+threads and are not mixed up between requests.
+
+For streaming responses the numbers cover the work done before the body
+starts; engine time spent while streaming is only in the engine metrics.
+
+With ``settings.PERF_PROFILE_SAMPLE_RATE`` above zero, that fraction of
+synchronous requests runs under cProfile, and the profiles of requests
+slower than ``settings.PERF_SLOW_REQUEST_SECONDS`` are logged and the
+slowest ``settings.PERF_SLOW_PROFILES_KEPT`` are kept for the metrics
+endpoint. Histograms and profiles are per process.
+"""
+
+import contextvars
+import cProfile
+import heapq
+import io
+import itertools
+import logging
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_LINES = 40
+
+class RequestTimings:
+    """Time spent on one request, by component"""
+
+    __slots__ = ('db_queries', 'db_time', 'engine_calls', 'engine_time', 'serialize_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.engine_calls = 0
+        self.engine_time = 0.0
+        self.serialize_time = 0.0
+
+_timings = contextvars.ContextVar('request_timings', default=None)
+
+def current_timings():
+    """Timings of the request being handled, or None outside a request"""
+    return _timings.get()
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the request's timings"""
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start_time = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_time += time.perf_counter() - start_time
+
+def record_engine_call(elapsed):
+    timings = _timings.get()
+    if timings is not None:
+        timings.engine_calls += 1
+        timings.engine_time += elapsed
+
+def record_serialization(elapsed):
+    timings = _timings.get()
+    if timings is not None:
+        timings.serialize_time += elapsed
+
+def install_query_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+class LatencyHistograms:
+    """Thread-safe per-endpoint request histograms and component totals"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, key, total, timings):
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'count': 0, 'sum': 0.0, 'db_queries': 0, 'db_time': 0.0,
+                    'engine_time': 0.0, 'serialize_time': 0.0
+                }
+            series['buckets'][bisect_left(self.buckets, total)] += 1
+            series['count'] += 1
+            series['sum'] += total
+            series['db_queries'] += timings.db_queries
+            series['db_time'] += timings.db_time
+            series['engine_time'] += timings.engine_time
+            series['serialize_time'] += timings.serialize_time
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {**series, 'buckets': list(series['buckets'])} for key, series in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+histograms = LatencyHistograms()
+
+class SlowProfiles:
+    """The slowest profiled requests, slowest first"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap = []
+        self._counter = itertools.count()
+
+    def add(self, total, entry):
+        limit = settings.PERF_SLOW_PROFILES_KEPT
+        with self._lock:
+            item = (total, next(self._counter), entry)
+            if len(self._heap) < limit:
+                heapq.heappush(self._heap, item)
+            elif limit and total > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def snapshot(self):
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+
+    def reset(self):
+        with self._lock:
+            self._heap.clear()
+
+slow_profiles = SlowProfiles()
+_profiler_lock = threading.Lock()
+
+def format_profile(profiler):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return stream.getvalue()
+
+def endpoint_key(request, response):
+    match = request.resolver_match
+    route = f"/{match.route}" if match is not None else 'unmatched'
+    return (request.method, route, str(response.status_code))
+
+def server_timing(timings, total):
+    return ', '.join([
+        f'db;dur={timings.db_time * 1000:.2f};desc="{timings.db_queries} queries"',
+        f'engine;dur={timings.engine_time * 1000:.2f};desc="{timings.engine_calls} calls"',
+        f'serialize;dur={timings.serialize_time * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+
+class PerformanceMiddleware:
+    """Time requests, emit Server-Timing and feed the latency histograms"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_wrapper, dispatch_uid='alpha_mind.instrumentation')
+        # Connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start_time = time.perf_counter()
+        profiler = self.start_profiler()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _profiler_lock.release()
+            _timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start_time, profiler)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start_time = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start_time, None)
+
+    def start_profiler(self):
+        """A running profiler for sampled requests, one at a time per process"""
+        rate = settings.PERF_PROFILE_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate or not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiler is active (e.g. a debugger)
+            _profiler_lock.release()
+            return None
+        return profiler
+
+    def finish(self, request, response, timings, total, profiler):
+        key = endpoint_key(request, response)
+        histograms.observe(key, total, timings)
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(timings, total)
+        if profiler is not None and total >= settings.PERF_SLOW_REQUEST_SECONDS:
+            profile = format_profile(profiler)
+            logger.warning(f"Slow request {request.method} {request.path} took {total * 1000:.0f}ms\n{profile}")
+            slow_profiles.add(total, {
+                'method': request.method,
+                'path': request.path,
+                'route': key[1],
+                'status': response.status_code,
+                'duration': total,
+                'db_queries': timings.db_queries,
+                'db_time': timings.db_time,
+                'engine_time': timings.engine_time,
+                'serialize_time': timings.serialize_time,
+                'captured_at': timezone.now().isoformat(),
+                'profile': profile
+            })
+        return response
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{label_value(value)}"' for name, value in values.items()) + '}'
+
+def render_prometheus():
+    """Request histograms and engine call stats in the Prometheus text format"""
+    from .engine_client import metrics as engine_metrics
+    from .response_cache import stats as cache_stats
+
+    lines = []
+    series = sorted(histograms.snapshot().items())
+
+    def metric(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    metric('alpha_mind_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+    for (method, route, status), data in series:
+        base = {'method': method, 'route': route, 'status': status}
+        cumulative = 0
+        for bound, count in zip((*histograms.buckets, '+Inf'), data['buckets']):
+            cumulative += count
+            lines.append(f"alpha_mind_request_duration_seconds_bucket{labels(**base, le=bound)} {cumulative}")
+        lines.append(f"alpha_mind_request_duration_seconds_sum{labels(**base)} {data['sum']}")
+        lines.append(f"alpha_mind_request_duration_seconds_count{labels(**base)} {data['count']}")
+
+    for name, field, help_text in (
+        ('alpha_mind_request_db_queries_total', 'db_queries', 'Database queries run by requests.'),
+        ('alpha_mind_request_db_seconds_total', 'db_time', 'Time requests spent in database queries.'),
+        ('alpha_mind_request_engine_seconds_total', 'engine_time', 'Time requests spent waiting on the AI engine.'),
+        ('alpha_mind_request_serialize_seconds_total', 'serialize_time', 'Time requests spent serializing JSON.'),
+    ):
+        metric(name, 'counter', help_text)
+        for (method, route, status), data in series:
+            lines.append(f"{name}{labels(method=method, route=route, status=status)} {data[field]}")
+
+    engine = sorted(engine_metrics.snapshot().items())
+    for name, field, help_text in (
+        ('alpha_mind_engine_calls_total', 'calls', 'AI engine calls.'),
+        ('alpha_mind_engine_errors_total', 'errors', 'Failed AI engine calls.'),
+        ('alpha_mind_engine_seconds_total', 'total_time', 'Time spent in AI engine calls.'),
+    ):
+        metric(name, 'counter', help_text)
+        for endpoint, data in engine:
+            lines.append(f"{name}{labels(endpoint=endpoint)} {data[field]}")
+
+    cached = sorted(cache_stats.snapshot().items())
+    for name, field, help_text in (
+        ('alpha_mind_response_cache_hits_total', 'hits', 'Read responses served from the response cache.'),
+        ('alpha_mind_response_cache_misses_total', 'misses', 'Read responses built because no cached copy was current.'),
+    ):
+        metric(name, 'counter', help_text)
+        for resource, data in cached:
+            lines.append(f"{name}{labels(resource=resource)} {data[field]}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor encodes the position of a row as its ordering value plus primary
+key, so each page is a range scan on a ``(..., field, pk)`` index instead of
+an OFFSET that reads and discards every earlier row.
+"""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursor(ValueError):
+    """Raised for malformed cursors or page sizes"""
+
+def encode_cursor(value, pk):
+    """Encode a (datetime, pk) position as an opaque URL-safe cursor"""
+    raw = f"{value.isoformat()}|{pk}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor back into its (datetime, pk) position"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = base64.urlsafe_b64decode(padded).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(value), pk
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ``limit`` query parameter, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        return max(1, min(int(value), maximum))
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid limit: {value}") from e
+
+def paginate_keyset(queryset, field, limit, after=None, descending=False):
+    """Return one page of ``queryset`` ordered by (field, pk).
+
+    ``after`` is a cursor; only rows strictly past it in the chosen direction
+    are returned. Returns ``(rows, next_cursor)``, where ``next_cursor`` is
+    None on the last page.
+    """
+    direction = '-' if descending else ''
+    queryset = queryset.order_by(f'{direction}{field}', f'{direction}pk')
+
+    if after:
+        value, pk = decode_cursor(after)
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+        )
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field), last.pk)
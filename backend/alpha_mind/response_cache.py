@@ -0,0 +1,133 @@
+"""
+Per-user response cache for read endpoints.
+
+``cached_response(resource)`` wraps a view's ``get`` so its 200 responses
+are kept in Django's cache per user, resource and URL (path and query
+string). Every resource has a version number per user; cached entries
+carry the version they were built under and only count as hits while it is
+current. ``invalidate(user_id, resource)`` increments the version once the
+current transaction commits, so a write makes all of the user's entries
+for that resource stale with one cache operation, without tracking their
+keys. A lookup reads the version and the entry with one ``get_many``.
+
+Versions start at the current time in nanoseconds, so entries left from
+before a version key was evicted never match again. Entries expire after
+``settings.RESPONSE_CACHE_TIMEOUT`` seconds, which also bounds staleness
+from writes that bypass the invalidation signals (``bulk_create``,
+``update()``). With several worker processes the cache must be shared
+(``CACHE_BACKEND`` file, redis or memcached); the default local-memory
+cache only sees its own process's invalidations. Resources that another
+kind of process writes, such as files, whose analyses are saved by the
+``run_file_jobs`` workers, are declared ``shared_only`` and are not cached
+at all in local memory.
+
+Hits and misses are counted per resource and exported with the request
+metrics.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+class CacheStats:
+    """Thread-safe hit and miss counts per resource"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, resource, hit):
+        with self._lock:
+            counts = self._counts.setdefault(resource, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                resource: {
+                    **counts,
+                    'hit_ratio': counts['hits'] / (counts['hits'] + counts['misses'])
+                }
+                for resource, counts in self._counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+stats = CacheStats()
+
+def version_key(user_id, resource):
+    return f"response-version:{resource}:{user_id}"
+
+def entry_key(user_id, resource, path):
+    return f"response:{resource}:{user_id}:{hashlib.md5(path.encode('utf-8')).hexdigest()}"
+
+def current_version(user_id, resource):
+    key = version_key(user_id, resource)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+def bump_versions(user_id, resources):
+    for resource in resources:
+        key = version_key(user_id, resource)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:  # Evicted; any new value outdates old entries
+                cache.set(key, time.time_ns(), None)
+        except Exception:
+            logger.exception(f"Failed to invalidate cached {resource} responses")
+
+def invalidate(user_id, *resources):
+    """Make a user's cached responses for ``resources`` stale after commit"""
+    if user_id is not None:
+        transaction.on_commit(lambda: bump_versions(user_id, resources))
+
+def cached_response(resource, shared_only=False):
+    """Cache a view method's 200 responses per user under ``resource``.
+
+    ``shared_only`` resources are only cached when the cache is shared
+    between processes.
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            timeout = settings.RESPONSE_CACHE_TIMEOUT
+            if not timeout or not request.user.is_authenticated or (
+                shared_only and isinstance(caches['default'], LocMemCache)
+            ):
+                return view_method(self, request, *args, **kwargs)
+
+            user_id = request.user.pk
+            vkey = version_key(user_id, resource)
+            ekey = entry_key(user_id, resource, request.get_full_path())
+            found = cache.get_many([vkey, ekey])
+            version = found.get(vkey)
+            if version is None:
+                version = current_version(user_id, resource)
+            entry = found.get(ekey)
+            if entry is not None and entry[0] == version:
+                stats.record(resource, hit=True)
+                return HttpResponse(entry[2], content_type=entry[1])
+
+            stats.record(resource, hit=False)
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(ekey, (version, response['Content-Type'], response.content), timeout)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,622 @@
+"""
+Shared helpers for the backend tests and the benchmarks.
+
+``TestRunner`` gives a test run its own file-backed SQLite database, which
+the background threads and ``sync_to_async`` workers can open alongside the
+test, and its own usage journal directory. ``TestCase`` commits like
+production code does, so ``on_commit`` work (search index, cache
+invalidation, blob cleanup) runs. The rest are factories and in-process
+fakes for the AI engine and Firebase's signing certificates.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import functools
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.runner import DiscoverRunner
+from django.utils import timezone
+
+from . import fastjson
+from .engine_client import AsyncEngineClient, EngineClient
+
+class TestRunner(DiscoverRunner):
+    """Runs the suite against a temporary database file and usage journal"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.temp_dir = tempfile.mkdtemp(prefix='alpha-mind-tests-')
+        self.journal = override_settings(USAGE_JOURNAL_DIR=os.path.join(self.temp_dir, 'journal'))
+        self.journal.enable()
+
+    def setup_databases(self, **kwargs):
+        # An in-memory database is only shared through SQLite's shared cache,
+        # where a busy writer fails other threads at once
+        for alias in connections:
+            if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+                test_name = os.path.join(self.temp_dir, f'{alias}.sqlite3')
+                settings.DATABASES[alias].setdefault('TEST', {})['NAME'] = test_name
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        # Stop background threads while the test database still exists
+        from gateway.accounting import get_accountant
+        from gateway.catalog import get_catalog
+        from gateway.quotas import get_quotas
+
+        get_accountant().close()
+        get_catalog().close()
+        get_quotas().close()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self.journal.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+class TestCase(TransactionTestCase):
+    """A test whose writes commit, with an empty cache and a scratch directory.
+
+    Usage the test queued with the accountant is written before its tables
+    are flushed, so it never lands in a later test.
+    """
+
+    def setUp(self):
+        from gateway.accounting import get_accountant
+
+        cache.clear()
+        self.tmp_path = self.enterContext(tempfile.TemporaryDirectory())
+        self.addCleanup(get_accountant().flush)
+
+def login(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+def make_user(username, **fields):
+    return User.objects.create(username=username, **fields)
+
+def json_body(payload):
+    return {'data': fastjson.dumps(payload), 'content_type': 'application/json'}
+
+def make_upload(user, content=b'quarterly numbers ' * 200, name='report.txt'):
+    """A FileUpload stored under its own path, as uploads were before blobs"""
+    from files.models import FileUpload
+
+    return FileUpload.objects.create(
+        user=user, file=SimpleUploadedFile(name, content), original_name=name,
+        file_type='text', file_size=len(content), mime_type='text/plain'
+    )
+
+def make_session(user, messages=0, title='Session', content='message {n}', **fields):
+    """A session with ``messages`` alternating user/assistant messages"""
+    from chat.importer import import_messages
+    from chat.models import ChatSession
+
+    session = ChatSession.objects.create(user=user, title=title, model='openai/gpt-4', **fields)
+    if messages:
+        roles = ['user', 'assistant']
+        import_messages(session, (
+            {'role': roles[n % 2], 'content': content.format(n=n), 'model': 'openai/gpt-4', 'token_count': 50}
+            for n in range(messages)
+        ))
+    return session
+
+def make_model(model_id='openai/gpt-4', input_price=30, output_price=60, **fields):
+    from gateway.models import AIModel
+
+    model, _ = AIModel.objects.get_or_create(id=model_id, defaults={
+        'name': model_id, 'provider': 'openrouter',
+        'input_price': input_price, 'output_price': output_price, **fields
+    })
+    return model
+
+def usage_event(user, **overrides):
+    """A usage event as ``record_usage`` queues it: one GPT-4 chat of 1000 tokens"""
+    return {
+        'user_id': user.id, 'model': 'openai/gpt-4', 'session_id': None,
+        'input_tokens': 800, 'output_tokens': 200, 'response_time': 1.2,
+        'success': True, 'error_message': '', 'messages': 1, 'files': 0,
+        'cost': None, 'timestamp': timezone.now().isoformat(), **overrides
+    }
+
+def usage_rows(users, models, count, start, span, rng):
+    """``count`` unsaved ModelUsage rows spread over ``span`` from ``start``"""
+    from gateway.models import ModelUsage
+
+    return [
+        ModelUsage(
+            user=rng.choice(users),
+            model=rng.choice(models),
+            input_tokens=rng.randint(10, 2000),
+            output_tokens=rng.randint(10, 1000),
+            total_cost=Decimal(rng.randint(1, 500)) / 10000,
+            response_time=rng.uniform(0.2, 5.0),
+            success=rng.random() > 0.05,
+            created_at=start + datetime.timedelta(seconds=rng.uniform(0, span.total_seconds()))
+        )
+        for _ in range(count)
+    ]
+
+def engine_models(count, price=1.5, prefix='bench/model'):
+    return [{
+        'id': f'{prefix}-{n}',
+        'name': f'Model {n}',
+        'provider': 'openrouter',
+        'description': f'Benchmark model {n}',
+        'context_window': 8192,
+        'max_tokens': 4096,
+        'pricing': {'input': price, 'output': price * 2},
+        'capabilities': ['chat'],
+        'is_available': True,
+        'is_local': False
+    } for n in range(count)]
+
+class FakeEngine:
+    """The engine's HTTP API in process, as an ``httpx.MockTransport`` handler.
+
+    Chats are answered with ``reply``, streams with ``reply`` in one chunk
+    and ``/models`` with ``models``, after ``latency`` seconds. While ``up``
+    is false, or ``failures`` is positive (counting down), every call is a
+    503. Request bodies are kept in ``requests``.
+    """
+
+    def __init__(self, reply='A summary', models=(), latency=0, usage=(100, 20)):
+        self.reply = reply
+        self.models = list(models)
+        self.latency = latency
+        self.usage = {'prompt_tokens': usage[0], 'completion_tokens': usage[1], 'total_tokens': sum(usage)}
+        self.up = True
+        self.failures = 0
+        self.requests = []
+
+    def __call__(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(request)
+
+    async def handle_async(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(request)
+
+    def respond(self, request):
+        self.requests.append(fastjson.loads(request.content) if request.content else None)
+        if not self.up or self.failures:
+            self.failures = max(self.failures - 1, 0)
+            return httpx.Response(503, content=b'{"detail": "Overloaded"}')
+        if request.url.path == '/models':
+            return httpx.Response(200, content=fastjson.dumps(self.models))
+        if request.url.path == '/chat/stream':
+            lines = [
+                b'data: ' + fastjson.dumps({'choices': [{'delta': {'content': self.reply}}]}),
+                b'data: ' + fastjson.dumps({'choices': [], 'usage': self.usage}),
+                b'data: [DONE]',
+            ]
+            return httpx.Response(200, content=b'\n\n'.join(lines) + b'\n\n')
+        return httpx.Response(200, content=fastjson.dumps({
+            'id': 'chatcmpl-fake',
+            'created': 0,
+            'model': 'openai/gpt-4',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.reply}}],
+            'usage': self.usage
+        }))
+
+    def client(self):
+        return EngineClient(base_url='http://engine', transport=httpx.MockTransport(self))
+
+    def async_client(self):
+        return AsyncEngineClient(base_url='http://engine', transport=httpx.MockTransport(self.handle_async))
+
+    def async_clients(self):
+        """A ``get_async_client`` replacement: one client per event loop"""
+        clients = {}
+
+        def get_async_client():
+            loop = asyncio.get_running_loop()
+            if loop not in clients:
+                clients[loop] = self.async_client()
+            return clients[loop]
+
+        return get_async_client
+
+def engine_service(reply="lorem ipsum dolor sit amet " * 40):
+    """The engine's AIModelService with one model and a stub provider"""
+    engine_path = str(settings.AI_ENGINE_PATH)
+    if engine_path not in sys.path:
+        sys.path.insert(0, engine_path)
+    from ai_engine.models import ChatChoice, ChatMessage, ChatResponse, ModelInfo, ModelProvider, Usage
+    from ai_engine.services import AIModelService
+
+    service = AIModelService()
+    service.models_cache['openai/gpt-4'] = ModelInfo(
+        id='openai/gpt-4',
+        name='GPT-4',
+        provider=ModelProvider.OPENROUTER,
+        description='Benchmark model',
+        context_window=8192,
+        max_tokens=8192,
+        pricing={'input': 30, 'output': 60}
+    )
+
+    async def chat_completion(request):
+        return ChatResponse(
+            id='chatcmpl-bench',
+            created=int(time.time()),
+            model=request.model,
+            choices=[ChatChoice(
+                index=0,
+                message=ChatMessage(role='assistant', content=reply),
+                finish_reason='stop'
+            )],
+            usage=Usage(prompt_tokens=800, completion_tokens=200, total_tokens=1000)
+        )
+
+    service.openrouter.chat_completion = chat_completion
+    return service
+
+FIREBASE_PROJECT_ID = 'alpha-mind-bench'
+FIREBASE_KEY_ID = 'bench-key'
+
+@functools.cache
+def signing_key():
+    """An RSA key and its certificates, keyed like Google's certificate endpoint"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken.bench')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+        key.public_key()
+    ).serial_number(x509.random_serial_number()).not_valid_before(now).not_valid_after(
+        now + datetime.timedelta(days=1)
+    ).sign(key, hashes.SHA256()).public_bytes(serialization.Encoding.PEM).decode('utf-8')
+    return key, {FIREBASE_KEY_ID: certificate}
+
+class CertificateServer:
+    """Google's certificate endpoint, as an ``httpx.MockTransport`` handler"""
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_control = 'public, max-age=3600'
+
+    def __call__(self, request):
+        self.requests += 1
+        return httpx.Response(200, json=signing_key()[1], headers={'Cache-Control': self.cache_control})
+
+def make_verifier(server):
+    from users.authentication import FirebaseVerifier, SigningKeys, VerifiedTokens
+
+    return FirebaseVerifier(
+        project_id=FIREBASE_PROJECT_ID,
+        keys=SigningKeys(url='https://certs.example', transport=httpx.MockTransport(server)),
+        tokens=VerifiedTokens(size=100)
+    )
+
+def make_token(uid='bench-firebase-uid', expires_in=3600, audience=FIREBASE_PROJECT_ID, kid=FIREBASE_KEY_ID, **claims):
+    import jwt
+
+    now = int(time.time())
+    return jwt.encode({
+        'iss': f'https://securetoken.google.com/{audience}',
+        'aud': audience,
+        'sub': uid,
+        'iat': now,
+        'auth_time': now,
+        'exp': now + expires_in,
+        'email': f'{uid}@example.com',
+        **claims
+    }, signing_key()[0], algorithm='RS256', headers={'kid': kid})
+
+def build_pdf(pages, lines_per_page=40):
+    """A text-only PDF with ``lines_per_page`` numbered lines per page"""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    kids = []
+    for page in range(pages):
+        lines = b' '.join(
+            b'0 -14 Td (Page %d line %d: quarterly revenue grew in every region) Tj' % (page, line)
+            for line in range(lines_per_page)
+        )
+        stream = b'BT /F1 10 Tf 40 780 Td ' + lines + b' ET'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (len(objects))
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), pages)
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def make_frame(rows, seed=7):
+    """Order rows: ids, a skewed region, customers, amounts with 5% nulls, timestamps"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    amounts = rng.normal(250, 80, rows).round(2)
+    amounts[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'order_id': np.arange(rows),
+        'region': rng.choice(['north', 'south', 'east', 'west'], rows, p=[0.4, 0.3, 0.2, 0.1]),
+        'customer': [f'customer-{n}' for n in rng.integers(0, 5000, rows)],
+        'amount': amounts,
+        'ordered_at': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 365, rows), unit='s'),
+    })
+
+def write_workbook(path, sheet_rows):
+    """Two sheets of ``make_frame`` orders and a 50-row 'returns' sheet"""
+    import openpyxl
+    import pandas as pd
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for name, seed in [('2025', 1), ('2026', 2)]:
+        sheet = workbook.create_sheet(name)
+        data = make_frame(sheet_rows, seed)
+        sheet.append(list(data.columns))
+        for row in data.itertuples(index=False):
+            sheet.append([None if pd.isna(value) else value for value in row])
+    returns = workbook.create_sheet('returns')
+    returns.append(['order_id', 'reason'])
+    for n in range(50):
+        returns.append([n, 'damaged' if n % 3 else 'late'])
+    workbook.save(path)
+    return path
+
+class Upload:
+    """Stands in for the FieldFile the analysis reads from"""
+
+    def __init__(self, path):
+        self.name = str(path)
+        self.file = open(path, 'rb')
+
+    def read(self, *args):
+        return self.file.read(*args)
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def seekable(self):
+        return True
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def close(self):
+        self.file.close()
+
+class FakeVerifier:
+    """Accepts any token as the 'budget-uid' Firebase user"""
+
+    def verify(self, token):
+        return {'uid': 'budget-uid', 'sub': 'budget-uid', 'email': 'budget@example.com'}
+
+@contextlib.contextmanager
+def fake_services(engine=None):
+    """Route engine, model catalog and Firebase calls to in-process fakes"""
+    from chat import views as chat_views
+    from files import analysis as files_analysis
+    from gateway import views as gateway_views
+    from gateway.catalog import ModelCatalog
+    from users import authentication
+
+    engine = engine or FakeEngine(reply='Budgeted reply', models=engine_models(50, 1.0, 'budget/model'), usage=(10, 2))
+    with contextlib.ExitStack() as stack:
+        engine_client = engine.client()
+        stack.callback(engine_client.close)
+        catalog = ModelCatalog(client=engine_client, interval=3600)
+        catalog.refresh()
+        stack.enter_context(mock.patch.object(chat_views, 'get_async_client', engine.async_clients()))
+        stack.enter_context(mock.patch.object(files_analysis, 'get_client', lambda: engine_client))
+        stack.enter_context(mock.patch.object(gateway_views, 'get_catalog', lambda: catalog))
+        stack.enter_context(mock.patch.object(authentication, 'get_verifier', FakeVerifier))
+        yield engine
+
+def seed_endpoint_data(sessions=60, messages=40, files=60, usage=3000, fallback_models=5, seed=5):
+    """One heavy user and the objects the endpoint calls refer to; MEDIA_ROOT must be scratch"""
+    import random
+
+    from django.db import transaction
+
+    from chat.models import ChatMessage
+    from files.models import AnalysisJob, FileAnalysis
+    from gateway.models import ModelPreference, ModelUsage
+    from gateway.rollup import rollup_metrics
+    from users.models import UserProfile, UserSettings, UserUsage
+
+    rng = random.Random(seed)
+    user = make_user('budget', email='budget@example.com')
+    staff = make_user('budget-staff', is_staff=True)
+    UserProfile.objects.create(user=user, firebase_uid='budget-uid')
+    UserSettings.objects.create(user=user)
+
+    models = [make_model(f'budget/model-{n}', 1, 2, name=f'Model {n}') for n in range(fallback_models + 1)]
+    preference = ModelPreference.objects.create(user=user, preferred_model=models[0])
+    preference.fallback_models.set(models[1:])
+
+    with transaction.atomic():
+        seeded_sessions = [
+            make_session(user, messages, title=f'Budget session {n}', content=f'budget message {{n}} of session {n}')
+            for n in range(sessions)
+        ]
+        uploads = []
+        for n in range(files):
+            upload = make_upload(user, b'quarterly numbers ' * 50, f'notes-{n}.txt')
+            analysis = FileAnalysis.objects.create(
+                file_upload=upload, summary='A summary ' * 40, insights=['one', 'two'],
+                analysis_model='openai/gpt-4', analysis_time=1.0
+            )
+            AnalysisJob.objects.create(
+                user=user, file_upload=upload, query='Summarize', model='openai/gpt-4',
+                dedupe_key=f'budget-{n}', status=AnalysisJob.STATUS_SUCCEEDED, progress=100,
+                attempts=1, analysis=analysis, finished_at=timezone.now()
+            )
+            uploads.append(upload)
+
+        span = datetime.timedelta(days=29)
+        ModelUsage.objects.bulk_create(
+            usage_rows([user], models, usage, timezone.now() - span, span, rng), batch_size=1000
+        )
+        UserUsage.objects.bulk_create([
+            UserUsage(user=user, date=timezone.localdate() - datetime.timedelta(days=d), messages_sent=d)
+            for d in range(1, 30)
+        ])
+    rollup_metrics()
+
+    return {
+        'user': user,
+        'staff': staff,
+        'session': seeded_sessions[0],
+        'message': ChatMessage.objects.filter(session=seeded_sessions[0]).first(),
+        'file': uploads[0],
+        'job': AnalysisJob.objects.filter(user=user).first(),
+    }
+
+def disposable_session(data, messages=40):
+    """A session to delete, with messages and a rating for the delete to cascade to"""
+    from chat.models import MessageRating
+
+    session = make_session(data['user'], messages, title='Disposable', content='disposable {n}')
+    MessageRating.objects.create(message=session.messages.first(), rating=2)
+    return {'session_id': session.id}
+
+def disposable_file(data, children=3):
+    """A file to delete, with an analysis, jobs and queries for the delete to cascade to"""
+    import uuid
+
+    from files.models import AnalysisJob, FileAnalysis, FileQuery
+
+    upload = make_upload(data['user'], b'bye', 'gone.txt')
+    analysis = FileAnalysis.objects.create(
+        file_upload=upload, summary='Going', insights=[], analysis_model='openai/gpt-4', analysis_time=1.0
+    )
+    AnalysisJob.objects.bulk_create([
+        AnalysisJob(
+            user=data['user'], file_upload=upload, query=f'Question {n}', model='openai/gpt-4',
+            dedupe_key=uuid.uuid4().hex, status=AnalysisJob.STATUS_SUCCEEDED, progress=100,
+            attempts=1, analysis=analysis, finished_at=timezone.now()
+        )
+        for n in range(children)
+    ])
+    FileQuery.objects.bulk_create([
+        FileQuery(file_upload=upload, user=data['user'], query=f'Question {n}', response='Answer', model='openai/gpt-4')
+        for n in range(children)
+    ])
+    return {'file_id': upload.id}
+
+def new_upload_body(data):
+    import uuid
+
+    # New content each call, so its blob is created
+    return {'data': {'file': SimpleUploadedFile('upload.txt', uuid.uuid4().bytes, content_type='text/plain')}}
+
+# name: (URL name, method, url kwargs, request kwargs), for every URL in
+# alpha_mind/urls.py. URL kwargs and request kwargs are callables taking the
+# seeded data; they may create the objects the call needs.
+ENDPOINTS = {
+    'check-token': ('check-token', 'post', None, lambda d: json_body({'token': 'fake'})),
+    'user-profile': ('user-profile', 'get', None, None),
+    'user-profile-update': ('user-profile', 'put', None, lambda d: json_body({'display_name': 'Budget'})),
+    'user-settings': ('user-settings', 'get', None, None),
+    'user-settings-update': ('user-settings', 'put', None, lambda d: json_body({'theme': 'dark'})),
+    'user-usage': ('user-usage', 'get', None, None),
+    'send-chat': ('send-chat', 'post', None, lambda d: json_body({
+        'message': 'Hello', 'model': 'openai/gpt-4', 'session_id': str(d['session'].id)
+    })),
+    'send-chat-stream': ('send-chat-stream', 'post', None, lambda d: json_body({
+        'message': 'Hello', 'model': 'openai/gpt-4', 'session_id': str(d['session'].id)
+    })),
+    'chat-history': ('chat-history', 'get', lambda d: {'session_id': d['session'].id}, None),
+    'save-session': ('save-session', 'post', None, lambda d: json_body({
+        'title': 'Imported', 'messages': [{'role': 'user', 'content': f'row {n}'} for n in range(200)]
+    })),
+    'export-sessions': ('export-sessions', 'get', None, None),
+    'search-messages': ('search-messages', 'get', None, lambda d: {'data': {'q': 'budget'}}),
+    'chat-sessions': ('chat-sessions', 'get', None, None),
+    'session-detail': ('session-detail', 'get', lambda d: {'session_id': d['session'].id}, None),
+    'delete-session': ('delete-session', 'delete', disposable_session, None),
+    'export-session': ('export-session', 'get', lambda d: {'session_id': d['session'].id}, None),
+    'rate-message': ('rate-message', 'post', lambda d: {'message_id': d['message'].id},
+                     lambda d: json_body({'rating': 1})),
+    'file-upload': ('file-upload', 'post', None, new_upload_body),
+    'file-analyze': ('file-analyze', 'post', None, lambda d: json_body({'file_id': str(disposable_file(d)['file_id'])})),
+    'file-list': ('file-list', 'get', None, None),
+    'analysis-jobs': ('analysis-jobs', 'get', None, None),
+    'analysis-job': ('analysis-job', 'get', lambda d: {'job_id': d['job'].id}, None),
+    'file-detail': ('file-detail', 'get', lambda d: {'file_id': d['file'].id}, None),
+    'file-delete': ('file-delete', 'delete', disposable_file, None),
+    'model-list': ('model-list', 'get', None, None),
+    'switch-model': ('switch-model', 'post', None, lambda d: json_body({'model_id': 'budget/model-1'})),
+    'model-preferences': ('model-preferences', 'get', None, None),
+    'model-preferences-update': ('model-preferences', 'put', None, lambda d: json_body({
+        'fallback_models': [f'budget/model-{n}' for n in range(1, 6)]
+    })),
+    'model-usage': ('model-usage', 'get', None, None),
+    'model-usage-series': ('model-usage-series', 'get', None, lambda d: {'data': {'bucket': 'day'}}),
+    'system-metrics': ('system-metrics', 'get', None, None),
+    'prometheus-metrics': ('prometheus-metrics', 'get', None, None),
+    'slow-requests': ('slow-requests', 'get', None, None),
+}
+STAFF_ENDPOINTS = {'system-metrics', 'prometheus-metrics', 'slow-requests'}
+
+def read_all(response):
+    """Drain streaming responses so their queries are counted"""
+    from asgiref.sync import async_to_sync
+
+    if response.streaming and response.is_async:
+        async def drain():
+            return [chunk async for chunk in response.streaming_content]
+        async_to_sync(drain)()
+    elif response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+def call_endpoint(client, data, name):
+    """Call one of ENDPOINTS uncached, returning the response and its queries"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    url_name, method, url_kwargs, request_kwargs = ENDPOINTS[name]
+    url = reverse(url_name, kwargs=url_kwargs(data) if url_kwargs else None)
+    kwargs = request_kwargs(data) if request_kwargs else {}
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = read_all(getattr(client, method)(url, **kwargs))
+    return response, queries
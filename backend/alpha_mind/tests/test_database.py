@@ -0,0 +1,19 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite profile')
+class DatabaseProfileTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertGreater(pragmas['busy_timeout'], 0)
+        self.assertGreater(pragmas['mmap_size'], 0)
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.http import JsonResponse as DjangoJsonResponse
+from django.test import SimpleTestCase, override_settings
+
+from alpha_mind import engine_client, fastjson
+from alpha_mind.embedded_engine import AsyncEmbeddedEngineClient, EmbeddedEngine
+from alpha_mind.testing import engine_models, engine_service
+
+class FastJsonTests(SimpleTestCase):
+    def test_responses_match(self):
+        catalog = {'models': engine_models(20)}
+        self.assertEqual(
+            json.loads(fastjson.JsonResponse(catalog).content),
+            json.loads(DjangoJsonResponse(catalog).content)
+        )
+
+@override_settings(AI_ENGINE_MODE='http')
+class AsyncClientTests(SimpleTestCase):
+    async def fetch(self):
+        client = engine_client.get_async_client()
+        self.assertIs(engine_client.get_async_client(), client)
+        await asyncio.sleep(0)
+        return client
+
+    def test_closed_with_per_request_loop(self):
+        """Under WSGI each async view runs in a loop of its own"""
+        first = async_to_sync(self.fetch)()
+        self.assertTrue(first.client.is_closed)
+        second = async_to_sync(self.fetch)()
+        self.assertIsNot(second, first)
+        self.assertTrue(second.client.is_closed)
+
+    def test_reused_loop_keeps_client(self):
+        loop = asyncio.new_event_loop()
+        try:
+            client = loop.run_until_complete(self.fetch())
+            self.assertIs(loop.run_until_complete(self.fetch()), client)
+            self.assertFalse(client.client.is_closed)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+        self.assertTrue(client.client.is_closed)
+
+class EmbeddedEngineTests(SimpleTestCase):
+    def test_embedded_stream(self):
+        service = engine_service()  # Puts the engine on sys.path
+        from ai_engine.models import StreamChunk
+
+        async def stream_chat(request):
+            for word in ['Hello', ' world']:
+                yield StreamChunk(
+                    id='chatcmpl-test', created=0, model=request.model,
+                    choices=[{'index': 0, 'delta': {'content': word}}]
+                )
+
+        service.stream_chat = stream_chat
+        engine = EmbeddedEngine(service=service)
+        self.addCleanup(engine.close)
+        client = AsyncEmbeddedEngineClient(engine)
+        payload = {'messages': [{'role': 'user', 'content': 'Hi'}], 'model': 'openai/gpt-4'}
+
+        async def collect():
+            return [line async for line in client.stream_chat(payload)]
+
+        lines = async_to_sync(collect)()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[-1], 'data: [DONE]')
@@ -0,0 +1,69 @@
+import re
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from alpha_mind import fastjson
+from alpha_mind.instrumentation import histograms, slow_profiles
+from alpha_mind.testing import FakeEngine, TestCase, login, make_user
+from chat import views as chat_views
+
+ENGINE_LATENCY = 0.05
+
+def timing(response, name):
+    """Duration in ms and description of one Server-Timing metric"""
+    match = re.search(rf'{name};dur=([\d.]+)(?:;desc="([^"]*)")?', response['Server-Timing'])
+    return float(match.group(1)), match.group(2)
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('instrumentation')
+        self.staff = make_user('instrumentation-staff', is_staff=True)
+
+    def test_server_timing_counts_queries(self):
+        client = login(self.user)
+        client.get('/api/chat/sessions/')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/chat/sessions/')
+        db_time, description = timing(response, 'db')
+        self.assertEqual(description, f"{len(queries)} queries")
+        self.assertGreaterEqual(timing(response, 'total')[0], db_time + timing(response, 'serialize')[0])
+
+    def test_server_timing_engine_time(self):
+        engine = FakeEngine(reply='Hi', latency=ENGINE_LATENCY, usage=(1, 1))
+        self.enterContext(mock.patch.object(chat_views, 'get_async_client', engine.async_client))
+        response = login(self.user).post(
+            '/api/chat/send/', fastjson.dumps({'message': 'Hello', 'model': 'openai/gpt-4'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        engine_time, description = timing(response, 'engine')
+        self.assertEqual(description, '1 calls')
+        self.assertGreaterEqual(engine_time, ENGINE_LATENCY * 1000)
+
+    def test_prometheus_export(self):
+        histograms.reset()
+        client = login(self.user)
+        for _ in range(3):
+            client.get('/api/chat/sessions/')
+        self.assertEqual(client.get('/api/models/metrics/prometheus/').status_code, 403)
+
+        text = login(self.staff).get('/api/models/metrics/prometheus/').content.decode()
+        labels = 'method="GET",route="/api/chat/sessions/",status="200"'
+        self.assertIn(f'alpha_mind_request_duration_seconds_count{{{labels}}} 3', text)
+        self.assertIn(f'alpha_mind_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3', text)
+        self.assertIn(f'alpha_mind_request_db_queries_total{{{labels}}}', text)
+
+    @override_settings(PERF_PROFILE_SAMPLE_RATE=1.0, PERF_SLOW_REQUEST_SECONDS=0.0)
+    def test_slow_request_profiles(self):
+        slow_profiles.reset()
+        with self.assertLogs('alpha_mind.instrumentation', 'WARNING'):
+            login(self.user).get('/api/chat/sessions/')
+            data = login(self.staff).get('/api/models/metrics/slow-requests/').json()
+        captured = [entry for entry in data['requests'] if entry['route'] == '/api/chat/sessions/']
+        self.assertTrue(captured)
+        self.assertIn('function calls', captured[0]['profile'])
+        durations = [entry['duration'] for entry in data['requests']]
+        self.assertEqual(durations, sorted(durations, reverse=True))
@@ -0,0 +1,105 @@
+"""
+A fixed query budget for every API endpoint.
+
+Each URL in ``alpha_mind/urls.py`` is called against a seeded user and must
+stay within a budget that does not depend on the data volume, so an N+1
+regression fails here. A URL without a budget fails
+``test_every_url_has_a_budget``.
+"""
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from alpha_mind.testing import (
+    ENDPOINTS, STAFF_ENDPOINTS, TestCase, call_endpoint, fake_services, login, seed_endpoint_data
+)
+
+QUERY_BUDGETS = {
+    'check-token': 4,
+    'user-profile': 3,
+    'user-profile-update': 4,
+    'user-settings': 3,
+    'user-settings-update': 4,
+    'user-usage': 3,
+    'send-chat': 8,
+    'send-chat-stream': 8,
+    'chat-history': 4,
+    'save-session': 8,
+    'export-sessions': 4,
+    'search-messages': 4,
+    'chat-sessions': 3,
+    'session-detail': 3,
+    'delete-session': 9,
+    'export-session': 5,
+    'rate-message': 7,
+    'file-upload': 9,
+    'file-analyze': 7,
+    'file-list': 3,
+    'analysis-jobs': 3,
+    'analysis-job': 3,
+    'file-detail': 3,
+    'file-delete': 11,
+    'model-list': 0,
+    'switch-model': 7,
+    'model-preferences': 5,
+    'model-preferences-update': 8,
+    'model-usage': 4,
+    'model-usage-series': 3,
+    'system-metrics': 3,
+    'prometheus-metrics': 2,
+    'slow-requests': 2,
+}
+
+def url_names(patterns, namespace=None):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace != 'admin':
+                yield from url_names(pattern.url_patterns, pattern.namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+class UrlCoverageTests(SimpleTestCase):
+    def test_every_url_has_a_budget(self):
+        covered = {ENDPOINTS[name][0] for name in QUERY_BUDGETS}
+        missing = set(url_names(get_resolver().url_patterns)) - covered
+        self.assertFalse(missing, f"Endpoints without a query budget: {sorted(missing)}")
+        self.assertEqual(QUERY_BUDGETS.keys(), ENDPOINTS.keys())
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(MEDIA_ROOT=self.tmp_path))
+        self.enterContext(fake_services())
+        self.data = seed_endpoint_data(sessions=10, messages=20, files=10, usage=300)
+
+    def test_endpoint_query_budgets(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name):
+                client = login(self.data['staff'] if name in STAFF_ENDPOINTS else self.data['user'])
+                # Warm up process-wide state (imports, the model catalog) before counting
+                call_endpoint(client, self.data, name)
+                response, queries = call_endpoint(client, self.data, name)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(len(queries), budget, (
+                    f"{name} ran {len(queries)} queries (budget {budget}):\n"
+                    + '\n'.join(query['sql'][:200] for query in queries.captured_queries)
+                ))
+
+    def test_delete_cascade_budget(self):
+        """A delete costs the same queries whatever the number of rows it cascades to"""
+        client = login(self.data['user'])
+        for name in ('delete-session', 'file-delete'):
+            with self.subTest(name):
+                url_name, method, new_object, _ = ENDPOINTS[name]
+                counts = {}
+                for children in (1, 1, 50):
+                    url = reverse(url_name, kwargs=new_object(self.data, children))
+                    cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        self.assertEqual(getattr(client, method)(url).status_code, 200)
+                    counts[children] = len(queries)  # The first call warms up process-wide state
+                self.assertEqual(counts[1], counts[50], counts)
+                self.assertLessEqual(counts[1], QUERY_BUDGETS[name])
@@ -0,0 +1,101 @@
+import io
+
+from django.core.cache import cache
+
+from alpha_mind import fastjson, response_cache
+from alpha_mind.instrumentation import render_prometheus
+from alpha_mind.testing import TestCase, login, make_model, make_user
+from chat.importer import import_messages, iter_ndjson
+from chat.models import ChatMessage, ChatSession
+from gateway.models import ModelPreference
+from users.models import UserProfile, UserSettings
+
+SESSIONS = 10
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        response_cache.stats.reset()
+        self.user = make_user('response-cache')
+        UserProfile.objects.create(user=self.user, display_name='Poller')
+        UserSettings.objects.get_or_create(user=self.user)
+        ModelPreference.objects.get_or_create(user=self.user)
+        for n in range(SESSIONS):
+            ChatSession.objects.create(user=self.user, title=f'Session {n}')
+        self.client = login(self.user)
+
+    def get_json(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def put(self, url, payload):
+        return self.client.put(url, fastjson.dumps(payload), content_type='application/json')
+
+    def test_cached_poll_skips_queries(self):
+        for url in ('/api/chat/sessions/', '/api/auth/profile/', '/api/models/preferences/'):
+            with self.subTest(url=url):
+                self.client.get(url)
+                # Only the session and user lookups of authentication
+                with self.assertNumQueries(2):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_writes_invalidate(self):
+        sessions = self.get_json('/api/chat/sessions/')['sessions']
+        session = ChatSession.objects.get(id=sessions[0]['id'])
+        detail_url = f'/api/chat/sessions/{session.id}/'
+        self.assertEqual(self.get_json(detail_url)['title'], session.title)
+
+        ChatMessage.objects.create(session=session, role='user', content='Hello', token_count=3)
+        first = self.get_json('/api/chat/sessions/')['sessions'][0]
+        self.assertEqual((first['id'], first['message_count']), (str(session.id), 1))
+
+        session.refresh_from_db()
+        session.title = 'Renamed'
+        session.save()
+        self.assertEqual(self.get_json(detail_url)['title'], 'Renamed')
+
+        rows = io.BytesIO(b'{"role": "user", "content": "Imported"}\n' * 3)
+        import_messages(session, iter_ndjson(rows))
+        self.assertEqual(self.get_json('/api/chat/sessions/')['sessions'][0]['message_count'], 4)
+
+    def test_api_updates_invalidate(self):
+        self.get_json('/api/auth/profile/')
+        self.put('/api/auth/profile/', {'display_name': 'Updated'})
+        self.assertEqual(self.get_json('/api/auth/profile/')['display_name'], 'Updated')
+
+        self.get_json('/api/auth/settings/')
+        self.put('/api/auth/settings/', {'theme': 'dark'})
+        self.assertEqual(self.get_json('/api/auth/settings/')['theme'], 'dark')
+
+        model = make_model('bench/cache-fallback')
+        self.assertEqual(self.get_json('/api/models/preferences/')['fallback_models'], [])
+        self.put('/api/models/preferences/', {'fallback_models': [model.id]})
+        fallbacks = self.get_json('/api/models/preferences/')['fallback_models']
+        self.assertEqual([m['id'] for m in fallbacks], [model.id])
+
+    def test_per_user_entries(self):
+        other = make_user('response-cache-other')
+        other_client = login(other)
+        self.assertEqual(len(self.get_json('/api/chat/sessions/')['sessions']), SESSIONS)
+        self.assertEqual(self.get_json('/api/chat/sessions/', other_client)['sessions'], [])
+        # Another user's writes leave this user's entries current
+        ChatSession.objects.create(user=other, title='Other')
+        hits = response_cache.stats.snapshot()['sessions']['hits']
+        self.get_json('/api/chat/sessions/')
+        self.assertEqual(response_cache.stats.snapshot()['sessions']['hits'], hits + 1)
+
+    def test_evicted_version_outdates_entries(self):
+        self.get_json('/api/auth/settings/')
+        cache.delete(response_cache.version_key(self.user.pk, 'settings'))
+        # Entries built under an evicted version are never served again
+        UserSettings.objects.filter(user=self.user).update(language='fr')
+        self.assertEqual(self.get_json('/api/auth/settings/')['language'], 'fr')
+
+    def test_hit_ratio(self):
+        for _ in range(10):
+            self.get_json('/api/chat/sessions/')
+        stats = response_cache.stats.snapshot()['sessions']
+        self.assertEqual((stats['hits'], stats['misses']), (9, 1))
+        self.assertAlmostEqual(stats['hit_ratio'], 0.9)
+        self.assertIn('alpha_mind_response_cache_hits_total{resource="sessions"} 9', render_prometheus())
@@ -0,0 +1,217 @@
+"""
+Streaming export of chat sessions.
+
+Sessions and messages are read with server-side cursors
+(``.iterator(chunk_size=...)``) and encoded as they are fetched, so memory
+stays flat however many messages are exported. Formats:
+
+``ndjson``
+    One JSON object per line. Message lines use the import format (role,
+    content, model, token_count, created_at), so a single-session export can
+    be posted back to /api/chat/save/. Exports of several sessions put a
+    ``{"type": "session", ...}`` line before each session's messages.
+``json`` / ``markdown``
+    A zip archive with one JSON or Markdown file per session.
+
+The streams are sync generators. Under ASGI, StreamingHttpResponse would
+collect a sync iterator into a list before sending the first byte, so ASGI
+requests get ``async_stream()`` instead, which reads the same generator a
+buffer at a time through ``sync_to_async``.
+"""
+
+import itertools
+import zipfile
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.utils.text import slugify
+
+from alpha_mind import fastjson
+from .models import ChatMessage
+
+EXPORT_CHUNK_SIZE = 2000
+# Sessions whose messages are read in one scan
+EXPORT_SESSION_BATCH = 500
+EXPORT_BUFFER_SIZE = 64 * 1024
+EXPORT_FORMATS = ('ndjson', 'json', 'markdown')
+
+SESSION_FIELDS = ('id', 'title', 'model', 'created_at', 'updated_at')
+MESSAGE_FIELDS = ('role', 'content', 'model', 'token_count', 'created_at')
+
+def iter_sessions(sessions, chunk_size=EXPORT_CHUNK_SIZE, batch_size=EXPORT_SESSION_BATCH):
+    """Yield ``(session, messages)`` pairs for a ChatSession queryset.
+
+    Sessions are read ``batch_size`` at a time ordered by id, and the
+    messages of each batch in one scan ordered by session id, consumed in
+    step with their session. Each ``messages`` iterator must be exhausted
+    before the next pair. Scanning only the ids of sessions already read
+    keeps the two in step when sessions are deleted during the export.
+    """
+    rows = sessions.order_by('id').values(*SESSION_FIELDS).iterator(chunk_size=chunk_size)
+    while batch := list(itertools.islice(rows, batch_size)):
+        messages = (
+            ChatMessage.objects.filter(session_id__in=[session['id'] for session in batch])
+            .order_by('session_id', 'created_at', 'id')
+            .values('session_id', *MESSAGE_FIELDS)
+            .iterator(chunk_size=chunk_size)
+        )
+        message = next(messages, None)
+
+        def session_messages(session_id):
+            nonlocal message
+            while message is not None and message['session_id'] == session_id:
+                yield message
+                message = next(messages, None)
+
+        for session in batch:
+            yield session, session_messages(session['id'])
+
+def serialize_session(session):
+    return {
+        'id': str(session['id']),
+        'title': session['title'],
+        'model': session['model'],
+        'created_at': session['created_at'].isoformat(),
+        'updated_at': session['updated_at'].isoformat()
+    }
+
+def serialize_message(message):
+    # Full-precision timestamps, so re-imported messages keep their order
+    return {
+        'role': message['role'],
+        'content': message['content'],
+        'model': message['model'],
+        'token_count': message['token_count'],
+        'created_at': message['created_at'].isoformat()
+    }
+
+def session_filename(session, extension):
+    slug = slugify(session['title'])[:50] or 'session'
+    return f"{session['created_at']:%Y-%m-%d}-{slug}-{str(session['id'])[:8]}.{extension}"
+
+def buffered(chunks, size=EXPORT_BUFFER_SIZE):
+    """Coalesce small chunks into writes of roughly ``size`` bytes"""
+    parts = []
+    length = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield b''.join(parts)
+
+async def async_stream(chunks, size=EXPORT_BUFFER_SIZE):
+    """Async iterator over a sync byte stream, a buffer per ``sync_to_async`` call.
+
+    Every call runs on the same thread, so the database cursors the stream
+    reads from stay on the connection that opened them.
+    """
+    chunks = iter(chunks)
+
+    def next_buffer():
+        parts = []
+        length = 0
+        for chunk in chunks:
+            parts.append(chunk)
+            length += len(chunk)
+            if length >= size:
+                break
+        return b''.join(parts) if parts else None
+
+    try:
+        while (data := await sync_to_async(next_buffer)()) is not None:
+            yield data
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+def gzip_stream(chunks, level=6):
+    """Compress a byte stream into gzip format on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def iter_ndjson(sessions, session_lines=True):
+    for session, messages in iter_sessions(sessions):
+        if session_lines:
+            yield fastjson.dumps({'type': 'session', **serialize_session(session)}) + b'\n'
+        for message in messages:
+            yield fastjson.dumps(serialize_message(message)) + b'\n'
+
+def render_json(session, messages):
+    yield b'{"session": ' + fastjson.dumps(serialize_session(session)) + b', "messages": ['
+    separator = b''
+    for message in messages:
+        yield separator + fastjson.dumps(serialize_message(message))
+        separator = b', '
+    yield b']}\n'
+
+def render_markdown(session, messages):
+    yield (
+        f"# {session['title']}\n\n"
+        f"_Model: {session['model']} · Created: {session['created_at']:%Y-%m-%d %H:%M}_\n\n"
+    ).encode('utf-8')
+    for message in messages:
+        yield (
+            f"### {message['role'].title()} · {message['created_at']:%Y-%m-%d %H:%M:%S}\n\n"
+            f"{message['content']}\n\n"
+        ).encode('utf-8')
+
+class StreamBuffer:
+    """Write-only file object that collects what zipfile writes to it"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+def iter_zip(sessions, render, extension):
+    """Stream a zip archive with one rendered file per session"""
+    buffer = StreamBuffer()
+    # The buffer is not seekable, so zipfile writes data descriptors
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for session, messages in iter_sessions(sessions):
+            with archive.open(session_filename(session, extension), 'w', force_zip64=True) as entry:
+                for part in render(session, messages):
+                    entry.write(part)
+                    if buffer.size >= EXPORT_BUFFER_SIZE:
+                        yield buffer.drain()
+    yield buffer.drain()
+
+def export_sessions(sessions, export_format='ndjson', compress=False, single=False):
+    """Return ``(chunks, content_type, extension)`` for a streaming export.
+
+    ``compress`` gzips NDJSON output (zip archives are already deflated).
+    ``single`` omits the session lines from NDJSON, leaving an importable
+    list of messages.
+    """
+    if export_format == 'ndjson':
+        chunks = buffered(iter_ndjson(sessions, session_lines=not single))
+        if compress:
+            return gzip_stream(chunks), 'application/gzip', 'ndjson.gz'
+        return chunks, 'application/x-ndjson', 'ndjson'
+    if export_format == 'json':
+        return iter_zip(sessions, render_json, 'json'), 'application/zip', 'zip'
+    if export_format == 'markdown':
+        return iter_zip(sessions, render_markdown, 'md'), 'application/zip', 'zip'
+    raise ValueError(f"Unknown export format: {export_format}")
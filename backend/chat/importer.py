@@ -0,0 +1,189 @@
+"""
+Streaming bulk import of chat messages.
+
+Request bodies are parsed incrementally (NDJSON line by line, JSON arrays one
+element at a time), each row is validated as it arrives, and messages are
+written with ``bulk_create`` in fixed-size batches. Memory stays bounded by
+the batch size rather than the size of the import, and a JSON array element
+may not grow past ``settings.CHAT_IMPORT_MAX_ELEMENT_SIZE``.
+"""
+
+import codecs
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from alpha_mind import fastjson
+from alpha_mind.response_cache import invalidate
+from .models import ChatSession, ChatMessage
+
+IMPORT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+
+VALID_ROLES = {choice[0] for choice in ChatMessage._meta.get_field('role').choices}
+MODEL_MAX_LENGTH = ChatMessage._meta.get_field('model').max_length
+
+class ImportValidationError(ValueError):
+    """Raised for malformed or invalid import rows"""
+
+    def __init__(self, message, row=None):
+        if row is not None:
+            message = f"Row {row}: {message}"
+        super().__init__(message)
+
+def iter_chunks(stream, size=READ_CHUNK_SIZE):
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+def iter_ndjson(lines):
+    """Parse newline-delimited JSON, skipping blank lines"""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield fastjson.loads(line)
+        except fastjson.JSONDecodeError as e:
+            raise ImportValidationError(f"Invalid JSON: {str(e)}", number) from e
+
+def iter_json_array(chunks, max_element_size=None):
+    """Incrementally parse the elements of a top-level JSON array.
+
+    Elements longer than ``max_element_size`` characters are rejected, as
+    soon as that much of one is buffered, so a malformed or oversized
+    element cannot buffer the rest of the body.
+    """
+    if max_element_size is None:
+        max_element_size = settings.CHAT_IMPORT_MAX_ELEMENT_SIZE
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+    number = 0
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n' + (',' if started else ''):
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ImportValidationError("Unexpected end of JSON array")
+            fill()
+            continue
+
+        if not started:
+            if buffer[pos] != '[':
+                raise ImportValidationError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ImportValidationError(f"Invalid JSON: {str(e)}", number + 1) from e
+            if len(buffer) - pos > max_element_size:
+                raise ImportValidationError(
+                    f"Element is invalid or larger than {max_element_size} characters", number + 1
+                ) from e
+            fill()  # The element may continue in the next chunk
+            continue
+        number += 1
+        if end - pos > max_element_size:
+            raise ImportValidationError(f"Element is larger than {max_element_size} characters", number)
+        pos = end
+        yield element
+
+def parse_timestamp(value, row):
+    try:
+        created_at = datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise ImportValidationError(f"Invalid created_at: {value!r}", row) from e
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at, dt_timezone.utc)
+    return created_at
+
+def validate_message(data, row):
+    """Validate one imported row and return ChatMessage field values"""
+    if not isinstance(data, dict):
+        raise ImportValidationError("Expected a JSON object", row)
+    role = data.get('role')
+    if role not in VALID_ROLES:
+        raise ImportValidationError(f"Invalid role: {role!r}", row)
+    content = data.get('content')
+    if not isinstance(content, str):
+        raise ImportValidationError("content must be a string", row)
+    token_count = data.get('token_count')
+    if token_count is not None and (not isinstance(token_count, int) or isinstance(token_count, bool)):
+        raise ImportValidationError("token_count must be an integer", row)
+    model = data.get('model') or ''
+    if not isinstance(model, str) or len(model) > MODEL_MAX_LENGTH:
+        raise ImportValidationError("Invalid model", row)
+
+    fields = {'role': role, 'content': content, 'token_count': token_count, 'model': model}
+    if data.get('created_at') is not None:
+        fields['created_at'] = parse_timestamp(data['created_at'], row)
+    return fields
+
+def import_messages(session, rows, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and bulk insert rows into a session.
+
+    Call inside a transaction so a bad row rolls back the whole import.
+    Rows without ``created_at`` get increasing timestamps so their order is
+    preserved. Returns import statistics.
+    """
+    start_time = time.perf_counter()
+    base_time = timezone.now()
+    batch = []
+    count = 0
+    tokens = 0
+    last_message_at = None
+
+    for row, data in enumerate(rows, start=1):
+        fields = validate_message(data, row)
+        fields.setdefault('created_at', base_time + timedelta(microseconds=row))
+        batch.append(ChatMessage(session=session, **fields))
+        count += 1
+        tokens += fields['token_count'] or 0
+        if last_message_at is None or fields['created_at'] > last_message_at:
+            last_message_at = fields['created_at']
+
+        if len(batch) >= batch_size:
+            ChatMessage.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        ChatMessage.objects.bulk_create(batch)
+
+    # bulk_create bypasses the counter and cache signals
+    if count:
+        ChatSession.add_message_stats(session.id, count, tokens, last_message_at)
+        invalidate(session.user_id, 'sessions')
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        'imported': count,
+        'elapsed': round(elapsed, 3),
+        'rows_per_second': round(count / elapsed) if elapsed > 0 else count
+    }
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.search import SEARCH_BATCH_SIZE, get_search_backend
+
+class Command(BaseCommand):
+    help = "Rebuild the chat message full-text search index in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SEARCH_BATCH_SIZE,
+            help=f"Messages indexed per batch (default {SEARCH_BATCH_SIZE})"
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        start_time = time.perf_counter()
+
+        def progress(total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Indexed {total} messages")
+
+        total = backend.rebuild(options['batch_size'], progress)
+        elapsed = time.perf_counter() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt search index with {backend.__class__.__name__}: "
+            f"{total} messages in {elapsed:.1f}s"
+        ))
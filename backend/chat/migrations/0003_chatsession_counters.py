@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Fill the session counters from existing messages in one UPDATE"""
+    ChatSession = apps.get_model("chat", "ChatSession")
+    ChatMessage = apps.get_model("chat", "ChatMessage")
+
+    messages = (
+        ChatMessage.objects.filter(session=OuterRef("pk")).order_by().values("session")
+    )
+    ChatSession.objects.update(
+        message_count=Coalesce(
+            Subquery(messages.annotate(c=Count("pk")).values("c")),
+            0,
+            output_field=IntegerField(),
+        ),
+        total_tokens=Coalesce(
+            Subquery(messages.annotate(t=Sum("token_count")).values("t")),
+            0,
+            output_field=IntegerField(),
+        ),
+        last_message_at=Subquery(messages.annotate(m=Max("created_at")).values("m")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0002_chatmessage_session_created_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatsession",
+            name="last_message_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="message_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="chatsession",
+            name="total_tokens",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["user", "-updated_at", "id"],
+                name="chat_session_user_updated_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:10
+
+from django.db import migrations
+
+# A frozen copy of chat.search.SQLITE_SCHEMA; later changes to the index go
+# in migrations of their own
+SQLITE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS chat_message_search (
+        id INTEGER PRIMARY KEY,
+        message_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_fts USING fts5(
+        content,
+        message_id UNINDEXED,
+        session_id UNINDEXED,
+        user_id UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_insert AFTER INSERT ON chat_chatmessage BEGIN
+        INSERT INTO chat_message_search (message_id) VALUES (new.id);
+        INSERT INTO chat_message_fts (rowid, content, message_id, session_id, user_id)
+        SELECT (SELECT id FROM chat_message_search WHERE message_id = new.id),
+               new.content, new.id, new.session_id, s.user_id
+        FROM chat_chatsession s WHERE s.id = new.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_update AFTER UPDATE OF content ON chat_chatmessage BEGIN
+        UPDATE chat_message_fts SET content = new.content
+        WHERE rowid = (SELECT id FROM chat_message_search WHERE message_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_delete AFTER DELETE ON chat_chatmessage BEGIN
+        DELETE FROM chat_message_fts
+        WHERE rowid = (SELECT id FROM chat_message_search WHERE message_id = old.id);
+        DELETE FROM chat_message_search WHERE message_id = old.id;
+    END
+    """,
+)
+
+SQLITE_FORWARD = SQLITE_SCHEMA + (
+    # Index existing messages
+    """
+    INSERT INTO chat_message_search (message_id) SELECT id FROM chat_chatmessage
+    """,
+    """
+    INSERT INTO chat_message_fts (rowid, content, message_id, session_id, user_id)
+    SELECT s.id, m.content, m.id, m.session_id, cs.user_id
+    FROM chat_message_search s
+    JOIN chat_chatmessage m ON m.id = s.message_id
+    JOIN chat_chatsession cs ON cs.id = m.session_id
+    """,
+)
+
+SQLITE_REVERSE = (
+    "DROP TRIGGER IF EXISTS chat_message_fts_insert",
+    "DROP TRIGGER IF EXISTS chat_message_fts_update",
+    "DROP TRIGGER IF EXISTS chat_message_fts_delete",
+    "DROP TABLE IF EXISTS chat_message_fts",
+    "DROP TABLE IF EXISTS chat_message_search",
+)
+
+POSTGRES_FORWARD = (
+    """
+    ALTER TABLE chat_chatmessage ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """,
+    "CREATE INDEX chat_msg_search_vector_idx ON chat_chatmessage USING GIN (search_vector)",
+)
+
+POSTGRES_REVERSE = (
+    "DROP INDEX IF EXISTS chat_msg_search_vector_idx",
+    "ALTER TABLE chat_chatmessage DROP COLUMN IF EXISTS search_vector",
+)
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, ())
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0004_chatmessage_created_at_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_statements({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE}),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
 class ChatSession(models.Model):
@@ -9,12 +12,50 @@ class ChatSession(models.Model):
     model = models.CharField(max_length=100, default='gpt-3.5-turbo')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized from messages, maintained by chat.signals
+    message_count = models.IntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    total_tokens = models.BigIntegerField(default=0)
     
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # Keyset pagination of a user's sessions by recent activity
+            models.Index(fields=['user', '-updated_at', 'id'], name='chat_session_user_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
+    
+    @classmethod
+    def add_message_stats(cls, session_id, count, tokens, last_message_at):
+        """Atomically account for new messages in the session counters"""
+        cls.objects.filter(pk=session_id).update(
+            message_count=F('message_count') + count,
+            total_tokens=F('total_tokens') + tokens,
+            last_message_at=last_message_at,
+            updated_at=timezone.now()
+        )
+    
+    @classmethod
+    def remove_message_stats(cls, session_id, count, tokens):
+        """Atomically account for deleted messages in the session counters"""
+        latest = ChatMessage.objects.filter(session=OuterRef('pk')).order_by('-created_at')
+        cls.objects.filter(pk=session_id).update(
+            message_count=F('message_count') - count,
+            total_tokens=F('total_tokens') - tokens,
+            last_message_at=Subquery(latest.values('created_at')[:1])
+        )
+
+    @classmethod
+    def recount_message_stats(cls, session_ids):
+        """Recompute the counters of several sessions from their messages in one query"""
+        messages = ChatMessage.objects.filter(session=OuterRef('pk')).order_by().values('session')
+        cls.objects.filter(pk__in=session_ids).update(
+            message_count=Coalesce(Subquery(messages.annotate(n=Count('pk')).values('n')), 0),
+            total_tokens=Coalesce(Subquery(messages.annotate(n=Sum('token_count')).values('n')), 0),
+            last_message_at=Subquery(messages.annotate(n=Max('created_at')).values('n'))
+        )
 
 class ChatMessage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -27,10 +68,15 @@ class ChatMessage(models.Model):
     content = models.TextField()
     token_count = models.IntegerField(null=True, blank=True)
     model = models.CharField(max_length=100, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so bulk imports can keep their own ordering
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination over (created_at, id) within a session
+            models.Index(fields=['session', 'created_at', 'id'], name='chat_msg_session_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.role}: {self.content[:50]}..."
@@ -0,0 +1,278 @@
+"""
+Full-text search over chat messages.
+
+On SQLite messages are indexed in the ``chat_message_fts`` FTS5 table and
+ranked with BM25. On PostgreSQL they are indexed through the generated
+``chat_chatmessage.search_vector`` tsvector column and a GIN index, and
+ranked with ``ts_rank_cd``. Both are created by migration 0005 and kept in
+sync by the database itself (triggers on SQLite, the generated column on
+PostgreSQL), so bulk imports and cascading deletes are indexed too. The
+``rebuild_search_index`` management command recreates and repopulates the
+SQLite index, and ``migrate`` does the same when a migration has dropped
+its triggers.
+
+Other database backends fall back to an unranked ``icontains`` scan.
+"""
+
+import html
+from abc import ABC, abstractmethod
+
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+from .models import ChatMessage
+
+SEARCH_BATCH_SIZE = 5000
+SNIPPET_WORDS = 16
+
+# Highlight markers; the snippet is HTML-escaped and these become <mark> tags
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+# Created by migration 0005 and recreated by rebuild(). Maps message ids to
+# the integer rowids FTS5 needs; chat_chatmessage has a UUID key, and its
+# implicit rowid is not stable across VACUUM
+SQLITE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS chat_message_search (
+        id INTEGER PRIMARY KEY,
+        message_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_message_fts USING fts5(
+        content,
+        message_id UNINDEXED,
+        session_id UNINDEXED,
+        user_id UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_insert AFTER INSERT ON chat_chatmessage BEGIN
+        INSERT INTO chat_message_search (message_id) VALUES (new.id);
+        INSERT INTO chat_message_fts (rowid, content, message_id, session_id, user_id)
+        SELECT (SELECT id FROM chat_message_search WHERE message_id = new.id),
+               new.content, new.id, new.session_id, s.user_id
+        FROM chat_chatsession s WHERE s.id = new.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_update AFTER UPDATE OF content ON chat_chatmessage BEGIN
+        UPDATE chat_message_fts SET content = new.content
+        WHERE rowid = (SELECT id FROM chat_message_search WHERE message_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_message_fts_delete AFTER DELETE ON chat_chatmessage BEGIN
+        DELETE FROM chat_message_fts
+        WHERE rowid = (SELECT id FROM chat_message_search WHERE message_id = old.id);
+        DELETE FROM chat_message_search WHERE message_id = old.id;
+    END
+    """,
+)
+
+SQLITE_TRIGGERS = ('chat_message_fts_insert', 'chat_message_fts_update', 'chat_message_fts_delete')
+
+class InvalidQuery(ValueError):
+    """Raised for empty or unusable search queries"""
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query that matches all of its terms.
+
+    Each term is quoted so FTS5 syntax in user input is matched literally;
+    a trailing ``*`` is kept as a prefix search.
+    """
+    terms = []
+    for term in query.split():
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"' + ('*' if prefix else ''))
+    if not terms:
+        raise InvalidQuery("Search query is empty")
+    return ' '.join(terms)
+
+def format_snippet(snippet):
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+class BaseSearchBackend(ABC):
+    @abstractmethod
+    def search(self, user, query, session_id=None, limit=20, offset=0):
+        """Return up to ``limit`` ranked ``(message_id, score, snippet)`` tuples"""
+
+    def rebuild(self, batch_size=SEARCH_BATCH_SIZE, progress=None):
+        """Rebuild the index from chat_chatmessage, returning the rows indexed"""
+        return 0
+
+    def db_value(self, value):
+        return ChatMessage._meta.pk.get_db_prep_value(value, connection)
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 index with BM25 ranking"""
+
+    def search(self, user, query, session_id=None, limit=20, offset=0):
+        sql = (
+            "SELECT f.message_id, bm25(chat_message_fts) AS score, "
+            f"snippet(chat_message_fts, 0, %s, %s, '…', {SNIPPET_WORDS}) "
+            "FROM chat_message_fts f "
+            "WHERE chat_message_fts MATCH %s AND f.user_id = %s"
+        )
+        params = [MARK_START, MARK_END, build_match_query(query), user.id]
+        if session_id is not None:
+            sql += " AND f.session_id = %s"
+            params.append(self.db_value(session_id))
+        sql += " ORDER BY score, f.message_id LIMIT %s OFFSET %s"
+        params += [limit, offset]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25() is lower for better matches; negate so higher is better
+            return [(message_id, -score, format_snippet(snippet))
+                    for message_id, score, snippet in cursor.fetchall()]
+
+    def missing_triggers(self):
+        """Triggers of an existing index that are gone, e.g. after a table remake"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT type, name FROM sqlite_master WHERE name = 'chat_message_search' "
+                "OR (type = 'trigger' AND tbl_name = 'chat_chatmessage')"
+            )
+            objects = {name for _, name in cursor.fetchall()}
+        if 'chat_message_search' not in objects:
+            return []  # Migration 0005 has not run
+        return [name for name in SQLITE_TRIGGERS if name not in objects]
+
+    def rebuild(self, batch_size=SEARCH_BATCH_SIZE, progress=None):
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Migrations that remake chat_chatmessage on SQLite drop its triggers
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            cursor.execute("DELETE FROM chat_message_fts")
+            cursor.execute("DELETE FROM chat_message_search")
+            total = 0
+            last_id = None
+            while True:
+                # Keyset scan over the primary key, one batch at a time
+                rows = ChatMessage.objects.order_by('id')
+                if last_id is not None:
+                    rows = rows.filter(id__gt=last_id)
+                batch = list(rows.values_list('id', 'session_id', 'session__user_id', 'content')[:batch_size])
+                if not batch:
+                    break
+                cursor.executemany(
+                    "INSERT INTO chat_message_search (message_id) VALUES (%s)",
+                    [(self.db_value(row[0]),) for row in batch]
+                )
+                cursor.executemany(
+                    "INSERT INTO chat_message_fts (rowid, content, message_id, session_id, user_id) "
+                    "SELECT s.id, %s, %s, %s, %s FROM chat_message_search s WHERE s.message_id = %s",
+                    [
+                        (content, self.db_value(message_id), self.db_value(session_id), user_id,
+                         self.db_value(message_id))
+                        for message_id, session_id, user_id, content in batch
+                    ]
+                )
+                total += len(batch)
+                last_id = batch[-1][0]
+                if progress:
+                    progress(total)
+            cursor.execute("INSERT INTO chat_message_fts (chat_message_fts) VALUES ('optimize')")
+        return total
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector column with a GIN index, ranked by cover density"""
+
+    def search(self, user, query, session_id=None, limit=20, offset=0):
+        if not query.strip():
+            raise InvalidQuery("Search query is empty")
+        sql = (
+            "SELECT m.id, ts_rank_cd(m.search_vector, q) AS score, "
+            "ts_headline('english', m.content, q, %s) "
+            "FROM chat_chatmessage m "
+            "JOIN chat_chatsession s ON s.id = m.session_id, "
+            "websearch_to_tsquery('english', %s) q "
+            "WHERE m.search_vector @@ q AND s.user_id = %s"
+        )
+        options = f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=5"
+        params = [options, query, user.id]
+        if session_id is not None:
+            sql += " AND m.session_id = %s"
+            params.append(session_id)
+        sql += " ORDER BY score DESC, m.id LIMIT %s OFFSET %s"
+        params += [limit, offset]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(message_id, score, format_snippet(snippet))
+                    for message_id, score, snippet in cursor.fetchall()]
+
+    def rebuild(self, batch_size=SEARCH_BATCH_SIZE, progress=None):
+        # search_vector is a generated column, only the index can be rebuilt
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX chat_msg_search_vector_idx")
+        return ChatMessage.objects.count()
+
+class FallbackSearchBackend(BaseSearchBackend):
+    """Unranked substring scan for databases without a full-text index"""
+
+    def search(self, user, query, session_id=None, limit=20, offset=0):
+        if not query.strip():
+            raise InvalidQuery("Search query is empty")
+        messages = ChatMessage.objects.filter(session__user=user, content__icontains=query)
+        if session_id is not None:
+            messages = messages.filter(session_id=session_id)
+        rows = messages.order_by('-created_at', 'id').values_list('id', 'content')[offset:offset + limit]
+        return [(message_id, 0.0, html.escape(content[:200])) for message_id, content in rows]
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+def get_search_backend():
+    """Return the search backend for the default database"""
+    return BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+def restore_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate handler: rebuild the SQLite index if its triggers are gone.
+
+    SQLite cannot alter most columns in place, so Django migrations remake
+    chat_chatmessage and drop its triggers; messages written since are
+    missing from the index.
+    """
+    if using != DEFAULT_DB_ALIAS or connection.vendor != 'sqlite':
+        return
+    backend = SQLiteSearchBackend()
+    if backend.missing_triggers():
+        backend.rebuild()
+
+def search_messages(user, query, session_id=None, limit=20, offset=0):
+    """Search a user's messages and return ranked result dicts.
+
+    Fetches ``limit + 1`` hits to tell whether there is another page; returns
+    ``(results, has_more)``.
+    """
+    hits = get_search_backend().search(user, query, session_id, limit + 1, offset)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    messages = ChatMessage.objects.filter(
+        id__in=[message_id for message_id, _, _ in hits]
+    ).select_related('session').only(
+        'id', 'role', 'created_at', 'session__id', 'session__title'
+    ).in_bulk()
+    results = []
+    for message_id, score, snippet in hits:
+        message = messages.get(ChatMessage._meta.pk.to_python(message_id))
+        if message is None:
+            continue  # Deleted since the search ran
+        results.append({
+            'message_id': str(message.id),
+            'session_id': str(message.session.id),
+            'session_title': message.session.title,
+            'role': message.role,
+            'created_at': message.created_at.isoformat(),
+            'score': score,
+            'snippet': snippet
+        })
+    return results, has_more
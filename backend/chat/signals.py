@@ -0,0 +1,62 @@
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from alpha_mind.response_cache import invalidate
+from .models import ChatSession, ChatMessage
+
+@lru_cache(maxsize=10000)
+def session_user_id(session_id):
+    # Sessions never change owner
+    return ChatSession.objects.filter(pk=session_id).values_list('user_id', flat=True).first()
+
+def session_owner(message):
+    """User id of a message's session, without a query when the session is loaded"""
+    if ChatMessage.session.is_cached(message):
+        return message.session.user_id
+    return session_user_id(message.session_id)
+
+@receiver(post_save, sender=ChatMessage)
+def message_saved(sender, instance, created, raw=False, **kwargs):
+    """Count new messages on their session"""
+    if created and not raw:
+        ChatSession.add_message_stats(
+            instance.session_id, 1, instance.token_count or 0, instance.created_at
+        )
+        invalidate(session_owner(instance), 'sessions')
+
+@receiver(post_delete, sender=ChatMessage)
+def message_deleted(sender, instance, origin=None, **kwargs):
+    """Remove deleted messages from their session's counters.
+
+    Only a message deleted on its own updates its session in place. The
+    sessions of a queryset's messages are recounted once after the delete,
+    and messages cascaded from a session (or its user) need nothing: the
+    session goes with them.
+    """
+    if isinstance(origin, ChatMessage):
+        ChatSession.remove_message_stats(instance.session_id, 1, instance.token_count or 0)
+        invalidate(session_owner(instance), 'sessions')
+    elif isinstance(origin, QuerySet) and origin.model is ChatMessage:
+        recount_after_delete(origin, instance.session_id)
+
+def recount_after_delete(origin, session_id):
+    """Recount a session once the bulk delete ``origin`` has committed"""
+    pending = getattr(origin, '_recount_sessions', None)
+    if pending is None:
+        pending = origin._recount_sessions = set()
+        transaction.on_commit(lambda: recount_sessions(pending))
+    pending.add(session_id)
+
+def recount_sessions(session_ids):
+    ChatSession.recount_message_stats(session_ids)
+    for user_id in set(ChatSession.objects.filter(pk__in=session_ids).values_list('user_id', flat=True)):
+        invalidate(user_id, 'sessions')
+
+@receiver(post_save, sender=ChatSession)
+@receiver(post_delete, sender=ChatSession)
+def session_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, 'sessions')
@@ -0,0 +1,29 @@
+from alpha_mind.testing import TestCase, login, make_session, make_user
+from chat.models import ChatMessage
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('history')
+        self.client = login(self.user)
+        self.session = make_session(self.user, messages=5)
+        self.url = f'/api/chat/history/{self.session.id}/'
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['messages']), 5)
+        etag = response['ETag']
+        for header, status in [
+            (etag, 304), (f'"other", {etag}', 304), (f'W/{etag}', 304), ('*', 304),
+            ('"other"', 200), (f'junk{etag}', 200),
+        ]:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        # Another page of the same session is another representation
+        self.assertEqual(self.client.get(self.url, {'limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        ChatMessage.objects.create(session=self.session, role='user', content='New')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
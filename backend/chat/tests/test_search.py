@@ -0,0 +1,58 @@
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from alpha_mind.testing import TestCase, login, make_session, make_user
+from chat.importer import import_messages
+from chat.models import ChatMessage
+from chat.search import get_search_backend
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('search')
+        self.client = login(self.user)
+
+    def search(self, client=None, **params):
+        return (client or self.client).get('/api/chat/search/', {'q': 'zeppelin', **params}).json().get('results')
+
+    def test_index_follows_writes(self):
+        session = make_session(self.user, title='Fresh')
+        ChatMessage.objects.create(session=session, role='user', content='zeppelin aerodynamics')
+        with transaction.atomic():
+            import_messages(session, [{'role': 'assistant', 'content': 'zeppelins float nicely'}])
+
+        self.assertEqual(len(self.search()), 2)  # Porter stemming matches the plural
+        self.assertEqual(len(self.search(session_id=str(session.id))), 2)
+        self.assertTrue(self.search(q='zep*'))
+        self.assertFalse(self.search(q='"'))
+
+        other = login(make_user('search-other'))
+        self.assertEqual(self.search(client=other), [])
+
+        session.delete()
+        self.assertEqual(self.search(), [])
+
+    def test_rebuild_command(self):
+        for n in range(5):
+            make_session(self.user, messages=40, content=f'session {n} revenue report, part {{n}}')
+        backend = get_search_backend()
+        before = backend.search(self.user, 'revenue', limit=5)
+        self.assertEqual(len(before), 5)
+        call_command('rebuild_search_index', batch_size=30, verbosity=0)
+        self.assertEqual(backend.search(self.user, 'revenue', limit=5), before)
+
+    def test_migrate_restores_dropped_triggers(self):
+        session = make_session(self.user)
+        backend = get_search_backend()
+        with connection.cursor() as cursor:
+            # As SQLite's table remake in an AlterField migration leaves it
+            cursor.execute("DROP TRIGGER chat_message_fts_insert")
+        self.assertEqual(backend.missing_triggers(), ['chat_message_fts_insert'])
+        ChatMessage.objects.create(session=session, role='user', content='zeppelin')
+        self.assertEqual(self.search(), [])
+
+        call_command('migrate', verbosity=0)
+        self.assertEqual(backend.missing_triggers(), [])
+        self.assertEqual(len(self.search()), 1)
+        ChatMessage.objects.create(session=session, role='user', content='another zeppelin')
+        self.assertEqual(len(self.search()), 2)
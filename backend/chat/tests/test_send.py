@@ -0,0 +1,77 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory
+
+from alpha_mind import fastjson
+from alpha_mind.testing import FakeEngine, TestCase, login, make_session, make_user
+from chat import views as chat_views
+from chat.models import ChatMessage
+
+URLS = ['/api/chat/send/', '/api/chat/send/stream/']
+
+class SendChatTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('send')
+        self.client = login(self.user)
+        self.engine = FakeEngine(reply='Hi', usage=(10, 2))
+        self.enterContext(mock.patch.object(chat_views, 'get_async_client', self.engine.async_clients()))
+        self.recorded = []
+        self.enterContext(mock.patch.object(
+            chat_views, 'record_usage', lambda user_id, **fields: self.recorded.append(fields)
+        ))
+
+    def test_prologue_shared(self):
+        for url in URLS:
+            with self.subTest(url=url):
+                response = self.client.post(url, b'{', content_type='application/json')
+                self.assertEqual(response.json(), {'error': 'Invalid JSON'})
+                response = self.client.post(url, fastjson.dumps({'model': 'openai/gpt-4'}), content_type='application/json')
+                self.assertEqual(response.json(), {'error': 'Message is required'})
+        self.assertEqual(ChatMessage.objects.count(), 0)
+        self.assertEqual(self.recorded, [])
+
+    def test_stream_disconnect_records_usage(self):
+        session = make_session(self.user)
+        user_message = ChatMessage.objects.create(session=session, role='user', content='Hello')
+        payload = {'messages': [{'role': 'user', 'content': 'Hello'}], 'model': 'openai/gpt-4'}
+
+        async def disconnect_after_usage():
+            events = chat_views.SendChatStreamView().stream_events(session, user_message, 'openai/gpt-4', payload)
+            received = [await anext(events) for _ in range(3)]  # Session, delta and usage
+            await events.aclose()
+            return received
+
+        self.assertIn(b'"usage"', async_to_sync(disconnect_after_usage)()[-1])
+        [fields] = self.recorded
+        self.assertEqual((fields['input_tokens'], fields['output_tokens']), (10, 2))
+        self.assertEqual((fields['success'], fields['error_message']), (False, 'Client disconnected'))
+        self.assertFalse(session.messages.filter(role='assistant').exists())
+
+    def test_cancelled_send_records_usage(self):
+        request = AsyncRequestFactory().post(
+            URLS[0], fastjson.dumps({'message': 'Hello', 'model': 'openai/gpt-4'}), content_type='application/json'
+        )
+
+        async def auser():
+            return self.user
+
+        request.auser = auser
+        with mock.patch.object(chat_views.SendChatView, 'get_ai_response', side_effect=asyncio.CancelledError):
+            with self.assertRaises(asyncio.CancelledError):
+                async_to_sync(chat_views.SendChatView().post)(request)
+        [fields] = self.recorded
+        self.assertEqual((fields['success'], fields['error_message']), (False, 'Client disconnected'))
+
+    def test_usage_recorded_once(self):
+        body = fastjson.dumps({'message': 'Hello', 'model': 'openai/gpt-4'})
+        self.assertEqual(self.client.post(URLS[0], body, content_type='application/json').status_code, 200)
+        response = self.client.post(URLS[1], body, content_type='application/json')
+
+        async def drain():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertTrue(async_to_sync(drain)().endswith(b'data: [DONE]\n\n'))
+        self.assertEqual([(f['success'], f['input_tokens'], f['output_tokens']) for f in self.recorded], [(True, 10, 2)] * 2)
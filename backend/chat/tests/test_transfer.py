@@ -0,0 +1,99 @@
+import itertools
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import override_settings
+
+from alpha_mind import fastjson
+from alpha_mind.testing import TestCase, login, make_session, make_user
+from chat.exporter import iter_sessions
+from chat.importer import ImportValidationError, iter_json_array
+from chat.models import ChatSession
+
+class SessionImportTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('import')
+        self.client = login(self.user)
+
+    def test_invalid_row_rolls_back(self):
+        body = b'{"role": "user", "content": "ok"}\n{"role": "robot", "content": "bad"}\n'
+        response = self.client.post('/api/chat/save/?title=Broken', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Row 2', response.json()['error'])
+        self.assertFalse(ChatSession.objects.filter(user=self.user).exists())
+
+    def test_unterminated_element_not_buffered(self):
+        read = []
+
+        def chunks():
+            yield b'[{"role": "user", "content": "ok"}, {"role": "user", "content": "'
+            for n in itertools.count():
+                read.append(n)
+                yield b'x' * 1000
+
+        elements = iter_json_array(chunks(), max_element_size=10000)
+        self.assertEqual(next(elements)['content'], 'ok')
+        with self.assertRaisesMessage(ImportValidationError, 'Row 2: Element is invalid or larger than 10000'):
+            next(elements)
+        self.assertLess(len(read), 20)
+
+    def test_element_size_setting(self):
+        rows = [{'role': 'user', 'content': 'x' * 500}, {'role': 'assistant', 'content': 'x' * 5000}]
+        with override_settings(CHAT_IMPORT_MAX_ELEMENT_SIZE=1000):
+            response = self.client.post('/api/chat/save/?title=Big', fastjson.dumps(rows), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Row 2', response.json()['error'])
+        self.assertFalse(ChatSession.objects.filter(user=self.user).exists())
+
+        response = self.client.post('/api/chat/save/?title=Big', fastjson.dumps(rows), content_type='application/json')
+        self.assertEqual(response.json()['imported'], 2)
+
+class SessionExportTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('export')
+        self.client = login(self.user)
+
+    def test_single_session_round_trip(self):
+        session = make_session(self.user, messages=300, content='Message {n}: lorem ipsum dolor sit amet')
+        response = self.client.get(f'/api/chat/sessions/{session.id}/export/')
+        self.assertEqual(response.status_code, 200)
+        data = b''.join(response.streaming_content)
+
+        response = self.client.post('/api/chat/save/?title=Copy', data, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        copy = ChatSession.objects.get(id=response.json()['session_id'])
+        self.assertEqual(copy.message_count, 300)
+        original = list(session.messages.order_by('created_at', 'id').values_list('content', flat=True))
+        copied = list(copy.messages.order_by('created_at', 'id').values_list('content', flat=True))
+        self.assertEqual(copied, original)
+
+    def test_sessions_deleted_during_export(self):
+        sessions = [make_session(self.user, messages=3, content=f'session {n}, message {{n}}') for n in range(6)]
+        sessions.sort(key=lambda session: session.id)  # Export order
+        expected = {
+            session.id: list(session.messages.order_by('created_at', 'id').values_list('content', flat=True))
+            for n, session in enumerate(sessions) if n not in (1, 4)
+        }
+        first_deleted, later_deleted = sessions[1].id, sessions[4].id
+        order_by = QuerySet.order_by
+        pending = [sessions[1]]
+
+        def delete_then_order_by(queryset, *fields):
+            # Deleted between the first query opened and the second
+            if pending:
+                pending.pop().delete()
+            return order_by(queryset, *fields)
+
+        exported = {}
+        with mock.patch.object(QuerySet, 'order_by', delete_then_order_by):
+            for session, messages in iter_sessions(ChatSession.objects.filter(user=self.user), batch_size=2):
+                exported[session['id']] = [message['content'] for message in messages]
+                if len(exported) == 1:
+                    sessions[4].delete()  # In a batch not read yet
+
+        self.assertNotIn(first_deleted, exported)
+        # Already fetched by the session cursor, but never given another's messages
+        self.assertEqual(exported.pop(later_deleted, []), [])
+        self.assertEqual(exported, expected)
@@ -3,10 +3,14 @@ from . import views
 
 urlpatterns = [
     path('send/', views.SendChatView.as_view(), name='send-chat'),
+    path('send/stream/', views.SendChatStreamView.as_view(), name='send-chat-stream'),
     path('history/<uuid:session_id>/', views.ChatHistoryView.as_view(), name='chat-history'),
     path('save/', views.SaveSessionView.as_view(), name='save-session'),
+    path('export/', views.ExportSessionsView.as_view(), name='export-sessions'),
+    path('search/', views.SearchMessagesView.as_view(), name='search-messages'),
     path('sessions/', views.ChatSessionsView.as_view(), name='chat-sessions'),
     path('sessions/<uuid:session_id>/', views.SessionDetailView.as_view(), name='session-detail'),
     path('sessions/<uuid:session_id>/delete/', views.DeleteSessionView.as_view(), name='delete-session'),
+    path('sessions/<uuid:session_id>/export/', views.ExportSessionsView.as_view(), name='export-session'),
     path('rate/<uuid:message_id>/', views.RateMessageView.as_view(), name='rate-message'),
 ]
@@ -1,56 +1,59 @@
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
+from django.http import HttpResponseBase, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
-import json
-import requests
+import hashlib
+import itertools
+import logging
+import time
 import uuid
+from contextlib import aclosing
 from datetime import datetime
 
+from alpha_mind import fastjson
+from alpha_mind.engine_client import EngineError, get_async_client
+from alpha_mind.fastjson import JsonResponse
+from alpha_mind.pagination import InvalidCursor, encode_cursor, get_page_size, paginate_keyset
+from alpha_mind.response_cache import cached_response
+from gateway.accounting import record_usage
+from gateway.quotas import QuotaExceeded, get_quotas
+from .exporter import EXPORT_FORMATS, async_stream, export_sessions
+from .importer import ImportValidationError, import_messages, iter_chunks, iter_json_array, iter_ndjson
 from .models import ChatSession, ChatMessage, MessageRating
+from .search import InvalidQuery, search_messages
+
+logger = logging.getLogger(__name__)
 
 @method_decorator(csrf_exempt, name='dispatch')
 @permission_classes([IsAuthenticated])
 class SendChatView(View):
     async def post(self, request):
         try:
-            data = json.loads(request.body)
-            message = data.get('message')
-            model = data.get('model', 'gpt-3.5-turbo')
-            session_id = data.get('session_id')
-            
-            if not message:
-                return JsonResponse({'error': 'Message is required'}, status=400)
-            
-            # Get or create session
-            if session_id:
-                session = get_object_or_404(ChatSession, id=session_id, user=request.user)
-            else:
-                # Create new session with message as title
-                title = message[:50] + ('...' if len(message) > 50 else '')
-                session = ChatSession.objects.create(
-                    user=request.user,
-                    title=title,
-                    model=model
-                )
-            
-            # Save user message
-            user_message = ChatMessage.objects.create(
-                session=session,
-                role='user',
-                content=message
-            )
+            exchange = await self.start_exchange(request)
+            if isinstance(exchange, HttpResponseBase):
+                return exchange
+            session, user_message, model = exchange
             
             # Get AI response from AI Engine
+            start_time = time.perf_counter()
+            usage = {}
+            error = 'Client disconnected'  # Until the engine call returns or fails
             try:
-                ai_response = await self.get_ai_response(message, model, session)
+                ai_response = await self.get_ai_response(model, session)
+                usage = ai_response['usage']
+                error = None
                 
                 # Save AI response
-                ai_message = ChatMessage.objects.create(
+                ai_message = await ChatMessage.objects.acreate(
                     session=session,
                     role='assistant',
                     content=ai_response['content'],
@@ -66,54 +69,250 @@ class SendChatView(View):
                 })
                 
             except Exception as e:
+                error = e
                 return JsonResponse({'error': f'AI service error: {str(e)}'}, status=500)
+            finally:
+                # Also on cancellation, so tokens of a disconnected client are charged
+                self.record_usage(session.user_id, model, session, usage, start_time, error=error)
                 
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
-    async def get_ai_response(self, message, model, session):
+    async def start_exchange(self, request):
+        """Validate the request, check quotas and save the user's message.
+        
+        Returns the session, the saved message and the model, or the error
+        response to send instead.
+        """
+        data = fastjson.loads(request.body)
+        message = data.get('message')
+        model = data.get('model', 'gpt-3.5-turbo')
+        session_id = data.get('session_id')
+        
+        if not message:
+            return JsonResponse({'error': 'Message is required'}, status=400)
+        
+        user = await request.auser()
+        quota_response = await self.check_quota(user)
+        if quota_response is not None:
+            return quota_response
+        
+        session = await self.get_session(user, session_id, message, model)
+        
+        # Save user message
+        user_message = await ChatMessage.objects.acreate(
+            session=session,
+            role='user',
+            content=message
+        )
+        return session, user_message, model
+    
+    async def check_quota(self, user):
+        """429 response if the user has used up a daily quota, otherwise None"""
+        try:
+            await get_quotas().acheck(user.id)
+        except QuotaExceeded as e:
+            response = JsonResponse({
+                'error': str(e),
+                'quota': e.quota,
+                'used': e.used,
+                'limit': e.limit
+            }, status=429)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+        return None
+    
+    async def get_session(self, user, session_id, message, model):
+        """Get the requested session or create a new one titled after the message"""
+        if session_id:
+            return await aget_object_or_404(ChatSession, id=session_id, user=user)
+        
+        title = message[:50] + ('...' if len(message) > 50 else '')
+        return await ChatSession.objects.acreate(
+            user=user,
+            title=title,
+            model=model
+        )
+    
+    async def build_payload(self, model, session):
+        """Build the engine request from the session history"""
+        # Message history already includes the new user message
+        messages = [msg async for msg in session.messages.values('role', 'content')]
+        
+        return {
+            'messages': messages,
+            'model': model,
+            'max_tokens': 1000,
+            'temperature': 0.7
+        }
+    
+    async def get_ai_response(self, model, session):
         """Get response from AI Engine"""
         try:
-            # Get message history
-            messages = [{'role': msg.role, 'content': msg.content} 
-                       for msg in session.messages.all()]
-            
-            # Call AI Engine
-            ai_engine_url = 'http://localhost:4000/chat'
-            payload = {
-                'messages': messages + [{'role': 'user', 'content': message}],
-                'model': model,
-                'max_tokens': 1000,
-                'temperature': 0.7
-            }
-            
-            response = requests.post(ai_engine_url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            payload = await self.build_payload(model, session)
+            data = await get_async_client().chat(payload)
             content = data['choices'][0]['message']['content']
-            token_count = data.get('usage', {}).get('total_tokens', 0)
+            usage = data.get('usage') or {}
             
             return {
                 'content': content,
-                'token_count': token_count
+                'token_count': usage.get('total_tokens', 0),
+                'usage': usage
             }
             
-        except requests.RequestException as e:
-            raise Exception(f"Failed to connect to AI Engine: {str(e)}")
+        except EngineError:
+            raise
         except Exception as e:
             raise Exception(f"AI processing error: {str(e)}")
+    
+    def record_usage(self, user_id, model, session, usage, start_time, error=None):
+        """Queue the exchange for write-behind usage accounting"""
+        record_usage(
+            user_id,
+            model=model,
+            input_tokens=usage.get('prompt_tokens', 0),
+            output_tokens=usage.get('completion_tokens', 0),
+            response_time=time.perf_counter() - start_time,
+            success=error is None,
+            error_message=str(error) if error is not None else '',
+            session_id=session.id,
+            messages=1
+        )
+
+@method_decorator(csrf_exempt, name='dispatch')
+@permission_classes([IsAuthenticated])
+class SendChatStreamView(SendChatView):
+    """Proxy the engine's streamed completion to the client as server-sent events"""
+    
+    async def post(self, request):
+        try:
+            # The user message is saved before streaming starts
+            exchange = await self.start_exchange(request)
+            if isinstance(exchange, HttpResponseBase):
+                return exchange
+            session, user_message, model = exchange
+            payload = await self.build_payload(model, session)
+            
+        except fastjson.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        
+        response = StreamingHttpResponse(
+            self.stream_events(session, user_message, model, payload),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    async def stream_events(self, session, user_message, model, payload):
+        """Relay engine chunks and save the assistant message once the stream ends.
+        
+        If the client disconnects, Django closes this generator, which closes
+        the engine stream and stops generation; no message is saved in that
+        case, but the usage received so far is still recorded.
+        """
+        yield self.format_event({
+            'session_id': str(session.id),
+            'user_message_id': str(user_message.id)
+        }, event='session')
+        
+        content = []
+        token_count = None
+        usage = {}
+        start_time = time.perf_counter()
+        error = 'Client disconnected'  # Until the engine stream ends or fails
+        try:
+            async with aclosing(get_async_client().stream_chat(payload)) as lines:
+                async for line in lines:
+                    if not line.startswith('data: '):
+                        continue
+                    data = line[6:]
+                    if data == '[DONE]':
+                        break
+                    
+                    chunk = fastjson.loads(data)
+                    for choice in chunk.get('choices', []):
+                        delta = (choice.get('delta') or {}).get('content')
+                        if delta:
+                            content.append(delta)
+                    if chunk.get('usage'):
+                        usage = chunk['usage']
+                        token_count = usage.get('total_tokens')
+                    
+                    yield f"{line}\n\n".encode('utf-8')
+            error = None
+            
+            ai_message = await ChatMessage.objects.acreate(
+                session=session,
+                role='assistant',
+                content=''.join(content),
+                model=model,
+                token_count=token_count
+            )
+            yield self.format_event({'ai_message_id': str(ai_message.id)}, event='saved')
+            yield b"data: [DONE]\n\n"
+            
+        except Exception as e:
+            error = e
+            yield self.format_event({'error': f'AI service error: {str(e)}'}, event='error')
+        finally:
+            self.record_usage(session.user_id, model, session, usage, start_time, error=error)
+    
+    @staticmethod
+    def format_event(data, event=None):
+        prefix = f"event: {event}\n".encode('utf-8') if event else b""
+        return prefix + b"data: " + fastjson.dumps(data) + b"\n\n"
 
 @permission_classes([IsAuthenticated])
 class ChatHistoryView(View):
+    """Keyset-paginated message history of a session.
+    
+    Without parameters the newest ``limit`` messages are returned; ``cursor``
+    pages back into older messages and ``since`` returns only messages newer
+    than a previous ``sync_cursor``. Responses carry an ETag so polling
+    clients get a 304 when nothing changed.
+    """
+    
     def get(self, request, session_id):
         try:
             session = get_object_or_404(ChatSession, id=session_id, user=request.user)
-            messages = []
+            limit = get_page_size(request.GET.get('limit'))
+            cursor = request.GET.get('cursor')
+            since = request.GET.get('since')
+            
+            etag = self.get_etag(session, request.GET.urlencode())
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                response['ETag'] = etag
+                response['Cache-Control'] = 'private, no-cache'
+                return response
             
-            for msg in session.messages.all():
+            if since:
+                # Incremental sync: oldest-first after the client's last message
+                page, next_since = paginate_keyset(
+                    session.messages.all(), 'created_at', limit, after=since
+                )
+                has_more = next_since is not None
+                next_cursor = None
+            else:
+                # Newest page, or an older page before the cursor
+                page, next_cursor = paginate_keyset(
+                    session.messages.all(), 'created_at', limit, after=cursor, descending=True
+                )
+                page.reverse()
+                has_more = next_cursor is not None
+            
+            if page and not cursor:
+                sync_cursor = encode_cursor(page[-1].created_at, page[-1].pk)
+            else:
+                sync_cursor = since
+            
+            messages = []
+            for msg in page:
                 messages.append({
                     'id': str(msg.id),
                     'role': msg.role,
@@ -123,79 +322,141 @@ class ChatHistoryView(View):
                     'created_at': msg.created_at.isoformat()
                 })
             
-            return JsonResponse({
+            response = JsonResponse({
                 'session_id': str(session.id),
                 'title': session.title,
                 'model': session.model,
                 'created_at': session.created_at.isoformat(),
-                'messages': messages
+                'messages': messages,
+                'next_cursor': next_cursor,
+                'sync_cursor': sync_cursor,
+                'has_more': has_more
             })
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
             
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+    
+    def get_etag(self, session, query):
+        """ETag over the session's message counters and the requested page"""
+        raw = (
+            f"{session.id}:{session.updated_at.isoformat()}:{session.message_count}:"
+            f"{session.last_message_at}:{query}"
+        )
+        return quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
 
 @method_decorator(csrf_exempt, name='dispatch')
 @permission_classes([IsAuthenticated])
 class SaveSessionView(View):
+    """Save a session, streaming large imports straight into the database.
+
+    A ``{"title": ..., "messages": [...]}`` body is parsed whole and is
+    limited to DATA_UPLOAD_MAX_MEMORY_SIZE. For larger imports send the
+    messages as a JSON array or as NDJSON (``application/x-ndjson``) with the
+    title in the ``title`` query parameter; those are parsed, validated and
+    inserted in batches as the body is read.
+    """
+    
+    NDJSON_CONTENT_TYPES = {'application/x-ndjson', 'application/jsonl'}
+    
     def post(self, request):
         try:
-            data = json.loads(request.body)
-            title = data.get('title')
-            messages = data.get('messages', [])
+            if request.content_type in self.NDJSON_CONTENT_TYPES:
+                title = request.GET.get('title')
+                rows = iter_ndjson(request)
+            else:
+                chunks = iter_chunks(request)
+                first = next(chunks, b'')
+                if first.lstrip()[:1] == b'[':
+                    title = request.GET.get('title')
+                    rows = iter_json_array(itertools.chain([first], chunks))
+                else:
+                    limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+                    body = first + request.read(limit + 1 if limit is not None else -1)
+                    if limit is not None and len(body) > limit:
+                        return JsonResponse({
+                            'error': 'Request body too large, send messages as NDJSON or a JSON array'
+                        }, status=413)
+                    data = fastjson.loads(body)
+                    title = data.get('title')
+                    rows = data.get('messages', [])
             
             if not title:
                 return JsonResponse({'error': 'Title is required'}, status=400)
             
-            # Create new session
-            session = ChatSession.objects.create(
-                user=request.user,
-                title=title,
-                model='gpt-3.5-turbo'
-            )
-            
-            # Save messages
-            for msg_data in messages:
-                ChatMessage.objects.create(
-                    session=session,
-                    role=msg_data['role'],
-                    content=msg_data['content'],
-                    model=msg_data.get('model', ''),
-                    token_count=msg_data.get('token_count')
+            # One transaction, so an invalid row rolls back the whole import
+            with transaction.atomic():
+                session = ChatSession.objects.create(
+                    user=request.user,
+                    title=title,
+                    model='gpt-3.5-turbo'
                 )
+                stats = import_messages(session, rows)
             
+            logger.info(
+                f"Imported {stats['imported']} messages into session {session.id} "
+                f"({stats['rows_per_second']} rows/s)"
+            )
             return JsonResponse({
                 'session_id': str(session.id),
-                'message': 'Session saved successfully'
+                'message': 'Session saved successfully',
+                **stats
             })
             
-        except json.JSONDecodeError:
+        except ImportValidationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 @permission_classes([IsAuthenticated])
 class ChatSessionsView(View):
+    """Keyset-paginated sessions, most recently active first"""
+    
+    @cached_response('sessions')
     def get(self, request):
         try:
-            sessions = []
+            limit = get_page_size(request.GET.get('limit'))
+            page, next_cursor = paginate_keyset(
+                request.user.chat_sessions.all(),
+                'updated_at',
+                limit,
+                after=request.GET.get('cursor'),
+                descending=True
+            )
             
-            for session in request.user.chat_sessions.all():
+            sessions = []
+            for session in page:
                 sessions.append({
                     'id': str(session.id),
                     'title': session.title,
                     'model': session.model,
                     'created_at': session.created_at.isoformat(),
                     'updated_at': session.updated_at.isoformat(),
-                    'message_count': session.messages.count()
+                    'message_count': session.message_count,
+                    'last_message_at': session.last_message_at.isoformat() if session.last_message_at else None,
+                    'total_tokens': session.total_tokens
                 })
             
-            return JsonResponse({'sessions': sessions})
+            return JsonResponse({
+                'sessions': sessions,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
             
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 @permission_classes([IsAuthenticated])
 class SessionDetailView(View):
+    @cached_response('sessions')
     def get(self, request, session_id):
         try:
             session = get_object_or_404(ChatSession, id=session_id, user=request.user)
@@ -223,12 +484,85 @@ class DeleteSessionView(View):
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
+@permission_classes([IsAuthenticated])
+class ExportSessionsView(View):
+    """Stream one session, or all of the user's sessions, as a download.
+
+    ``format`` is ``ndjson`` (default), ``json`` or ``markdown``; the latter
+    two produce a zip with one file per session. ``gzip=1`` compresses NDJSON.
+    """
+    
+    def get(self, request, session_id=None):
+        try:
+            export_format = request.GET.get('format', 'ndjson')
+            if export_format not in EXPORT_FORMATS:
+                return JsonResponse({'error': f'Invalid format: {export_format}'}, status=400)
+            
+            sessions = request.user.chat_sessions.all()
+            if session_id is not None:
+                sessions = sessions.filter(id=session_id)
+                if not sessions.exists():
+                    return JsonResponse({'error': 'Session not found'}, status=404)
+            
+            chunks, content_type, extension = export_sessions(
+                sessions,
+                export_format,
+                compress=request.GET.get('gzip') in ('1', 'true'),
+                single=session_id is not None
+            )
+            if isinstance(request, ASGIRequest):
+                # Otherwise the whole export would be collected before sending
+                chunks = async_stream(chunks)
+            name = f"chat-{session_id}" if session_id is not None else 'chat-export'
+            response = StreamingHttpResponse(chunks, content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{name}.{extension}"'
+            return response
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+@permission_classes([IsAuthenticated])
+class SearchMessagesView(View):
+    """Ranked full-text search over the user's messages.
+
+    ``q`` is the query, ``session_id`` limits it to one session, and
+    ``limit``/``offset`` page through the results in rank order.
+    """
+    
+    def get(self, request):
+        try:
+            query = request.GET.get('q', '')
+            limit = get_page_size(request.GET.get('limit'), default=20)
+            try:
+                offset = max(0, int(request.GET.get('offset', 0)))
+            except ValueError:
+                return JsonResponse({'error': 'Invalid offset'}, status=400)
+            session_id = request.GET.get('session_id') or None
+            if session_id is not None:
+                try:
+                    session_id = uuid.UUID(session_id)
+                except ValueError:
+                    return JsonResponse({'error': 'Invalid session_id'}, status=400)
+            
+            results, has_more = search_messages(request.user, query, session_id, limit, offset)
+            
+            return JsonResponse({
+                'results': results,
+                'next_offset': offset + limit if has_more else None,
+                'has_more': has_more
+            })
+            
+        except (InvalidQuery, InvalidCursor) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
 @method_decorator(csrf_exempt, name='dispatch')
 @permission_classes([IsAuthenticated])
 class RateMessageView(View):
     def post(self, request, message_id):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             rating = data.get('rating')
             feedback = data.get('feedback', '')
             
@@ -248,7 +582,7 @@ class RateMessageView(View):
             
             return JsonResponse({'message': 'Message rated successfully'})
             
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
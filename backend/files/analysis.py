@@ -0,0 +1,180 @@
+"""
+File content extraction and AI analysis, run by the job workers (files.jobs).
+"""
+
+import hashlib
+import logging
+import time
+
+from django.core.cache import cache
+
+from alpha_mind.engine_client import get_client
+from gateway.accounting import record_usage
+from . import pdf, spreadsheet
+from .models import FileAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Characters of extracted content sent to the engine
+CONTENT_LIMIT = 10000
+ENGINE_TIMEOUT = 60
+# Extractions kept per stored content (files.blobs); the others are cheap
+CACHED_EXTRACTIONS = ('pdf', 'excel')
+EXTRACTION_CACHE_TIMEOUT = 3600
+
+class ExtractionError(Exception):
+    """Raised when no content can be extracted from a file"""
+
+def extract_file_content(file_obj):
+    """Extract text content from uploaded file"""
+    try:
+        file_obj.file.seek(0)
+
+        if file_obj.file_type == 'pdf':
+            return extract_pdf_content(file_obj.file)
+        elif file_obj.file_type == 'image':
+            return f"Image file: {file_obj.original_name}"
+        elif file_obj.file_type == 'excel':
+            return extract_excel_content(file_obj.file, file_obj.original_name)
+        elif file_obj.file_type == 'text':
+            return file_obj.file.read().decode('utf-8', errors='ignore')
+
+        return None
+
+    except Exception as e:
+        logger.warning(f"Error extracting content from {file_obj.id}: {e}")
+        return None
+
+def extract_pdf_content(pdf_file):
+    """Extract text from the first pages of a PDF file, up to CONTENT_LIMIT"""
+    return pdf.extract_text(pdf_file, CONTENT_LIMIT)
+
+def extract_excel_content(excel_file, name):
+    """Profile every sheet of a spreadsheet, reading it in chunks"""
+    return spreadsheet.summarize(excel_file, CONTENT_LIMIT, name=name)
+
+def extraction_key(file_obj):
+    name = hashlib.md5(file_obj.original_name.encode('utf-8')).hexdigest()
+    return f"file-content:{file_obj.blob_id}:{file_obj.file_type}:{name}"
+
+def cached_file_content(file_obj):
+    """Extracted content, shared by uploads of the same bytes under the same name"""
+    if file_obj.blob_id is None or file_obj.file_type not in CACHED_EXTRACTIONS:
+        return extract_file_content(file_obj)
+    key = extraction_key(file_obj)
+    content = cache.get(key)
+    if content is None:
+        content = extract_file_content(file_obj)
+        if content:
+            cache.set(key, content, EXTRACTION_CACHE_TIMEOUT)
+    return content
+
+def previous_analysis(file_obj, query, model):
+    """A stored analysis of another upload of the same bytes with the same query and model"""
+    if file_obj.blob_id is None:
+        return None
+    return FileAnalysis.objects.filter(
+        file_upload__blob_id=file_obj.blob_id, analysis_model=model, metadata__query=query
+    ).exclude(file_upload_id=file_obj.id).order_by('-created_at').first()
+
+def get_ai_analysis(content, query, model):
+    """Get AI analysis of file content"""
+    payload = {
+        'messages': [
+            {
+                'role': 'system',
+                'content': 'You are a helpful AI assistant that analyzes uploaded files. Provide comprehensive summaries and insights.'
+            },
+            {
+                'role': 'user',
+                'content': f"File Content:\n\n{content}\n\nQuery: {query}"
+            }
+        ],
+        'model': model,
+        'max_tokens': 2000,
+        'temperature': 0.3
+    }
+
+    data = get_client().chat(payload, timeout=ENGINE_TIMEOUT)
+    ai_response = data['choices'][0]['message']['content']
+
+    # Parse response (in production, use structured output)
+    summary = ai_response
+    insights = [ai_response]  # Simplified for now
+
+    return {
+        'summary': summary,
+        'insights': insights,
+        'metadata': {'content_length': len(content)},
+        'token_count': data.get('usage', {}).get('total_tokens', 0),
+        'usage': data.get('usage') or {},
+        'cost': 0.01  # Placeholder
+    }
+
+def analyze_file(file_obj, query, model, progress):
+    """Extract a file's content, analyze it and store the result.
+
+    ``progress(percent, stage)`` is called as the analysis moves on.
+    Replaces an earlier analysis of the same file. An analysis of identical
+    content with the same query and model is copied instead of asking the
+    engine again.
+    """
+    start_time = time.time()
+    previous = previous_analysis(file_obj, query, model)
+    if previous is not None:
+        progress(50, 'reusing')
+        analysis, _ = FileAnalysis.objects.update_or_create(
+            file_upload=file_obj,
+            defaults={
+                'summary': previous.summary,
+                'insights': previous.insights,
+                'metadata': {**previous.metadata, 'reused': True},
+                'analysis_model': model,
+                'analysis_time': time.time() - start_time,
+                'token_count': previous.token_count,
+                'cost': 0
+            }
+        )
+        return analysis
+
+    progress(10, 'extracting')
+    content = cached_file_content(file_obj)
+    if not content:
+        raise ExtractionError('Could not extract content from file')
+
+    progress(40, 'analyzing')
+    engine_start = time.perf_counter()
+    try:
+        analysis_result = get_ai_analysis(content, query, model)
+    except Exception as e:
+        record_usage(
+            file_obj.user_id,
+            model=model,
+            response_time=time.perf_counter() - engine_start,
+            success=False,
+            error_message=str(e)
+        )
+        raise
+    usage = analysis_result['usage']
+    record_usage(
+        file_obj.user_id,
+        model=model,
+        input_tokens=usage.get('prompt_tokens', 0),
+        output_tokens=usage.get('completion_tokens', 0),
+        response_time=time.perf_counter() - engine_start
+    )
+
+    progress(90, 'saving')
+    analysis, _ = FileAnalysis.objects.update_or_create(
+        file_upload=file_obj,
+        defaults={
+            'summary': analysis_result['summary'],
+            'insights': analysis_result['insights'],
+            'metadata': {**analysis_result.get('metadata', {}), 'query': query},
+            'analysis_model': model,
+            'analysis_time': time.time() - start_time,
+            'token_count': analysis_result.get('token_count'),
+            'cost': analysis_result.get('cost', 0)
+        }
+    )
+    return analysis
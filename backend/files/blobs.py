@@ -0,0 +1,135 @@
+"""
+Content-addressed storage for uploads.
+
+The bytes of an upload are stored once per SHA-256 under ``blob_path()``
+and shared by every upload with the same content through a ``FileBlob``
+row that counts them. The hashing upload handlers in
+``settings.FILE_UPLOAD_HANDLERS`` hash the request body while Django
+streams it into memory or a temporary file, so the digest costs no second
+pass over the data; the temporary file is then moved into place, or
+dropped when the same bytes are already stored.
+
+On a ``FileSystemStorage`` bytes are written under a temporary name and
+renamed into place, so the blob path only ever holds complete files; other
+storages are written through ``Storage.save()``, which for object stores
+puts whole objects. ``create_upload()`` stores them first and then takes a
+reference in the transaction that creates the ``FileUpload``; the upload's
+post_delete signal gives it back. The last release deletes the row, and
+once that commits the stored file, in a transaction that first checks no
+upload of the same bytes has taken a new reference meanwhile. A concurrent
+upload either takes its reference first or finds the file gone and stores
+it again.
+"""
+
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import FileBlob, FileUpload, blob_path
+
+# Bytes read at a time when hashing a file that was not hashed on upload
+CHUNK_SIZE = 1024 * 1024
+
+class HashingUploadHandlerMixin:
+    """Computes the SHA-256 of each file as its chunks are stored"""
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler raises StopFutureHandlers when it takes the file
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:  # Stored by this handler
+            self.sha256.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self.sha256.hexdigest()
+        return uploaded_file
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+def content_hash(uploaded_file):
+    """SHA-256 of an uploaded file, from the upload handlers when they computed it"""
+    digest = getattr(uploaded_file, 'sha256', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        for chunk in uploaded_file.chunks(CHUNK_SIZE):
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+    return digest
+
+def acquire(sha256, size):
+    """Count a reference to the bytes with this hash; returns whether they are new"""
+    for _ in range(3):
+        if FileBlob.objects.filter(pk=sha256).update(ref_count=F('ref_count') + 1):
+            return False
+        try:
+            with transaction.atomic():
+                FileBlob.objects.create(sha256=sha256, file=blob_path(sha256), size=size, ref_count=1)
+            return True
+        except IntegrityError:
+            continue  # Created concurrently by an identical upload
+    raise IntegrityError(f"Could not reference blob {sha256}")
+
+def release(sha256):
+    """Give back a reference; the last one deletes the row, and the stored bytes once that commits"""
+    with transaction.atomic():
+        FileBlob.objects.filter(pk=sha256, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        deleted, _ = FileBlob.objects.filter(pk=sha256, ref_count=0).delete()
+        if deleted:
+            # Not before: a rolled back delete would keep a row without bytes
+            transaction.on_commit(lambda: delete_unreferenced(sha256))
+
+def delete_unreferenced(sha256):
+    """Delete the stored bytes unless an identical upload has referenced them again"""
+    with transaction.atomic():
+        if not FileBlob.objects.filter(pk=sha256).exists():
+            default_storage.delete(blob_path(sha256))
+
+def store(sha256, uploaded_file):
+    """Write the bytes to their blob path unless they are stored already"""
+    name = blob_path(sha256)
+    if default_storage.exists(name):
+        return False
+    if not isinstance(default_storage, FileSystemStorage):
+        saved = default_storage.save(name, uploaded_file)
+        if saved != name:
+            default_storage.delete(saved)  # Stored concurrently by an identical upload
+        return True
+    partial = f"{name}.{uuid.uuid4().hex}.part"
+    try:
+        partial = default_storage.save(partial, uploaded_file)
+        # An identical upload storing concurrently renames the same bytes
+        os.replace(default_storage.path(partial), default_storage.path(name))
+    except BaseException:
+        default_storage.delete(partial)
+        raise
+    return True
+
+def create_upload(user, uploaded_file, **fields):
+    """Create a ``FileUpload`` whose bytes are shared with identical uploads"""
+    sha256 = content_hash(uploaded_file)
+    for _ in range(3):
+        store(sha256, uploaded_file)
+        with transaction.atomic():
+            if acquire(sha256, uploaded_file.size) and not default_storage.exists(blob_path(sha256)):
+                # The last reference was released, deleting the bytes, since store()
+                transaction.set_rollback(True)
+                continue
+            return FileUpload.objects.create(
+                user=user, file=blob_path(sha256), blob_id=sha256, file_size=uploaded_file.size, **fields
+            )
+    raise IntegrityError(f"Could not store blob {sha256}")
@@ -0,0 +1,218 @@
+"""
+Database-backed queue for file analysis.
+
+``enqueue_analysis()`` stores an ``AnalysisJob`` and returns at once, so the
+analyze request no longer waits on extraction or the engine. Worker
+processes started by ``manage.py run_file_jobs`` claim jobs with a
+conditional UPDATE (queued -> running), which is atomic on SQLite and
+PostgreSQL alike, so any number of workers can share the queue without a
+broker. A claimed job holds a lease of ``settings.FILE_JOBS_LEASE_SECONDS``
+that progress updates renew; jobs of a worker that died are requeued once
+their lease runs out.
+
+* Identical requests (same file, query and model) get the active job back
+  instead of queueing another; a partial unique index keeps this race-free
+* Failed jobs are retried up to ``settings.FILE_JOBS_MAX_ATTEMPTS`` times
+  with exponential backoff; files with no extractable content fail at once
+* A user has at most ``settings.FILE_JOBS_MAX_RUNNING_PER_USER`` jobs
+  running and ``settings.FILE_JOBS_MAX_QUEUED_PER_USER`` waiting
+"""
+
+import hashlib
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .analysis import ExtractionError, analyze_file
+from .models import AnalysisJob
+
+logger = logging.getLogger(__name__)
+
+# Runnable jobs looked at per claim, for when other workers take the first ones
+CLAIM_CANDIDATES = 10
+# Longest wait between retries
+MAX_RETRY_DELAY = 3600
+
+class QueueFull(Exception):
+    """Raised when a user already has the maximum number of queued jobs"""
+
+class LeaseLost(Exception):
+    """Raised when a worker's job was requeued or finished by someone else"""
+
+def dedupe_key(file_id, query, model):
+    return hashlib.sha256(f"{file_id}\0{model}\0{query}".encode('utf-8')).hexdigest()
+
+def active_job(key):
+    return AnalysisJob.objects.filter(dedupe_key=key, status__in=AnalysisJob.ACTIVE_STATUSES).first()
+
+def enqueue_analysis(user, file_upload, query, model):
+    """Queue an analysis and return ``(job, created)``.
+
+    An identical job that is still queued or running is returned instead of
+    a new one. Raises QueueFull when the user has too many jobs waiting.
+    """
+    key = dedupe_key(file_upload.id, query, model)
+    for _ in range(3):
+        # One query over the user's few active jobs in the common case
+        state = AnalysisJob.objects.filter(user=user, status__in=AnalysisJob.ACTIVE_STATUSES).aggregate(
+            queued=Count('pk', filter=Q(status=AnalysisJob.STATUS_QUEUED)),
+            duplicates=Count('pk', filter=Q(dedupe_key=key))
+        )
+        job = active_job(key) if state['duplicates'] else None
+        if job is not None:
+            return job, False
+        queued = state['queued']
+        if queued >= settings.FILE_JOBS_MAX_QUEUED_PER_USER:
+            raise QueueFull(f"Too many queued analyses ({queued}); try again when some have finished")
+        try:
+            with transaction.atomic():
+                job = AnalysisJob.objects.create(
+                    user=user, file_upload=file_upload, query=query, model=model, dedupe_key=key
+                )
+            return job, True
+        except IntegrityError:
+            continue  # Queued concurrently by an identical request
+    raise IntegrityError(f"Could not queue analysis of {file_upload.id}")
+
+def retry_delay(attempts):
+    return min(MAX_RETRY_DELAY, settings.FILE_JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+
+def claim_job(worker_id):
+    """Mark the next runnable job as running for this worker and return it"""
+    now = timezone.now()
+    candidates = AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_QUEUED, run_after__lte=now
+    ).order_by('run_after', 'created_at').values_list('pk', 'user_id')[:CLAIM_CANDIDATES]
+
+    full_users = set()
+    for pk, user_id in candidates:
+        if user_id in full_users:
+            continue
+        with transaction.atomic():
+            # Serializes claims for one user (SQLite serializes every write transaction)
+            list(User.objects.select_for_update().filter(pk=user_id).values_list('pk'))
+            running = AnalysisJob.objects.filter(user_id=user_id, status=AnalysisJob.STATUS_RUNNING).count()
+            if running >= settings.FILE_JOBS_MAX_RUNNING_PER_USER:
+                full_users.add(user_id)
+                continue
+            claimed = AnalysisJob.objects.filter(pk=pk, status=AnalysisJob.STATUS_QUEUED).update(
+                status=AnalysisJob.STATUS_RUNNING,
+                locked_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=settings.FILE_JOBS_LEASE_SECONDS),
+                started_at=now,
+                attempts=F('attempts') + 1,
+                progress=0,
+                stage='claimed'
+            )
+        if claimed:
+            return AnalysisJob.objects.select_related('file_upload').get(pk=pk)
+    return None
+
+def requeue_expired():
+    """Retry or fail running jobs whose worker stopped renewing the lease"""
+    now = timezone.now()
+    expired = AnalysisJob.objects.filter(
+        status=AnalysisJob.STATUS_RUNNING, lease_expires_at__lt=now
+    ).values_list('pk', 'locked_by', 'attempts')
+    count = 0
+    for pk, locked_by, attempts in expired:
+        count += release(pk, locked_by, attempts, 'Worker stopped before finishing')
+    if count:
+        logger.warning(f"Requeued {count} analysis jobs with expired leases")
+    return count
+
+def release(pk, worker_id, attempts, error, permanent=False):
+    """Requeue a failed job with backoff, or fail it after its last attempt"""
+    jobs = AnalysisJob.objects.filter(pk=pk, status=AnalysisJob.STATUS_RUNNING, locked_by=worker_id)
+    now = timezone.now()
+    if permanent or attempts >= settings.FILE_JOBS_MAX_ATTEMPTS:
+        return jobs.update(
+            status=AnalysisJob.STATUS_FAILED, error=error[:2000], stage='failed',
+            locked_by='', lease_expires_at=None, finished_at=now
+        )
+    return jobs.update(
+        status=AnalysisJob.STATUS_QUEUED, error=error[:2000], stage='retrying', progress=0,
+        locked_by='', lease_expires_at=None, run_after=now + timedelta(seconds=retry_delay(attempts))
+    )
+
+class Worker:
+    """Claims and runs analysis jobs until stopped"""
+
+    def __init__(self, worker_id=None, poll_interval=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval if poll_interval is not None else settings.FILE_JOBS_POLL_INTERVAL
+        self._next_reap = 0.0
+        self.stats = {'succeeded': 0, 'retried': 0, 'failed': 0, 'requeued': 0}
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                job = self.run_once()
+            except Exception:
+                logger.exception("File job worker error")
+                job = None
+            finally:
+                close_old_connections()
+            if job is None:
+                stop.wait(self.poll_interval)
+
+    def run_once(self):
+        """Run the next runnable job, if any, and return it"""
+        now = timezone.now().timestamp()
+        if now >= self._next_reap:
+            self.stats['requeued'] += requeue_expired()
+            self._next_reap = now + settings.FILE_JOBS_LEASE_SECONDS / 4
+        job = claim_job(self.worker_id)
+        if job is not None:
+            self.process(job)
+        return job
+
+    def process(self, job):
+        def progress(percent, stage):
+            renewed = AnalysisJob.objects.filter(
+                pk=job.pk, status=AnalysisJob.STATUS_RUNNING, locked_by=self.worker_id
+            ).update(
+                progress=percent, stage=stage,
+                lease_expires_at=timezone.now() + timedelta(seconds=settings.FILE_JOBS_LEASE_SECONDS)
+            )
+            if not renewed:
+                raise LeaseLost(f"Lost the lease on job {job.pk}")
+
+        try:
+            analysis = analyze_file(job.file_upload, job.query, job.model, progress)
+        except LeaseLost as e:
+            logger.warning(str(e))
+            return
+        except Exception as e:
+            permanent = isinstance(e, ExtractionError)
+            final = permanent or job.attempts >= settings.FILE_JOBS_MAX_ATTEMPTS
+            logger.warning(f"Analysis job {job.pk} failed (attempt {job.attempts}): {e}")
+            release(job.pk, self.worker_id, job.attempts, f"AI analysis failed: {e}", permanent=permanent)
+            self.stats['failed' if final else 'retried'] += 1
+            return
+
+        AnalysisJob.objects.filter(
+            pk=job.pk, status=AnalysisJob.STATUS_RUNNING, locked_by=self.worker_id
+        ).update(
+            status=AnalysisJob.STATUS_SUCCEEDED, progress=100, stage='done', analysis=analysis,
+            error='', locked_by='', lease_expires_at=None, finished_at=timezone.now()
+        )
+        self.stats['succeeded'] += 1
+
+def run_until_empty(worker=None):
+    """Run runnable jobs in this process until none are left; returns how many ran"""
+    worker = worker or Worker()
+    count = 0
+    while worker.run_once() is not None:
+        count += 1
+    return count
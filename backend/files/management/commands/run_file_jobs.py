@@ -0,0 +1,75 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from files.jobs import Worker, run_until_empty
+
+# Seconds between checks that every worker process is alive
+SUPERVISE_INTERVAL = 1.0
+
+def work(stop):
+    """Worker process body: run jobs until the supervisor sets ``stop``"""
+    from gateway.accounting import get_accountant
+
+    # The supervisor handles Ctrl+C and stops workers between jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        Worker().run(stop)
+    finally:
+        # Processes started by multiprocessing skip atexit handlers
+        get_accountant().close()
+        connections.close_all()
+
+class Command(BaseCommand):
+    help = "Run queued file analysis jobs in a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.FILE_JOBS_WORKERS,
+            help=f"Worker processes (default {settings.FILE_JOBS_WORKERS})"
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Run the runnable jobs in this process and exit when none are left"
+        )
+
+    def handle(self, *args, **options):
+        if options['burst']:
+            count = run_until_empty()
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} analysis jobs"))
+            return
+
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # Forked workers must open their own database connections
+        connections.close_all()
+        processes = [self.start(context, stop) for _ in range(options['workers'])]
+        self.stdout.write(f"Started {len(processes)} file job workers")
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        try:
+            while not stop.is_set():
+                time.sleep(SUPERVISE_INTERVAL)
+                for index, process in enumerate(processes):
+                    if not process.is_alive() and not stop.is_set():
+                        self.stderr.write(f"Worker {process.pid} exited with {process.exitcode}, restarting")
+                        processes[index] = self.start(context, stop)
+        except KeyboardInterrupt:
+            stop.set()
+        self.stdout.write("Stopping workers after their current jobs")
+        for process in processes:
+            process.join()
+
+    @staticmethod
+    def start(context, stop):
+        process = context.Process(target=work, args=(stop,), name='file-job-worker', daemon=False)
+        process.start()
+        return process
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 import os
 
@@ -7,10 +8,27 @@ def upload_to(instance, filename):
     """Generate upload path for files"""
     return f'uploads/{instance.user.id}/{uuid.uuid4().hex[:8]}_{filename}'
 
+def blob_path(sha256):
+    """Storage name of the bytes with this SHA-256"""
+    return f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+class FileBlob(models.Model):
+    """Stored bytes shared by every upload with the same content (files.blobs)"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField(help_text="Size in bytes")
+    ref_count = models.PositiveIntegerField(default=0, help_text="Uploads referencing these bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} uploads)"
+
 class FileUpload(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_files')
     file = models.FileField(upload_to=upload_to)
+    # Content hash; uploads from before content-addressed storage have none
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='uploads')
     original_name = models.CharField(max_length=255)
     file_type = models.CharField(max_length=100)
     file_size = models.BigIntegerField(help_text="File size in bytes")
@@ -69,3 +87,61 @@ class FileQuery(models.Model):
     
     def __str__(self):
         return f"Query on {self.file_upload.original_name} by {self.user.username}"
+
+class AnalysisJob(models.Model):
+    """A queued file analysis, run by ``manage.py run_file_jobs`` (files.jobs)"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='analysis_jobs')
+    file_upload = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='analysis_jobs')
+    query = models.TextField()
+    model = models.CharField(max_length=100)
+    # Identical requests (file, query, model) share a job while it is active
+    dedupe_key = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, default=STATUS_QUEUED, choices=[
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed')
+    ])
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    stage = models.CharField(max_length=50, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    analysis = models.ForeignKey(FileAnalysis, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Not claimed before this time (retry backoff)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Worker holding a running job; it is requeued if the lease expires
+    locked_by = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Claiming the next runnable job
+            models.Index(fields=['status', 'run_after'], name='files_job_claim_idx'),
+            # A user's jobs, newest first
+            models.Index(fields=['user', '-created_at', 'id'], name='files_job_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='files_job_active_dedupe'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.status} analysis of {self.file_upload_id}"
+    
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
@@ -0,0 +1,139 @@
+"""
+PDF text extraction.
+
+``extract_text()`` reads pages one at a time and stops as soon as it has
+its character (or estimated token) budget, so analyzing a 500-page PDF
+parses only its first pages instead of all of them.
+
+``extract_to_path()`` extracts a whole document for jobs that need all of
+it, streaming its text to a file. With several workers, ranges of pages
+are extracted in a process pool, each task writing its pages to a part
+file that is appended to the destination in page order. Readers drop each
+page's parsed content once its text is out, so memory stays bounded by a
+page beyond the page tree whatever the document's size.
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, IndirectObject
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Rough average for English text; budgets in tokens are converted with it
+CHARS_PER_TOKEN = 4
+# Fewest pages per pool task; each task's reader parses the whole page tree
+MIN_PAGES_PER_TASK = 16
+
+def iter_pages(reader, start=0, stop=None):
+    """Yield the text of pages ``start`` to ``stop``, parsing each only when reached"""
+    pages = reader.pages
+    stop = len(pages) if stop is None else min(stop, len(pages))
+    for index in range(start, stop):
+        page = pages[index]
+        text = page.extract_text() or ''
+        forget_contents(reader, page)
+        yield text
+
+def forget_contents(reader, page):
+    """Drop a page's content streams from the reader's cache of parsed objects.
+
+    The cache is PyPDF2's private ``resolved_objects``, as of the version
+    pinned in requirements.txt; without it pages are simply kept.
+    """
+    cache = getattr(reader, 'resolved_objects', None)
+    if not isinstance(cache, dict):
+        return
+    contents = page.raw_get('/Contents') if '/Contents' in page else None
+    for ref in contents if isinstance(contents, ArrayObject) else [contents]:
+        if isinstance(ref, IndirectObject):
+            cache.pop((ref.generation, ref.idnum), None)
+
+def extract_text(pdf_file, max_chars, max_tokens=None):
+    """Text of the first pages, up to ``max_chars`` characters or about ``max_tokens`` tokens"""
+    if max_tokens is not None:
+        max_chars = min(max_chars, max_tokens * CHARS_PER_TOKEN)
+    parts = []
+    size = 0
+    for text in iter_pages(PyPDF2.PdfReader(pdf_file)):
+        parts.append(text)
+        parts.append('\n')
+        size += len(text) + 1
+        if size >= max_chars:
+            break
+    return ''.join(parts)[:max_chars]
+
+def write_pages(reader, out, start=0, stop=None):
+    """Write the text of pages ``start`` to ``stop`` to ``out``; returns its length"""
+    chars = 0
+    for text in iter_pages(reader, start, stop):
+        out.write(text)
+        out.write('\n')
+        chars += len(text) + 1
+    return chars
+
+def extract_part(path, start, stop, destination):
+    """Pool task: write the text of a range of pages to its own part file"""
+    with open(path, 'rb') as pdf_file, open(destination, 'w', encoding='utf-8') as out:
+        return write_pages(PyPDF2.PdfReader(pdf_file), out, start, stop)
+
+def extract_to_path(path, destination, workers=None):
+    """Extract every page of the PDF at ``path`` into the text file ``destination``.
+
+    Returns ``{'pages': ..., 'chars': ...}``. Documents of more than
+    MIN_PAGES_PER_TASK pages are split across ``workers`` processes
+    (default ``settings.PDF_EXTRACT_WORKERS``), one range each. The
+    destination only appears once it is complete.
+    """
+    workers = workers or settings.PDF_EXTRACT_WORKERS
+    partial = f"{destination}.part"
+    parts_dir = None
+    try:
+        with open(path, 'rb') as pdf_file:
+            reader = PyPDF2.PdfReader(pdf_file)
+            pages = len(reader.pages)
+            size = max(MIN_PAGES_PER_TASK, -(-pages // workers))
+            ranges = [(start, min(start + size, pages)) for start in range(0, pages, size)]
+            if len(ranges) <= 1:
+                with open(partial, 'w', encoding='utf-8') as out:
+                    chars = write_pages(reader, out)
+            else:
+                del reader
+                parts_dir = tempfile.mkdtemp(prefix='pdf-pages-', dir=os.path.dirname(os.path.abspath(destination)))
+                chars = extract_parallel(path, ranges, parts_dir, partial)
+        os.replace(partial, destination)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        if parts_dir is not None:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+    logger.info(f"Extracted {pages} pages ({chars} characters) from {path}")
+    return {'pages': pages, 'chars': chars}
+
+def extract_parallel(path, ranges, parts_dir, destination):
+    """Extract page ranges in a process pool and append them to ``destination`` in order"""
+    chars = 0
+    # Spawned rather than forked: the caller may be running background threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as pool:
+        tasks = [
+            (start, pool.submit(extract_part, path, start, stop, os.path.join(parts_dir, f'{start}.txt')))
+            for start, stop in ranges
+        ]
+        with open(destination, 'w', encoding='utf-8') as out:
+            for start, task in tasks:
+                chars += task.result()
+                part = os.path.join(parts_dir, f'{start}.txt')
+                with open(part, encoding='utf-8') as source:
+                    shutil.copyfileobj(source, out)
+                os.remove(part)
+    return chars
@@ -0,0 +1,24 @@
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from alpha_mind.response_cache import invalidate
+from .blobs import release
+from .models import FileAnalysis, FileUpload
+
+@receiver(post_save, sender=FileUpload)
+@receiver(post_delete, sender=FileUpload)
+def file_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id, 'files')
+
+@receiver(post_delete, sender=FileUpload)
+def file_deleted(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release(instance.blob_id)
+
+@receiver(post_save, sender=FileAnalysis)
+@receiver(post_delete, sender=FileAnalysis)
+def analysis_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Model) and not isinstance(origin, FileAnalysis):
+        return  # Deleted with its upload, which invalidates the list itself
+    invalidate(instance.file_upload.user_id, 'files')
@@ -0,0 +1,187 @@
+import hashlib
+import os
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import override_settings
+
+from alpha_mind.testing import FakeEngine, TestCase, login, make_user
+from files import analysis as files_analysis
+from files import blobs
+from files.jobs import enqueue_analysis, run_until_empty
+from files.models import AnalysisJob, FileAnalysis, FileBlob, FileUpload, blob_path
+
+REPORT = b'region,quarter,revenue\n' + b''.join(
+    b'region-%d,Q%d,%d\n' % (n % 7, n % 4 + 1, n * 37 % 1000) for n in range(20000)
+)
+
+def report_file(content=REPORT, name='q3-report.csv'):
+    return SimpleUploadedFile(name, content, content_type='text/csv')
+
+def upload_fields(uploaded_file):
+    return {'original_name': uploaded_file.name, 'file_type': 'excel', 'mime_type': 'text/csv'}
+
+def create_upload(user, uploaded_file=None):
+    uploaded_file = uploaded_file or report_file()
+    return blobs.create_upload(user, uploaded_file, **upload_fields(uploaded_file))
+
+class FailingUpload(SimpleUploadedFile):
+    """Fails after writing its first chunk, running ``during`` in between"""
+
+    def __init__(self, content, during):
+        super().__init__('q3-report.csv', content, content_type='text/csv')
+        self.sha256 = hashlib.sha256(content).hexdigest()
+        self.during = during
+
+    def chunks(self, chunk_size=None):
+        self.seek(0)
+        yield self.read(64 * 1024)
+        self.during()
+        raise OSError('No space left on device')
+
+class UploadDedupTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(MEDIA_ROOT=self.tmp_path))
+        self.user = make_user('upload-dedup')
+        self.client = login(self.user)
+
+    def media(self, *parts):
+        return os.path.join(self.tmp_path, *parts)
+
+    def test_hashed_while_received(self):
+        """Small uploads are kept in memory, large ones spooled to a temporary file"""
+        for size in (1000, 4 * 1024 * 1024):
+            with self.subTest(size=size):
+                content = os.urandom(size)
+                response = self.client.post('/api/files/upload/', {'file': SimpleUploadedFile('data.txt', content)})
+                self.assertEqual(response.status_code, 200)
+                upload = FileUpload.objects.get(id=response.json()['file_id'])
+                self.assertEqual(upload.blob_id, hashlib.sha256(content).hexdigest())
+                self.assertEqual(upload.file.name, blob_path(upload.blob_id))
+                with upload.file.open('rb') as stored:
+                    self.assertEqual(stored.read(), content)
+
+    def test_shared_across_users(self):
+        other = make_user('upload-dedup-other')
+        first = create_upload(self.user)
+        second = create_upload(other)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(FileBlob.objects.get(pk=first.blob_id).ref_count, 2)
+
+        # The API delete keeps bytes another upload still references
+        self.assertEqual(self.client.delete(f'/api/files/{first.id}/delete/').status_code, 200)
+        self.assertEqual(FileBlob.objects.get(pk=first.blob_id).ref_count, 1)
+        self.assertTrue(os.path.exists(self.media(first.file.name)))
+
+        # Deleting the last owner cascades to the upload and frees the bytes
+        other.delete()
+        self.assertFalse(FileBlob.objects.filter(pk=first.blob_id).exists())
+        self.assertFalse(os.path.exists(self.media(first.file.name)))
+
+    def test_missing_bytes_stored_again(self):
+        first = create_upload(self.user)
+        os.remove(self.media(first.file.name))
+        second = create_upload(self.user)
+        with second.file.open('rb') as stored:
+            self.assertEqual(stored.read(), REPORT)
+        self.assertEqual(sorted(os.listdir(self.media(os.path.dirname(first.file.name)))), [first.blob_id])
+
+    def test_failed_write_leaves_no_reference(self):
+        concurrent = []
+
+        def identical_upload():
+            # The partial bytes are not at the blob path, so they are not shared
+            concurrent.append(create_upload(self.user))
+
+        with self.assertRaises(OSError):
+            create_upload(self.user, FailingUpload(REPORT, identical_upload))
+        [upload] = concurrent
+        self.assertEqual(FileBlob.objects.get(pk=upload.blob_id).ref_count, 1)
+        self.assertEqual(FileUpload.objects.filter(blob_id=upload.blob_id).count(), 1)
+        with upload.file.open('rb') as stored:
+            self.assertEqual(stored.read(), REPORT)
+        self.assertEqual(os.listdir(self.media(os.path.dirname(upload.file.name))), [upload.blob_id])
+
+    def test_bytes_deleted_after_commit(self):
+        upload = create_upload(self.user)
+        upload_id, path = upload.pk, self.media(upload.file.name)
+        with transaction.atomic():
+            upload.delete()
+            self.assertTrue(os.path.exists(path))
+            transaction.set_rollback(True)
+        self.assertEqual(FileBlob.objects.get(pk=upload.blob_id).ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        # Referenced again by an identical upload before the delete commits
+        with transaction.atomic():
+            FileUpload.objects.get(pk=upload_id).delete()
+            again = create_upload(self.user)
+        with again.file.open('rb') as stored:
+            self.assertEqual(stored.read(), REPORT)
+
+        again.delete()
+        self.assertFalse(FileBlob.objects.filter(pk=upload.blob_id).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_storage_without_paths(self):
+        storages = {'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}}
+        with override_settings(STORAGES=storages):
+            first = create_upload(self.user)
+            second = create_upload(make_user('upload-dedup-memory'))
+            self.assertEqual(first.file.name, second.file.name)
+            with second.file.open('rb') as stored:
+                self.assertEqual(stored.read(), REPORT)
+            first.delete()
+            second.delete()
+            self.assertFalse(default_storage.exists(first.file.name))
+
+    def test_legacy_upload_delete(self):
+        uploaded_file = report_file()
+        upload = FileUpload.objects.create(
+            user=self.user, file=uploaded_file, file_size=uploaded_file.size, **upload_fields(uploaded_file)
+        )
+        path = upload.file.path
+        self.assertEqual(self.client.delete(f'/api/files/{upload.id}/delete/').status_code, 200)
+        self.assertFalse(os.path.exists(path))
+
+    def test_analysis_reused(self):
+        engine = FakeEngine(reply='Revenue is flat')
+        engine_client = engine.client()
+        self.addCleanup(engine_client.close)
+        self.enterContext(mock.patch.object(files_analysis, 'get_client', lambda: engine_client))
+        extractions = []
+        extract = files_analysis.extract_file_content
+
+        def counted(file_obj):
+            extractions.append(file_obj.id)
+            return extract(file_obj)
+
+        self.enterContext(mock.patch.object(files_analysis, 'extract_file_content', counted))
+        other = make_user('upload-dedup-reader')
+        first = create_upload(self.user)
+        second = create_upload(other)
+
+        enqueue_analysis(self.user, first, 'Summarize revenue', 'openai/gpt-4')
+        self.assertEqual(run_until_empty(), 1)
+        self.assertEqual(len(engine.requests), 1)
+        self.assertIn('region-0', engine.requests[0]['messages'][1]['content'])
+
+        # Identical content, query and model: copied without the engine
+        job, _ = enqueue_analysis(other, second, 'Summarize revenue', 'openai/gpt-4')
+        self.assertEqual(run_until_empty(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_SUCCEEDED)
+        self.assertEqual(len(engine.requests), 1)
+        reused = FileAnalysis.objects.get(file_upload=second)
+        self.assertEqual(reused.summary, 'Revenue is flat')
+        self.assertTrue(reused.metadata['reused'])
+        self.assertEqual(reused.cost, 0)
+
+        # Another question asks the engine again, from the cached extraction
+        enqueue_analysis(other, second, 'Which region leads?', 'openai/gpt-4')
+        self.assertEqual(run_until_empty(), 1)
+        self.assertEqual(len(engine.requests), 2)
+        self.assertEqual(extractions, [first.id])
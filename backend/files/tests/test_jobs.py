@@ -0,0 +1,176 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from alpha_mind import fastjson, response_cache
+from alpha_mind.testing import FakeEngine, TestCase, login, make_upload, make_user
+from files import analysis as files_analysis
+from files.jobs import Worker, claim_job, enqueue_analysis, requeue_expired, run_until_empty
+from files.models import AnalysisJob, FileAnalysis
+
+class AnalysisJobTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.engine = FakeEngine()
+        engine_client = self.engine.client()
+        self.addCleanup(engine_client.close)
+        self.enterContext(mock.patch.object(files_analysis, 'get_client', lambda: engine_client))
+        self.enterContext(override_settings(MEDIA_ROOT=self.tmp_path, FILE_JOBS_RETRY_DELAY=0))
+        self.user = make_user('file-jobs')
+        self.client = login(self.user)
+
+    def analyze(self, file_id, query='Summarize'):
+        return self.client.post(
+            '/api/files/analyze/', fastjson.dumps({'file_id': str(file_id), 'query': query, 'model': 'openai/gpt-4'}),
+            content_type='application/json'
+        )
+
+    def enqueue(self, user=None):
+        user = user or self.user
+        job, _ = enqueue_analysis(user, make_upload(user), 'Summarize', 'openai/gpt-4')
+        return job
+
+    def test_job_lifecycle(self):
+        upload = make_upload(self.user)
+        response = self.analyze(upload.id)
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual((job['status'], job['deduplicated'], job['result']), ('queued', False, None))
+        self.assertEqual(response['Location'], f"/api/files/jobs/{job['job_id']}/")
+
+        # An identical request while the first is queued shares its job
+        again = self.analyze(upload.id).json()
+        self.assertEqual((again['job_id'], again['deduplicated']), (job['job_id'], True))
+        self.assertNotEqual(self.analyze(upload.id, query='Other question').json()['job_id'], job['job_id'])
+
+        seen = []
+        worker = Worker(poll_interval=0)
+        original = files_analysis.get_ai_analysis
+
+        def observe(*args):
+            running = AnalysisJob.objects.get(user=self.user, status=AnalysisJob.STATUS_RUNNING)
+            polled = self.client.get(f'/api/files/jobs/{running.id}/').json()
+            seen.append((polled['status'], polled['stage'], polled['progress']))
+            return original(*args)
+
+        with mock.patch.object(files_analysis, 'get_ai_analysis', observe):
+            self.assertEqual(run_until_empty(worker), 2)
+        self.assertEqual(seen, [('running', 'analyzing', 40)] * 2)
+        self.assertEqual(worker.stats['succeeded'], 2)
+
+        done = self.client.get(response['Location']).json()
+        self.assertEqual((done['status'], done['progress'], done['attempts']), ('succeeded', 100, 1))
+        self.assertEqual(done['result']['summary'], 'A summary')
+
+        # Analyzing the same file again replaces the stored analysis
+        third = self.analyze(upload.id).json()
+        self.assertNotEqual(third['job_id'], job['job_id'])
+        self.assertFalse(third['deduplicated'])
+        self.assertEqual(run_until_empty(worker), 1)
+        self.assertEqual(FileAnalysis.objects.filter(file_upload=upload).count(), 1)
+        self.assertEqual(self.client.get(f"/api/files/jobs/{third['job_id']}/").json()['status'], 'succeeded')
+
+        listed = self.client.get('/api/files/jobs/?status=succeeded&limit=2').json()
+        self.assertEqual(listed['jobs'][0]['job_id'], third['job_id'])
+        self.assertTrue(listed['has_more'])
+
+    def test_retries_then_fails(self):
+        self.engine.failures = 2
+        job = self.enqueue()
+        worker = Worker(poll_interval=0)
+        with override_settings(FILE_JOBS_MAX_ATTEMPTS=3):
+            self.assertEqual(run_until_empty(worker), 3)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (AnalysisJob.STATUS_SUCCEEDED, 3, ''))
+        self.assertEqual(worker.stats, {'succeeded': 1, 'retried': 2, 'failed': 0, 'requeued': 0})
+
+        self.engine.failures = 5
+        job = self.enqueue()
+        with override_settings(FILE_JOBS_MAX_ATTEMPTS=2):
+            self.assertEqual(run_until_empty(worker), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.STATUS_FAILED, 2))
+        self.assertTrue(job.error.startswith('AI analysis failed'))
+
+    def test_backoff_delays_retry(self):
+        self.engine.failures = 1
+        job = self.enqueue()
+        with override_settings(FILE_JOBS_RETRY_DELAY=60):
+            self.assertEqual(run_until_empty(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_QUEUED)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        self.assertIsNone(claim_job('test-worker'))
+
+    def test_unreadable_file_fails_at_once(self):
+        upload = make_upload(self.user, content=b'', name='empty.txt')
+        job, _ = enqueue_analysis(self.user, upload, 'Summarize', 'openai/gpt-4')
+        self.assertEqual(run_until_empty(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.STATUS_FAILED, 1))
+        self.assertIn('Could not extract content', job.error)
+
+    def test_running_cap_per_user(self):
+        other = make_user('file-jobs-other')
+        for _ in range(3):
+            self.enqueue()
+        self.enqueue(other)
+        with override_settings(FILE_JOBS_MAX_RUNNING_PER_USER=2):
+            claimed = [claim_job(f'test-worker-{n}') for n in range(4)]
+        self.assertEqual(
+            [job.user_id if job else None for job in claimed], [self.user.pk, self.user.pk, other.pk, None]
+        )
+
+    def test_queue_cap_per_user(self):
+        with override_settings(FILE_JOBS_MAX_QUEUED_PER_USER=2):
+            self.assertEqual(self.analyze(make_upload(self.user).id).status_code, 202)
+            self.assertEqual(self.analyze(make_upload(self.user).id).status_code, 202)
+            response = self.analyze(make_upload(self.user).id)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Too many queued analyses', response.json()['error'])
+
+    def test_expired_lease_requeued(self):
+        job = self.enqueue()
+        self.assertEqual(claim_job('test-dead-worker').pk, job.pk)
+        # The worker died without renewing its lease
+        AnalysisJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(requeue_expired(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.stage), (AnalysisJob.STATUS_QUEUED, '', 'retrying'))
+        self.assertEqual(run_until_empty(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.STATUS_SUCCEEDED, 2))
+
+    def test_burst_command(self):
+        for _ in range(3):
+            self.enqueue()
+        out = io.StringIO()
+        call_command('run_file_jobs', '--burst', stdout=out)
+        self.assertIn('Ran 3 analysis jobs', out.getvalue())
+
+    def test_file_responses_fresh_after_worker(self):
+        """A local-memory cache never sees the invalidations of a worker process"""
+        for backend, cached in [
+            ('django.core.cache.backends.locmem.LocMemCache', False),
+            ('django.core.cache.backends.filebased.FileBasedCache', True),
+        ]:
+            with self.subTest(backend=backend):
+                upload = make_upload(self.user)
+                url = f'/api/files/{upload.id}/'
+                caches = {'default': {'BACKEND': backend, 'LOCATION': f'{self.tmp_path}/cache'}}
+                with override_settings(CACHES=caches):
+                    self.assertNotIn('analysis', self.client.get(url).json())
+                    hits = response_cache.stats.snapshot().get('files', {}).get('hits', 0)
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                    self.assertEqual(response_cache.stats.snapshot().get('files', {}).get('hits', 0), hits + cached)
+
+                    if not cached:
+                        # As if run in another process: its version bumps reach another cache
+                        with mock.patch.object(response_cache, 'bump_versions', lambda *args: None):
+                            self.analyze(upload.id)
+                            self.assertEqual(run_until_empty(), 1)
+                        self.assertEqual(self.client.get(url).json()['analysis']['summary'], 'A summary')
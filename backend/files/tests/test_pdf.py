@@ -0,0 +1,61 @@
+import io
+import os
+import tempfile
+
+import PyPDF2
+from django.conf import settings
+from django.test import SimpleTestCase
+from PyPDF2.generic import StreamObject
+
+from alpha_mind.testing import build_pdf
+from files import pdf
+
+PAGES = 50
+LINES_PER_PAGE = 40
+
+class PdfExtractionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.document = build_pdf(PAGES, LINES_PER_PAGE)
+
+    def setUp(self):
+        self.tmp_path = self.enterContext(tempfile.TemporaryDirectory())
+        self.path = os.path.join(self.tmp_path, 'report.pdf')
+        with open(self.path, 'wb') as out:
+            out.write(self.document)
+
+    def test_token_budget(self):
+        content = pdf.extract_text(io.BytesIO(self.document), 10**6, max_tokens=500)
+        self.assertEqual(len(content), 500 * pdf.CHARS_PER_TOKEN)
+        self.assertTrue(content.startswith('Page 0 line 0'))
+
+    def test_whole_document(self):
+        expected = pdf.extract_text(io.BytesIO(self.document), 10**9)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                destination = os.path.join(self.tmp_path, f'text-{workers}.txt')
+                summary = pdf.extract_to_path(self.path, destination, workers=workers)
+                self.assertEqual(summary, {'pages': PAGES, 'chars': len(expected)})
+                with open(destination, encoding='utf-8') as text:
+                    self.assertEqual(text.read(), expected)
+        self.assertEqual(sorted(os.listdir(self.tmp_path)), ['report.pdf', 'text-1.txt', 'text-2.txt'])
+
+    def test_parsed_pages_released(self):
+        """Guards forget_contents, which relies on PyPDF2's private cache of parsed objects"""
+        with open(settings.BASE_DIR / 'requirements.txt') as requirements:
+            self.assertIn(f'PyPDF2=={PyPDF2.__version__}\n', requirements.read())
+        reader = PyPDF2.PdfReader(io.BytesIO(self.document))
+        self.assertIsInstance(reader.resolved_objects, dict)
+        text = ''.join(pdf.iter_pages(reader))
+        # Each page's content stream is dropped once its text is out
+        self.assertFalse([value for value in reader.resolved_objects.values() if isinstance(value, StreamObject)])
+        self.assertIn(f'Page {PAGES - 1} line {LINES_PER_PAGE - 1}', text)
+
+    def test_failed_extraction_leaves_nothing(self):
+        with open(self.path, 'wb') as out:
+            out.write(self.document[:-200])
+        for workers in (1, 2):
+            with self.subTest(workers=workers), self.assertRaises(Exception):
+                pdf.extract_to_path(self.path, os.path.join(self.tmp_path, 'text.txt'), workers=workers)
+        self.assertEqual(os.listdir(self.tmp_path), ['report.pdf'])
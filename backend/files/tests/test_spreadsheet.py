@@ -0,0 +1,103 @@
+import os
+import tempfile
+import tracemalloc
+
+import openpyxl
+import pandas as pd
+from django.test import SimpleTestCase
+
+from alpha_mind.testing import Upload, make_frame, write_workbook
+from files import spreadsheet
+from files.analysis import CONTENT_LIMIT
+
+ROWS = 50000
+SHEET_ROWS = 2000
+CHUNK_ROWS = 5000
+
+def traced_peak(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+class SpreadsheetProfileTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_path = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.frame = make_frame(ROWS)
+        cls.csv_path = os.path.join(cls.tmp_path, 'orders.csv')
+        cls.frame.to_csv(cls.csv_path, index=False)
+        cls.xlsx_path = write_workbook(os.path.join(cls.tmp_path, 'orders.xlsx'), SHEET_ROWS)
+
+    def open(self, path):
+        upload = Upload(path)
+        self.addCleanup(upload.close)
+        return upload
+
+    def test_csv_memory(self):
+        whole = traced_peak(pd.read_csv, self.open(self.csv_path))
+        chunked = traced_peak(spreadsheet.summarize, self.open(self.csv_path), CONTENT_LIMIT, CHUNK_ROWS)
+        self.assertLess(chunked, whole / 3)
+
+    def test_csv_profiles(self):
+        [sheet] = spreadsheet.profile(self.open(self.csv_path), CHUNK_ROWS)
+        self.assertEqual(sheet.rows, ROWS)
+        columns = {name: column.as_dict() for name, column in sheet.columns.items()}
+
+        amount = columns['amount']
+        expected = self.frame['amount']
+        self.assertEqual(amount['type'], 'numeric')
+        self.assertEqual(amount['nulls'], expected.isna().sum())
+        self.assertEqual((amount['min'], amount['max']), (expected.min(), expected.max()))
+        self.assertAlmostEqual(amount['mean'], expected.mean())
+
+        region = columns['region']
+        self.assertEqual((region['type'], region['distinct']), ('text', 4))
+        self.assertEqual(region['top'], list(self.frame['region'].value_counts().items())[:4])
+
+        self.assertAlmostEqual(columns['customer']['distinct'], self.frame['customer'].nunique(), delta=250)
+        self.assertAlmostEqual(columns['order_id']['distinct'], ROWS, delta=ROWS * 0.05)
+        # Timestamps in a CSV are text until parsed
+        self.assertEqual(columns['ordered_at']['type'], 'text')
+
+    def test_xlsx_profiles(self):
+        sheets = spreadsheet.profile(self.open(self.xlsx_path), CHUNK_ROWS)
+        self.assertEqual(
+            [(sheet.name, sheet.rows) for sheet in sheets],
+            [('2025', SHEET_ROWS), ('2026', SHEET_ROWS), ('returns', 50)]
+        )
+
+        expected = make_frame(SHEET_ROWS, 2)
+        columns = {name: column.as_dict() for name, column in sheets[1].columns.items()}
+        self.assertEqual(columns['ordered_at']['type'], 'datetime')
+        self.assertEqual(columns['ordered_at']['min'], expected['ordered_at'].min().isoformat())
+        self.assertEqual(columns['amount']['nulls'], expected['amount'].isna().sum())
+        self.assertAlmostEqual(columns['amount']['mean'], expected['amount'].mean())
+        self.assertEqual(dict(sheets[2].columns['reason'].as_dict()['top']), {'damaged': 33, 'late': 17})
+
+    def test_xlsx_summary_covers_every_sheet(self):
+        content = spreadsheet.summarize(self.open(self.xlsx_path), CONTENT_LIMIT, CHUNK_ROWS)
+        self.assertIn('Sheets: 3', content)
+        self.assertIn('Sheet: returns', content)
+
+    def test_xlsx_duplicate_headers(self):
+        """Repeated and empty header cells are renamed like pd.read_excel does"""
+        path = os.path.join(self.tmp_path, 'totals.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['Total', 'Total', 'Total.1', None, 'Total'])
+        for n in range(30):
+            sheet.append([n, n * 2, 'x', n % 3, n * 3])
+        workbook.save(path)
+
+        [profile] = spreadsheet.profile(self.open(path), CHUNK_ROWS)
+        expected = pd.read_excel(path)
+        names = ['Total', 'Total.2', 'Total.1', 'Unnamed: 3', 'Total.3']
+        self.assertEqual(list(profile.columns), names)
+        self.assertEqual(list(expected.columns), names)
+        columns = {name: column.as_dict() for name, column in profile.columns.items()}
+        self.assertEqual((columns['Total.2']['type'], columns['Total.2']['max']), ('numeric', 58))
+        self.assertEqual(columns['Total.1']['type'], 'text')
@@ -1,22 +1,24 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
+from django.http import HttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.db import transaction
-import json
-import requests
 import mimetypes
-import PyPDF2
 from PIL import Image
-import pandas as pd
 from io import BytesIO
-import time
 
-from .models import FileUpload, FileAnalysis, FileQuery
+from alpha_mind import fastjson
+from alpha_mind.fastjson import JsonResponse
+from alpha_mind.pagination import InvalidCursor, get_page_size, paginate_keyset
+from alpha_mind.response_cache import cached_response
+from gateway.accounting import record_usage
+from .blobs import create_upload
+from .jobs import QueueFull, enqueue_analysis
+from .models import AnalysisJob, FileUpload, FileAnalysis, FileQuery
 
 @method_decorator(csrf_exempt, name='dispatch')
 @permission_classes([IsAuthenticated])
@@ -39,16 +41,15 @@ class FileUploadView(View):
             if file_type not in ['pdf', 'image', 'excel', 'text']:
                 return JsonResponse({'error': 'Unsupported file type'}, status=400)
             
-            # Create file upload record
-            with transaction.atomic():
-                file_upload = FileUpload.objects.create(
-                    user=request.user,
-                    file=uploaded_file,
-                    original_name=uploaded_file.name,
-                    file_type=file_type,
-                    file_size=uploaded_file.size,
-                    mime_type=mime_type or 'application/octet-stream'
-                )
+            # Create file upload record; identical content is stored once
+            file_upload = create_upload(
+                request.user,
+                uploaded_file,
+                original_name=uploaded_file.name,
+                file_type=file_type,
+                mime_type=mime_type or 'application/octet-stream'
+            )
+            record_usage(request.user.id, files=1)
             
             return JsonResponse({
                 'file_id': str(file_upload.id),
@@ -82,9 +83,19 @@ class FileUploadView(View):
 
 @permission_classes([IsAuthenticated])
 class FileListView(View):
+    """Keyset-paginated uploads, newest first, with their analysis summaries"""
+    
+    @cached_response('files', shared_only=True)
     def get(self, request):
         try:
-            files = FileUpload.objects.filter(user=request.user).order_by('-uploaded_at')
+            limit = get_page_size(request.GET.get('limit'))
+            files, next_cursor = paginate_keyset(
+                FileUpload.objects.filter(user=request.user).select_related('analysis'),
+                'uploaded_at',
+                limit,
+                after=request.GET.get('cursor'),
+                descending=True
+            )
             
             files_data = []
             for file_obj in files:
@@ -109,16 +120,25 @@ class FileListView(View):
                 
                 files_data.append(file_data)
             
-            return JsonResponse({'files': files_data})
+            return JsonResponse({
+                'files': files_data,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
             
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 @permission_classes([IsAuthenticated])
 class FileDetailView(View):
+    @cached_response('files', shared_only=True)
     def get(self, request, file_id):
         try:
-            file_obj = get_object_or_404(FileUpload, id=file_id, user=request.user)
+            file_obj = get_object_or_404(
+                FileUpload.objects.select_related('analysis'), id=file_id, user=request.user
+            )
             
             file_data = {
                 'id': str(file_obj.id),
@@ -154,8 +174,10 @@ class FileDeleteView(View):
         try:
             file_obj = get_object_or_404(FileUpload, id=file_id, user=request.user)
             
-            # Delete file from storage and database
-            file_obj.file.delete()
+            # Delete file from storage and database; shared content goes
+            # with its last upload (files.signals)
+            if file_obj.blob_id is None:
+                file_obj.file.delete(save=False)
             file_obj.delete()
             
             return JsonResponse({'message': 'File deleted successfully'})
@@ -166,9 +188,11 @@ class FileDeleteView(View):
 @method_decorator(csrf_exempt, name='dispatch')
 @permission_classes([IsAuthenticated])
 class FileAnalyzeView(View):
+    """Queue an analysis and answer 202 with the job to poll"""
+    
     def post(self, request):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             file_id = data.get('file_id')
             query = data.get('query', 'Analyze this file and provide a comprehensive summary')
             model = data.get('model', 'gpt-4-vision-preview')
@@ -178,142 +202,94 @@ class FileAnalyzeView(View):
             
             file_obj = get_object_or_404(FileUpload, id=file_id, user=request.user)
             
-            # Extract content from file
-            start_time = time.time()
-            content = self.extract_file_content(file_obj)
-            
-            if not content:
-                return JsonResponse({'error': 'Could not extract content from file'}, status=400)
-            
-            # Get AI analysis
             try:
-                analysis_result = self.get_ai_analysis(content, query, model)
-                analysis_time = time.time() - start_time
-                
-                # Save analysis
-                analysis = FileAnalysis.objects.create(
-                    file_upload=file_obj,
-                    summary=analysis_result['summary'],
-                    insights=analysis_result['insights'],
-                    metadata=analysis_result.get('metadata', {}),
-                    analysis_model=model,
-                    analysis_time=analysis_time,
-                    token_count=analysis_result.get('token_count'),
-                    cost=analysis_result.get('cost', 0)
-                )
-                
-                return JsonResponse({
-                    'analysis_id': str(analysis.id),
-                    'summary': analysis.summary,
-                    'insights': analysis.insights,
-                    'metadata': analysis.metadata,
-                    'analysis_model': analysis.analysis_model,
-                    'analysis_time': analysis.analysis_time,
-                    'token_count': analysis.token_count,
-                    'cost': float(analysis.cost),
-                    'created_at': analysis.created_at.isoformat()
-                })
-                
-            except Exception as e:
-                return JsonResponse({'error': f'AI analysis failed: {str(e)}'}, status=500)
-                
-        except json.JSONDecodeError:
+                job, created = enqueue_analysis(request.user, file_obj, query, model)
+            except QueueFull as e:
+                return JsonResponse({'error': str(e)}, status=429)
+            
+            response = JsonResponse({
+                **job_data(job),
+                'deduplicated': not created
+            }, status=202)
+            response['Location'] = reverse('analysis-job', kwargs={'job_id': job.id})
+            return response
+            
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+def job_data(job, analysis=None):
+    """Status of an analysis job, with the analysis once it has succeeded"""
+    data = {
+        'job_id': str(job.id),
+        'file_id': str(job.file_upload_id),
+        'status': job.status,
+        'progress': job.progress,
+        'stage': job.stage,
+        'attempts': job.attempts,
+        'error': job.error or None,
+        'model': job.model,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': None
+    }
+    if analysis is not None:
+        data['result'] = {
+            'analysis_id': str(analysis.id),
+            'summary': analysis.summary,
+            'insights': analysis.insights,
+            'metadata': analysis.metadata,
+            'analysis_model': analysis.analysis_model,
+            'analysis_time': analysis.analysis_time,
+            'token_count': analysis.token_count,
+            'cost': float(analysis.cost),
+            'created_at': analysis.created_at.isoformat()
+        }
+    return data
+
+@permission_classes([IsAuthenticated])
+class AnalysisJobListView(View):
+    """Keyset-paginated analysis jobs, newest first; ``status`` filters"""
     
-    def extract_file_content(self, file_obj):
-        """Extract text content from uploaded file"""
-        try:
-            file_obj.file.seek(0)
-            
-            if file_obj.file_type == 'pdf':
-                return self.extract_pdf_content(file_obj.file)
-            elif file_obj.file_type == 'image':
-                return f"Image file: {file_obj.original_name}"
-            elif file_obj.file_type == 'excel':
-                return self.extract_excel_content(file_obj.file)
-            elif file_obj.file_type == 'text':
-                return file_obj.file.read().decode('utf-8', errors='ignore')
-            
-            return None
-            
-        except Exception as e:
-            print(f"Error extracting content: {e}")
-            return None
-    
-    def extract_pdf_content(self, pdf_file):
-        """Extract text from PDF file"""
-        try:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            content = ""
-            
-            for page in pdf_reader.pages:
-                content += page.extract_text() + "\n"
-            
-            return content[:10000]  # Limit to 10k characters
-            
-        except Exception as e:
-            print(f"Error extracting PDF content: {e}")
-            return None
-    
-    def extract_excel_content(self, excel_file):
-        """Extract data from Excel file"""
+    def get(self, request):
         try:
-            if excel_file.name.endswith('.csv'):
-                df = pd.read_csv(excel_file)
-            else:
-                df = pd.read_excel(excel_file)
-            
-            # Convert to string representation
-            content = f"Excel file: {excel_file.name}\n"
-            content += f"Shape: {df.shape}\n"
-            content += f"Columns: {list(df.columns)}\n\n"
-            content += df.head(100).to_string()  # First 100 rows
+            jobs = AnalysisJob.objects.filter(user=request.user)
+            status = request.GET.get('status')
+            if status:
+                jobs = jobs.filter(status=status)
+            
+            limit = get_page_size(request.GET.get('limit'))
+            page, next_cursor = paginate_keyset(
+                jobs,
+                'created_at',
+                limit,
+                after=request.GET.get('cursor'),
+                descending=True
+            )
             
-            return content[:10000]  # Limit to 10k characters
+            return JsonResponse({
+                'jobs': [job_data(job) for job in page],
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
             
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
-            print(f"Error extracting Excel content: {e}")
-            return None
+            return JsonResponse({'error': str(e)}, status=500)
+
+@permission_classes([IsAuthenticated])
+class AnalysisJobView(View):
+    """Progress of one analysis job, and its result once it has succeeded"""
     
-    def get_ai_analysis(self, content, query, model):
-        """Get AI analysis of file content"""
+    def get(self, request, job_id):
         try:
-            ai_engine_url = 'http://localhost:4000/chat'
-            payload = {
-                'messages': [
-                    {
-                        'role': 'system',
-                        'content': 'You are a helpful AI assistant that analyzes uploaded files. Provide comprehensive summaries and insights.'
-                    },
-                    {
-                        'role': 'user',
-                        'content': f"File Content:\n\n{content}\n\nQuery: {query}"
-                    }
-                ],
-                'model': model,
-                'max_tokens': 2000,
-                'temperature': 0.3
-            }
-            
-            response = requests.post(ai_engine_url, json=payload, timeout=60)
-            response.raise_for_status()
-            
-            data = response.json()
-            ai_response = data['choices'][0]['message']['content']
-            
-            # Parse response (in production, use structured output)
-            summary = ai_response
-            insights = [ai_response]  # Simplified for now
-            
-            return {
-                'summary': summary,
-                'insights': insights,
-                'metadata': {'content_length': len(content)},
-                'token_count': data.get('usage', {}).get('total_tokens', 0),
-                'cost': 0.01  # Placeholder
-            }
+            job = get_object_or_404(
+                AnalysisJob.objects.select_related('analysis'), id=job_id, user=request.user
+            )
+            return JsonResponse(job_data(job, job.analysis if job.status == AnalysisJob.STATUS_SUCCEEDED else None))
             
         except Exception as e:
-            raise Exception(f"AI analysis error: {str(e)}")
+            return JsonResponse({'error': str(e)}, status=500)
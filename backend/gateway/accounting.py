@@ -0,0 +1,329 @@
+"""
+Write-behind usage accounting.
+
+Request handlers call ``record_usage()``, which appends the event to a local
+journal and queues it in memory; nothing touches the database on the request
+path. A background thread flushes the queue every
+``settings.USAGE_FLUSH_INTERVAL`` seconds in one transaction: events are
+summed per user and day into ``UserUsage`` with ``F()`` increments, and
+written to ``ModelUsage`` with one ``bulk_create``.
+
+Each process journals to its own segment file in
+``settings.USAGE_JOURNAL_DIR`` and holds an exclusive lock on it. A flush
+starts a new segment and deletes the old one once its events are committed.
+On startup, segments left behind by dead processes (no longer locked) are
+replayed. Delivery is at least once: a crash between the commit and the
+delete replays that segment.
+"""
+
+import atexit
+import glob
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from alpha_mind import fastjson
+
+logger = logging.getLogger(__name__)
+
+# Engine prices are per million tokens
+PRICE_UNIT = Decimal(1_000_000)
+
+class JournalSegment:
+    """An append-only journal file, locked for as long as its owner is alive"""
+
+    def __init__(self, path, file):
+        self.path = path
+        self.file = file
+
+    @classmethod
+    def create(cls, directory):
+        path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:12]}.journal")
+        file = open(path, 'ab')
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        return cls(path, file)
+
+    @classmethod
+    def claim(cls, path):
+        """Open an orphaned segment, or return None if its owner is alive"""
+        if fcntl is None:
+            return None  # Live and orphaned segments cannot be told apart
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return None
+        if os.fstat(file.fileno()).st_nlink == 0:
+            file.close()  # Flushed and deleted by its owner after we opened it
+            return None
+        return cls(path, file)
+
+    def append(self, event):
+        self.file.write(fastjson.dumps(event) + b'\n')
+        self.file.flush()
+        if settings.USAGE_JOURNAL_FSYNC:
+            os.fsync(self.file.fileno())
+
+    def read_events(self):
+        events = []
+        self.file.seek(0)
+        for line in self.file:
+            try:
+                events.append(fastjson.loads(line))
+            except fastjson.JSONDecodeError:
+                logger.warning(f"Skipping torn usage journal line in {self.path}")
+        return events
+
+    def discard(self):
+        os.unlink(self.path)
+        self.file.close()
+
+def event_cost(event, model):
+    if event.get('cost') is not None:
+        return Decimal(str(event['cost']))
+    if model is None:
+        return Decimal(0)
+    return (
+        event['input_tokens'] * model.input_price + event['output_tokens'] * model.output_price
+    ) / PRICE_UNIT
+
+def apply_events(events):
+    """Write a batch of usage events to UserUsage and ModelUsage.
+
+    Returns the cost each event was written with, None for those skipped.
+    """
+    from users.models import UserUsage
+    from .models import AIModel, ModelUsage
+
+    user_ids = set(User.objects.filter(
+        id__in={event['user_id'] for event in events}
+    ).values_list('id', flat=True))
+    models = AIModel.objects.only('id', 'input_price', 'output_price').in_bulk(
+        {event['model'] for event in events if event.get('model')}
+    )
+
+    daily = defaultdict(lambda: {
+        'messages_sent': 0, 'tokens_used': 0, 'files_uploaded': 0, 'cost_incurred': Decimal(0)
+    })
+    model_rows = []
+    costs = []
+    for event in events:
+        if event['user_id'] not in user_ids:
+            costs.append(None)
+            continue  # Deleted since the event was recorded
+        timestamp = datetime.fromisoformat(event['timestamp'])
+        model = models.get(event.get('model'))
+        cost = event_cost(event, model)
+        costs.append(cost)
+
+        totals = daily[(event['user_id'], timezone.localdate(timestamp))]
+        totals['messages_sent'] += event['messages']
+        totals['tokens_used'] += event['input_tokens'] + event['output_tokens']
+        totals['files_uploaded'] += event['files']
+        totals['cost_incurred'] += cost
+
+        if model is not None:
+            model_rows.append(ModelUsage(
+                user_id=event['user_id'],
+                model=model,
+                session_id=event.get('session_id'),
+                input_tokens=event['input_tokens'],
+                output_tokens=event['output_tokens'],
+                total_cost=cost,
+                response_time=event['response_time'],
+                success=event['success'],
+                error_message=event['error_message'],
+                created_at=timestamp
+            ))
+
+    with transaction.atomic():
+        # Make sure every (user, date) row exists, then increment in place
+        UserUsage.objects.bulk_create(
+            [UserUsage(user_id=user_id, date=day) for user_id, day in daily],
+            ignore_conflicts=True
+        )
+        for (user_id, day), totals in daily.items():
+            UserUsage.objects.filter(user_id=user_id, date=day).update(
+                **{field: F(field) + value for field, value in totals.items()}
+            )
+        ModelUsage.objects.bulk_create(model_rows, batch_size=500)
+    return costs
+
+class UsageAccountant:
+    """Journals usage events and flushes them to the database in batches"""
+
+    def __init__(self, journal_dir=None, interval=None):
+        self.journal_dir = str(journal_dir or settings.USAGE_JOURNAL_DIR)
+        self.interval = interval if interval is not None else settings.USAGE_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._events = []
+        self._segment = None
+        self._pending = []  # (segment, events) not yet committed
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'recorded': 0, 'flushed': 0, 'recovered': 0, 'errors': 0}
+
+    def record(self, event):
+        with self._lock:
+            if self._thread is None:
+                self.start()
+            self._segment.append(event)
+            self._events.append(event)
+            self.stats['recorded'] += 1
+
+    def start(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        if self._segment is None:
+            self._segment = JournalSegment.create(self.journal_dir)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='usage-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        self.recover()
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def recover(self):
+        """Replay segments left behind by processes that exited without flushing"""
+        own = {self._segment.path} if self._segment else set()
+        for path in glob.glob(os.path.join(self.journal_dir, '*.journal')):
+            if path in own:
+                continue
+            segment = JournalSegment.claim(path)
+            if segment is None:
+                continue
+            try:
+                events = segment.read_events()
+                if events:
+                    apply_events(events)
+                segment.discard()
+                self.stats['recovered'] += len(events)
+                logger.info(f"Recovered {len(events)} usage events from {path}")
+            except Exception:
+                segment.file.close()
+                self.stats['errors'] += 1
+                logger.exception(f"Failed to recover usage journal {path}")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write queued events to the database, returning how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+                if events:
+                    self._pending.append((self._segment, events))
+                    self._segment = JournalSegment.create(self.journal_dir)
+
+            written = 0
+            try:
+                while self._pending:
+                    segment, events = self._pending[0]
+                    try:
+                        costs = apply_events(events)
+                    except Exception:
+                        # Kept for the next flush; the journal still has them
+                        self.stats['errors'] += 1
+                        logger.exception(f"Failed to flush {len(events)} usage events")
+                        break
+                    self._pending.pop(0)
+                    segment.discard()
+                    written += len(events)
+                    self.notify_flushed(events, costs)
+            finally:
+                close_old_connections()
+            self.stats['flushed'] += written
+            return written
+
+    def notify_flushed(self, events, costs):
+        from .quotas import get_quotas
+
+        try:
+            get_quotas().flushed(events, costs)
+        except Exception:
+            logger.exception("Failed to update quota counters")
+
+    def flushes_held(self):
+        """Lock that waits for a running flush and holds off the next one"""
+        return self._flush_lock
+
+    def close(self):
+        """Stop the flusher and write what is left"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+        with self._lock:
+            if self._segment is not None and not self._events and not self._pending:
+                self._segment.discard()
+                self._segment = None
+
+_accountant = None
+_accountant_lock = threading.Lock()
+
+def get_accountant():
+    """Return the process-wide usage accountant"""
+    global _accountant
+    if _accountant is None:
+        with _accountant_lock:
+            if _accountant is None:
+                _accountant = UsageAccountant()
+    return _accountant
+
+def record_usage(user_id, model='', input_tokens=0, output_tokens=0, response_time=0.0,
+                 success=True, error_message='', session_id=None, messages=0, files=0, cost=None):
+    """Queue a usage event; ``cost`` defaults to the model's token pricing.
+
+    Never raises, so accounting problems cannot fail the request.
+    """
+    from .quotas import get_quotas
+
+    try:
+        quotas = get_quotas()
+        if cost is None:
+            # Priced now, so quota counters and the stored usage agree
+            cost = quotas.price(model, input_tokens or 0, output_tokens or 0)
+        now = timezone.now()
+        event = {
+            'user_id': user_id,
+            'model': model,
+            'session_id': str(session_id) if session_id else None,
+            'input_tokens': input_tokens or 0,
+            'output_tokens': output_tokens or 0,
+            'response_time': response_time,
+            'success': success,
+            'error_message': error_message[:1000],
+            'messages': messages,
+            'files': files,
+            'cost': str(cost) if cost is not None else None,
+            'timestamp': now.isoformat()
+        }
+        get_accountant().record(event)
+        quotas.recorded(event, timezone.localdate(now))
+    except Exception:
+        logger.exception("Failed to record usage event")
@@ -0,0 +1,213 @@
+"""
+Cached model catalog.
+
+The gateway keeps the engine's model list in memory, indexed by id, and a
+background thread refreshes it every ``settings.MODEL_CATALOG_REFRESH_INTERVAL``
+seconds. Each refresh that changes the list is bulk-upserted into ``AIModel``
+(pricing, context window, capabilities), and models the engine no longer
+lists are marked unavailable, so the database copy stays current for other
+processes and for when the engine is down.
+
+Requests never wait on the engine: until the first refresh succeeds the
+catalog serves the available ``AIModel`` rows. Each catalog version carries
+an ETag and its pre-serialized JSON body.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from alpha_mind import fastjson
+from alpha_mind.engine_client import EngineError, get_client
+
+logger = logging.getLogger(__name__)
+
+# Retry sooner than the refresh interval while the engine is unreachable
+RETRY_INTERVAL = 30.0
+
+UPSERT_FIELDS = [
+    'name', 'provider', 'description', 'context_window', 'max_tokens', 'input_price',
+    'output_price', 'capabilities', 'is_available', 'is_local', 'updated_at'
+]
+
+def engine_entry(data):
+    """Catalog entry for a model as listed by the engine"""
+    return {
+        'id': data['id'],
+        'name': data['name'],
+        'provider': data['provider'],
+        'description': data['description'],
+        'context_window': data['context_window'],
+        'max_tokens': data.get('max_tokens', data['context_window']),
+        'pricing': data['pricing'],
+        'capabilities': data['capabilities'],
+        'is_available': data['is_available'],
+        'is_local': data['is_local']
+    }
+
+def model_entry(model):
+    """Catalog entry for an AIModel row"""
+    return {
+        'id': model.id,
+        'name': model.name,
+        'provider': model.provider,
+        'description': model.description,
+        'context_window': model.context_window,
+        'max_tokens': model.max_tokens,
+        'pricing': {
+            'input': float(model.input_price),
+            'output': float(model.output_price)
+        },
+        'capabilities': model.capabilities,
+        'is_available': model.is_available,
+        'is_local': model.is_local
+    }
+
+class CatalogVersion:
+    """An immutable snapshot of the catalog"""
+
+    def __init__(self, entries, source):
+        self.entries = entries
+        self.index = {entry['id']: entry for entry in entries}
+        self.source = source
+        self.body = fastjson.dumps({'models': entries})
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+        self.loaded_at = time.monotonic()
+
+    def get(self, model_id):
+        return self.index.get(model_id)
+
+def upsert_models(entries):
+    """Write the engine's models to AIModel and retire the ones it dropped"""
+    from .models import AIModel
+
+    models = [
+        AIModel(
+            id=entry['id'],
+            name=entry['name'],
+            provider=entry['provider'],
+            description=entry['description'],
+            context_window=entry['context_window'],
+            max_tokens=entry['max_tokens'],
+            input_price=Decimal(str(entry['pricing'].get('input', 0))),
+            output_price=Decimal(str(entry['pricing'].get('output', 0))),
+            capabilities=entry['capabilities'],
+            is_available=entry['is_available'],
+            is_local=entry['is_local']
+        )
+        for entry in entries
+    ]
+    with transaction.atomic():
+        AIModel.objects.bulk_create(
+            models, batch_size=500, update_conflicts=True,
+            unique_fields=['id'], update_fields=UPSERT_FIELDS
+        )
+        AIModel.objects.filter(is_available=True).exclude(
+            id__in=[entry['id'] for entry in entries]
+        ).update(is_available=False)
+
+class ModelCatalog:
+    """Engine model list cached in memory and refreshed in the background"""
+
+    def __init__(self, client=None, interval=None):
+        self.client = client
+        self.interval = interval if interval is not None else settings.MODEL_CATALOG_REFRESH_INTERVAL
+        self._version = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stored_etag = None
+        self.stats = {'refreshes': 0, 'errors': 0, 'upserts': 0}
+
+    def current(self):
+        """Return the current catalog version without waiting on the engine"""
+        version = self._version
+        if version is None:
+            with self._lock:
+                if self._version is None:
+                    self._version = self.load_from_database()
+                    self.start()
+                version = self._version
+        elif time.monotonic() - version.loaded_at > self.interval:
+            self._wake.set()  # Stale, e.g. after the engine was down
+        return version
+
+    def get(self, model_id):
+        return self.current().get(model_id)
+
+    def load_from_database(self):
+        from .models import AIModel
+
+        models = AIModel.objects.filter(is_available=True)
+        return CatalogVersion([model_entry(model) for model in models], 'database')
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='model-catalog', daemon=True)
+            self._thread.start()
+
+    def run(self):
+        while not self._stop.is_set():
+            delay = self.interval if self.refresh() else min(self.interval, RETRY_INTERVAL)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def refresh(self):
+        """Fetch the engine's models and publish them, returning success"""
+        with self._refresh_lock:
+            try:
+                return self.fetch()
+            except Exception as e:
+                self.stats['errors'] += 1
+                if isinstance(e, EngineError):
+                    logger.warning(f"Model catalog refresh failed: {e}")
+                else:
+                    logger.exception("Model catalog refresh failed")
+                # Pick up models other processes have written meanwhile
+                if self._version is None or self._version.source == 'database':
+                    try:
+                        self._version = self.load_from_database()
+                    except Exception:
+                        logger.exception("Failed to reload models from the database")
+                return False
+            finally:
+                close_old_connections()
+
+    def fetch(self):
+        entries = [engine_entry(data) for data in (self.client or get_client()).get_models()]
+        version = CatalogVersion(entries, 'engine')
+        if version.etag != self._stored_etag:
+            upsert_models(entries)
+            self._stored_etag = version.etag
+            self.stats['upserts'] += 1
+        self._version = version
+        self.stats['refreshes'] += 1
+        return True
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Return the process-wide model catalog"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ModelCatalog()
+    return _catalog
@@ -0,0 +1,46 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from gateway.rollup import ROLLUP_BATCH_SIZE, rebuild_metrics, rollup_metrics
+
+class Command(BaseCommand):
+    help = "Roll new ModelUsage rows up into daily and hourly SystemMetrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=ROLLUP_BATCH_SIZE,
+            help=f"Usage rows per transaction (default {ROLLUP_BATCH_SIZE})"
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Keep running, rolling up every INTERVAL seconds"
+        )
+        parser.add_argument(
+            '--rebuild-since', metavar='YYYY-MM-DD',
+            help="Recompute all buckets from this date from the raw usage rows"
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_since']:
+            try:
+                since = date.fromisoformat(options['rebuild_since'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['rebuild_since']}")
+            count = rebuild_metrics(since)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt metrics since {since} from {count} usage rows"))
+            return
+
+        while True:
+            start_time = time.perf_counter()
+            count = rollup_metrics(options['batch_size'])
+            if count or options['verbosity'] > 1:
+                self.stdout.write(
+                    f"Rolled up {count} usage rows in {time.perf_counter() - start_time:.2f}s"
+                )
+            if not options['interval']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
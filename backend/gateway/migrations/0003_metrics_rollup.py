@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField
+
+
+def backfill_total_response_time(apps, schema_editor):
+    SystemMetrics = apps.get_model("gateway", "SystemMetrics")
+    SystemMetrics.objects.update(
+        total_response_time=ExpressionWrapper(
+            F("avg_response_time") * F("total_requests"), output_field=FloatField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gateway", "0002_modelusage_created_at_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HourlySystemMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("total_requests", models.IntegerField(default=0)),
+                ("successful_requests", models.IntegerField(default=0)),
+                ("failed_requests", models.IntegerField(default=0)),
+                ("total_tokens", models.IntegerField(default=0)),
+                (
+                    "total_cost",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=12),
+                ),
+                ("total_response_time", models.FloatField(default=0)),
+                ("avg_response_time", models.FloatField(default=0)),
+                ("unique_users", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("hour", models.DateTimeField(unique=True)),
+            ],
+            options={
+                "verbose_name": "Hourly System Metrics",
+                "verbose_name_plural": "Hourly System Metrics",
+                "ordering": ["-hour"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("last_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="systemmetrics",
+            name="total_response_time",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="modelusage",
+            index=models.Index(fields=["created_at"], name="gateway_usage_created_idx"),
+        ),
+        migrations.RunPython(backfill_total_response_time, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
 class AIModel(models.Model):
@@ -38,13 +39,16 @@ class ModelUsage(models.Model):
     response_time = models.FloatField(help_text="Response time in seconds")
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so write-behind accounting can keep the event time
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['model', '-created_at']),
+            # Time-range scans by the metrics rollup
+            models.Index(fields=['created_at'], name='gateway_usage_created_idx'),
         ]
     
     def __str__(self):
@@ -66,17 +70,25 @@ class ModelPreference(models.Model):
     def __str__(self):
         return f"{self.user.username} Preferences"
 
-class SystemMetrics(models.Model):
-    date = models.DateField(unique=True)
+class MetricsBucket(models.Model):
+    """Aggregated ModelUsage for one time bucket, maintained by gateway.rollup"""
     total_requests = models.IntegerField(default=0)
     successful_requests = models.IntegerField(default=0)
     failed_requests = models.IntegerField(default=0)
     total_tokens = models.IntegerField(default=0)
     total_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    # Sum of response times, so averages stay weighted by request count
+    total_response_time = models.FloatField(default=0)
     avg_response_time = models.FloatField(default=0)
     unique_users = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        abstract = True
+
+class SystemMetrics(MetricsBucket):
+    date = models.DateField(unique=True)
+    
     class Meta:
         ordering = ['-date']
         verbose_name = "System Metrics"
@@ -84,3 +96,23 @@ class SystemMetrics(models.Model):
     
     def __str__(self):
         return f"Metrics for {self.date}"
+
+class HourlySystemMetrics(MetricsBucket):
+    hour = models.DateTimeField(unique=True)
+    
+    class Meta:
+        ordering = ['-hour']
+        verbose_name = "Hourly System Metrics"
+        verbose_name_plural = "Hourly System Metrics"
+    
+    def __str__(self):
+        return f"Metrics for {self.hour:%Y-%m-%d %H:00}"
+
+class RollupWatermark(models.Model):
+    """Highest source row id already folded into a rollup"""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
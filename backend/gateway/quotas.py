@@ -0,0 +1,323 @@
+"""
+Per-user daily quotas.
+
+``UserSettings.max_chats_per_day`` and ``ModelPreference.max_cost_per_day``
+are enforced from counters kept in process memory, so checking a chat
+against its quota is a dict lookup rather than aggregate queries. A user's
+counters for the day are loaded lazily from ``UserUsage`` on their first
+check, and today's usage is the sum of three parts:
+
+* ``stored``: the user's ``UserUsage`` row as last read
+* ``flushed``: usage this process has written to ``UserUsage`` since then
+* usage this process has recorded but the accountant has not written yet
+
+``UserUsage`` is only read while accountant flushes are held off, so each
+flushed batch is counted either in the row or in ``flushed``, never both.
+A background thread re-reads the rows and limits of loaded users every
+``settings.QUOTA_RECONCILE_INTERVAL`` seconds, which picks up usage other
+worker processes have written. Across processes a user can therefore go
+over a quota by what the other processes record within one flush and
+reconcile interval.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, time as datetime_time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .accounting import PRICE_UNIT, get_accountant
+
+logger = logging.getLogger(__name__)
+
+# Users per reconcile query, under SQLite's bound parameter limit
+RECONCILE_BATCH_SIZE = 500
+
+class QuotaExceeded(Exception):
+    """Raised when a user has used up one of their daily quotas"""
+
+    def __init__(self, quota, used, limit, retry_after):
+        super().__init__(f"Daily {quota} quota exceeded ({used} of {limit})")
+        self.quota = quota
+        self.used = used
+        self.limit = limit
+        self.retry_after = retry_after
+
+class Usage:
+    """Messages, tokens and cost for one user and day"""
+
+    __slots__ = ('messages', 'tokens', 'cost')
+
+    def __init__(self, messages=0, tokens=0, cost=Decimal(0)):
+        self.messages = messages
+        self.tokens = tokens
+        self.cost = cost
+
+    @classmethod
+    def of_event(cls, event):
+        cost = event.get('cost')
+        return cls(
+            event['messages'],
+            event['input_tokens'] + event['output_tokens'],
+            Decimal(cost) if cost is not None else Decimal(0)
+        )
+
+    def add(self, other, sign=1):
+        self.messages += sign * other.messages
+        self.tokens += sign * other.tokens
+        self.cost += sign * other.cost
+
+    def is_empty(self):
+        return not (self.messages or self.tokens or self.cost)
+
+    def as_dict(self):
+        return {'messages': self.messages, 'tokens': self.tokens, 'cost': float(self.cost)}
+
+class Counters:
+    """A user's stored usage and limits for one day"""
+
+    __slots__ = ('stored', 'flushed', 'max_messages', 'max_cost')
+
+    def __init__(self, stored, max_messages, max_cost):
+        self.stored = stored
+        self.flushed = Usage()
+        self.max_messages = max_messages
+        self.max_cost = max_cost
+
+def default_limits():
+    from users.models import UserSettings
+    from .models import ModelPreference
+
+    return (
+        UserSettings._meta.get_field('max_chats_per_day').default,
+        Decimal(str(ModelPreference._meta.get_field('max_cost_per_day').default))
+    )
+
+def event_day(event):
+    return timezone.localdate(datetime.fromisoformat(event['timestamp']))
+
+def seconds_until_tomorrow():
+    now = timezone.localtime()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime_time(), tzinfo=now.tzinfo)
+    return max(1, int((midnight - now).total_seconds()))
+
+class QuotaTracker:
+    """In-memory daily usage counters, reconciled with UserUsage"""
+
+    def __init__(self, interval=None):
+        self.interval = interval if interval is not None else settings.QUOTA_RECONCILE_INTERVAL
+        self._lock = threading.Lock()
+        self._counters = {}  # (user_id, day) -> Counters
+        self._queued = defaultdict(Usage)  # (user_id, day) -> recorded, not yet flushed
+        self._prices = None  # model id -> (input price, output price) per million tokens
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'loads': 0, 'reconciles': 0, 'rejections': 0, 'errors': 0}
+
+    def check(self, user_id, counters=None, day=None):
+        """Return today's usage, or raise QuotaExceeded.
+
+        Given the ``counters`` for ``day``, as ``acheck()`` passes them,
+        it never loads them, so it runs no queries.
+        """
+        day = day or timezone.localdate()
+        if counters is None:
+            counters = self._counters.get((user_id, day))
+            if counters is None:
+                counters = self.load(user_id, day)
+        used = self.usage(user_id, day, counters)
+        if used.messages >= counters.max_messages:
+            self.reject('messages', used.messages, counters.max_messages)
+        if used.cost >= counters.max_cost:
+            self.reject('cost', float(used.cost), float(counters.max_cost))
+        return used
+
+    async def acheck(self, user_id):
+        """``check()`` that only leaves the event loop to load counters"""
+        from asgiref.sync import sync_to_async
+
+        day = timezone.localdate()
+        counters = self._counters.get((user_id, day))
+        if counters is None:
+            counters = await sync_to_async(self.load)(user_id, day)
+        # The counters may be forgotten or the day may roll over meanwhile
+        return self.check(user_id, counters, day)
+
+    def reject(self, quota, used, limit):
+        self.stats['rejections'] += 1
+        raise QuotaExceeded(quota, used, limit, seconds_until_tomorrow())
+
+    def usage(self, user_id, day=None, counters=None):
+        """A user's usage for a day, as far as this process knows"""
+        key = (user_id, day or timezone.localdate())
+        used = Usage()
+        with self._lock:
+            if counters is None:
+                counters = self._counters.get(key)
+            if counters is not None:
+                used.add(counters.stored)
+                used.add(counters.flushed)
+            queued = self._queued.get(key)
+            if queued is not None:
+                used.add(queued)
+        return used
+
+    def load(self, user_id, day):
+        """Read a user's stored usage and limits for a day"""
+        from users.models import UserUsage
+
+        if self._prices is None:
+            self.load_prices()
+        max_messages, max_cost = default_limits()
+        with get_accountant().flushes_held():
+            row = UserUsage.objects.filter(user_id=user_id, date=day).values_list(
+                'messages_sent', 'tokens_used', 'cost_incurred'
+            ).first()
+            limits = User.objects.filter(pk=user_id).values_list(
+                'settings__max_chats_per_day', 'model_preference__max_cost_per_day'
+            ).first() or (None, None)
+            counters = Counters(
+                Usage(*row) if row else Usage(),
+                limits[0] if limits[0] is not None else max_messages,
+                limits[1] if limits[1] is not None else max_cost
+            )
+            with self._lock:
+                self._counters[(user_id, day)] = counters
+        self.stats['loads'] += 1
+        self.start()
+        return counters
+
+    def load_prices(self):
+        from .models import AIModel
+
+        self._prices = {
+            model_id: (input_price, output_price)
+            for model_id, input_price, output_price
+            in AIModel.objects.values_list('id', 'input_price', 'output_price')
+        }
+
+    def price(self, model, input_tokens, output_tokens):
+        """Cost of a call at the cached model prices, or None if unknown"""
+        prices = (self._prices or {}).get(model)
+        if prices is None:
+            return None
+        return (input_tokens * prices[0] + output_tokens * prices[1]) / PRICE_UNIT
+
+    def recorded(self, event, day):
+        """Count an event the accountant has queued"""
+        key = (event['user_id'], day)
+        with self._lock:
+            queued = self._queued[key]
+            queued.add(Usage.of_event(event))
+            if queued.is_empty():  # Already flushed
+                del self._queued[key]
+
+    def flushed(self, events, costs=None):
+        """Move events the accountant has written from queued to flushed.
+
+        ``costs`` are what the events were written with. An event recorded
+        without a cost, its model's price not cached yet, is priced when
+        written, and counts from then on at that cost.
+        """
+        with self._lock:
+            for event, cost in zip(events, costs or [None] * len(events)):
+                key = (event['user_id'], event_day(event))
+                usage = Usage.of_event(event)
+                # Negative for an instant if flushed before recorded() ran
+                queued = self._queued[key]
+                queued.add(usage, sign=-1)
+                if queued.is_empty():
+                    del self._queued[key]
+                counters = self._counters.get(key)
+                if counters is not None:
+                    if cost is not None:
+                        usage.cost = cost
+                    counters.flushed.add(usage)
+
+    def forget(self, user_id):
+        """Drop a user's counters so their next check reloads them, e.g. after a limit change"""
+        with self._lock:
+            for key in [key for key in self._counters if key[0] == user_id]:
+                del self._counters[key]
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self.run, name='quota-reconciler', daemon=True)
+                    self._thread.start()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reconcile()
+            except Exception:
+                self.stats['errors'] += 1
+                logger.exception("Quota reconcile failed")
+            finally:
+                close_old_connections()
+
+    def reconcile(self):
+        """Re-read the stored usage and limits of every user loaded today"""
+        from users.models import UserUsage
+
+        day = timezone.localdate()
+        with self._lock:
+            for key in [key for key in self._counters if key[1] != day]:
+                del self._counters[key]
+            user_ids = [user_id for user_id, _ in self._counters]
+        self.load_prices()
+
+        max_messages, max_cost = default_limits()
+        for start in range(0, len(user_ids), RECONCILE_BATCH_SIZE):
+            batch = user_ids[start:start + RECONCILE_BATCH_SIZE]
+            with get_accountant().flushes_held():
+                rows = {
+                    user_id: Usage(messages, tokens, cost)
+                    for user_id, messages, tokens, cost in UserUsage.objects.filter(
+                        user_id__in=batch, date=day
+                    ).values_list('user_id', 'messages_sent', 'tokens_used', 'cost_incurred')
+                }
+                limits = {
+                    user_id: (messages, cost)
+                    for user_id, messages, cost in User.objects.filter(pk__in=batch).values_list(
+                        'id', 'settings__max_chats_per_day', 'model_preference__max_cost_per_day'
+                    )
+                }
+                with self._lock:
+                    for user_id in batch:
+                        counters = self._counters.get((user_id, day))
+                        if counters is None:
+                            continue
+                        counters.stored = rows.get(user_id) or Usage()
+                        counters.flushed = Usage()
+                        messages, cost = limits.get(user_id, (None, None))
+                        counters.max_messages = messages if messages is not None else max_messages
+                        counters.max_cost = cost if cost is not None else max_cost
+        self.stats['reconciles'] += 1
+        return len(user_ids)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_quotas():
+    """Return the process-wide quota tracker"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = QuotaTracker()
+    return _tracker
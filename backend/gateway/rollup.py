@@ -0,0 +1,130 @@
+"""
+Incremental rollup of ModelUsage into the SystemMetrics buckets.
+
+Each run folds only the ModelUsage rows added since the previous run into
+daily ``SystemMetrics`` and ``HourlySystemMetrics`` rows. The watermark is
+the highest ModelUsage id already counted. Rows are bucketed by their own
+``created_at``, so usage flushed late by the write-behind accountant still
+lands in the right hour. Counts and sums are aggregated in the database and
+added to the buckets with ``F()``. Distinct users are recounted for the
+buckets a run touches, and ``avg_response_time`` is
+``total_response_time / total_requests``, i.e. weighted by requests.
+
+With concurrent writers (e.g. on PostgreSQL) a row can become visible after
+a higher id has been counted and is then skipped; ``rebuild_metrics()``
+recomputes a date range from the raw rows.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import HourlySystemMetrics, ModelUsage, RollupWatermark, SystemMetrics
+
+WATERMARK_NAME = 'system_metrics'
+ROLLUP_BATCH_SIZE = 50000
+
+# (bucket model, bucket field, truncation, bucket width)
+BUCKETS = (
+    (SystemMetrics, 'date', TruncDate, timedelta(days=1)),
+    (HourlySystemMetrics, 'hour', TruncHour, timedelta(hours=1)),
+)
+
+def aggregate_usage(rows, trunc):
+    """Sum usage rows per bucket in the database"""
+    return rows.order_by().annotate(bucket=trunc('created_at')).values('bucket').annotate(
+        total_requests=Count('id'),
+        successful_requests=Count('id', filter=Q(success=True)),
+        failed_requests=Count('id', filter=Q(success=False)),
+        total_tokens=Sum(F('input_tokens') + F('output_tokens')),
+        total_cost=Sum('total_cost'),
+        total_response_time=Sum('response_time')
+    )
+
+def bucket_start(key):
+    """Start of a bucket as an aware datetime (daily keys are dates)"""
+    if isinstance(key, datetime):
+        return key
+    return timezone.make_aware(datetime.combine(key, time.min))
+
+def add_to_buckets(model, field, totals):
+    """Add per-bucket totals to the bucket rows, returning the touched keys"""
+    totals = list(totals)
+    keys = [row['bucket'] for row in totals]
+    model.objects.bulk_create([model(**{field: key}) for key in keys], ignore_conflicts=True)
+    for row in totals:
+        key = row.pop('bucket')
+        model.objects.filter(**{field: key}).update(
+            **{name: F(name) + value for name, value in row.items()}
+        )
+    return keys
+
+def refresh_buckets(model, field, trunc, width, keys, last_id):
+    """Recount distinct users and recompute the average latency of buckets"""
+    if not keys:
+        return
+    users = dict(
+        ModelUsage.objects.filter(
+            created_at__gte=bucket_start(min(keys)),
+            created_at__lt=bucket_start(max(keys)) + width,
+            id__lte=last_id
+        ).order_by().annotate(bucket=trunc('created_at')).values('bucket').annotate(
+            users=Count('user', distinct=True)
+        ).values_list('bucket', 'users')
+    )
+    for key in keys:
+        model.objects.filter(**{field: key}).update(unique_users=users.get(key, 0))
+    model.objects.filter(**{f'{field}__in': keys}, total_requests__gt=0).update(
+        avg_response_time=ExpressionWrapper(
+            F('total_response_time') / F('total_requests'), output_field=FloatField()
+        )
+    )
+
+def get_watermark():
+    watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+    return watermark
+
+def rollup_metrics(batch_size=ROLLUP_BATCH_SIZE):
+    """Fold ModelUsage rows past the watermark into the buckets.
+
+    Works through the new rows in id batches, one transaction each, and
+    returns the number of rows processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark = get_watermark()
+            new_rows = ModelUsage.objects.filter(id__gt=watermark.last_id)
+            upper = list(new_rows.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size])
+            upper = upper[0] if upper else new_rows.aggregate(last=Max('id'))['last']
+            if upper is None:
+                return processed
+
+            rows = new_rows.filter(id__lte=upper)
+            count = rows.count()
+            for model, field, trunc, width in BUCKETS:
+                keys = add_to_buckets(model, field, aggregate_usage(rows, trunc))
+                refresh_buckets(model, field, trunc, width, keys, upper)
+
+            watermark.last_id = upper
+            watermark.save(update_fields=['last_id', 'updated_at'])
+            processed += count
+            if count < batch_size:
+                return processed
+
+def rebuild_metrics(since):
+    """Recompute every bucket from the date ``since`` onwards from raw rows"""
+    with transaction.atomic():
+        watermark = get_watermark()
+        start = bucket_start(since)
+        rows = ModelUsage.objects.filter(created_at__gte=start, id__lte=watermark.last_id)
+
+        SystemMetrics.objects.filter(date__gte=since).delete()
+        HourlySystemMetrics.objects.filter(hour__gte=start).delete()
+        for model, field, trunc, width in BUCKETS:
+            keys = add_to_buckets(model, field, aggregate_usage(rows, trunc))
+            refresh_buckets(model, field, trunc, width, keys, watermark.last_id)
+        return rows.count()
@@ -0,0 +1,24 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from alpha_mind.response_cache import invalidate
+from users.models import UserSettings
+from .models import ModelPreference
+from .quotas import get_quotas
+
+@receiver(post_save, sender=UserSettings)
+@receiver(post_save, sender=ModelPreference)
+def limits_saved(sender, instance, raw=False, **kwargs):
+    """Reload a user's quota limits on their next check"""
+    if not raw:
+        get_quotas().forget(instance.user_id)
+
+@receiver(post_save, sender=ModelPreference)
+def preference_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate(instance.user_id, 'model-preferences')
+
+@receiver(m2m_changed, sender=ModelPreference.fallback_models.through)
+def fallback_models_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        invalidate(instance.user_id, 'model-preferences')
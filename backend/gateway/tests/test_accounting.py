@@ -0,0 +1,54 @@
+from decimal import Decimal
+from pathlib import Path
+
+from django.utils import timezone
+
+from alpha_mind.testing import TestCase, make_model, make_user, usage_event
+from gateway.accounting import JournalSegment, UsageAccountant
+from gateway.models import ModelUsage
+from users.models import UserUsage
+
+def today_usage(user):
+    return UserUsage.objects.filter(user=user, date=timezone.localdate()).first()
+
+class UsageAccountantTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('usage')
+        make_model()
+        # Long interval, so the tests control when flushes happen
+        self.accountant = UsageAccountant(journal_dir=self.tmp_path, interval=3600)
+        self.addCleanup(self.accountant.close)
+
+    def test_flush_totals(self):
+        for _ in range(3):
+            self.accountant.record(usage_event(self.user))
+        self.accountant.record(usage_event(self.user, model='', messages=0, files=1, input_tokens=0, output_tokens=0))
+        self.assertEqual(self.accountant.flush(), 4)
+
+        usage = today_usage(self.user)
+        self.assertEqual((usage.messages_sent, usage.files_uploaded, usage.tokens_used), (3, 1, 3000))
+        # 800 * $30/M + 200 * $60/M per event
+        self.assertEqual(usage.cost_incurred, Decimal('0.108'))
+        self.assertEqual(ModelUsage.objects.filter(user=self.user).count(), 3)
+
+    def test_recover_dead_process_journal(self):
+        # A segment whose owner exited without flushing: written, then unlocked
+        segment = JournalSegment.create(self.tmp_path)
+        for _ in range(5):
+            segment.append(usage_event(self.user))
+        segment.file.write(b'{"user_id": 1, "mod')  # Torn final write
+        segment.file.close()
+
+        accountant = UsageAccountant(journal_dir=self.tmp_path, interval=3600)
+        accountant.recover()
+        self.assertEqual(accountant.stats['recovered'], 5)
+        self.assertEqual(today_usage(self.user).messages_sent, 5)
+        self.assertEqual(list(Path(self.tmp_path).glob('*.journal')), [])
+
+    def test_live_journal_not_recovered(self):
+        self.accountant.record(usage_event(self.user))
+        other = UsageAccountant(journal_dir=self.tmp_path, interval=3600)
+        other.recover()
+        self.assertEqual(other.stats['recovered'], 0)
+        self.assertEqual(self.accountant.flush(), 1)
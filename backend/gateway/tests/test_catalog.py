@@ -0,0 +1,67 @@
+from unittest import mock
+
+from alpha_mind import fastjson
+from alpha_mind.testing import FakeEngine, TestCase, engine_models, login, make_user
+from gateway import views as gateway_views
+from gateway.catalog import ModelCatalog
+from gateway.models import AIModel, ModelPreference
+
+CATALOG_MODELS = 20
+
+class ModelCatalogTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.engine = FakeEngine(models=engine_models(CATALOG_MODELS))
+        self.engine_client = self.engine.client()
+        self.addCleanup(self.engine_client.close)
+        self.catalog = ModelCatalog(client=self.engine_client, interval=3600)
+        self.assertTrue(self.catalog.refresh())
+        self.enterContext(mock.patch.object(gateway_views, 'get_catalog', lambda: self.catalog))
+        self.user = make_user('catalog')
+        self.client = login(self.user)
+
+    def switch(self, model_id):
+        return self.client.post('/api/models/switch/', fastjson.dumps({'model_id': model_id}), content_type='application/json')
+
+    def test_list_if_none_match(self):
+        etag = self.client.get('/api/models/list/')['ETag']
+        for header, status in [
+            (etag, 304), (f'"other", {etag}', 304), (f'W/{etag}', 304), ('*', 304),
+            ('"other"', 200), (f'junk{etag}', 200), ('', 200),
+        ]:
+            with self.subTest(header=header):
+                response = self.client.get('/api/models/list/', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_refresh_upserts_models(self):
+        model = AIModel.objects.get(id='bench/model-7')
+        self.assertEqual((model.context_window, float(model.output_price)), (8192, 3.0))
+        old_etag = self.client.get('/api/models/list/')['ETag']
+
+        self.engine.models = engine_models(CATALOG_MODELS - 1, price=2.5)
+        self.assertTrue(self.catalog.refresh())
+        self.assertEqual(float(AIModel.objects.get(id='bench/model-7').input_price), 2.5)
+        self.assertFalse(AIModel.objects.get(id=f'bench/model-{CATALOG_MODELS - 1}').is_available)
+
+        response = self.client.get('/api/models/list/', HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], old_etag)
+        self.assertEqual(self.switch(f'bench/model-{CATALOG_MODELS - 1}').status_code, 404)
+
+        upserts = self.catalog.stats['upserts']
+        self.assertTrue(self.catalog.refresh())
+        self.assertEqual(self.catalog.stats['upserts'], upserts)  # Unchanged list, no writes
+
+    def test_switch_sets_preference(self):
+        calls = len(self.engine.requests)
+        self.assertEqual(self.switch('bench/model-3').status_code, 200)
+        self.assertEqual(ModelPreference.objects.get(user=self.user).preferred_model_id, 'bench/model-3')
+        self.assertEqual(len(self.engine.requests), calls)  # Never waits on the engine
+
+    def test_engine_down_falls_back_to_database(self):
+        self.engine.up = False
+        catalog = ModelCatalog(client=self.engine_client, interval=3600)
+        self.assertFalse(catalog.refresh())
+        self.assertEqual(catalog.current().source, 'database')
+        self.assertEqual(catalog.get('bench/model-5')['pricing'], {'input': 1.5, 'output': 3.0})
@@ -0,0 +1,142 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+
+from alpha_mind import fastjson
+from alpha_mind.testing import FakeEngine, TestCase, login, make_model, make_user
+from chat import views as chat_views
+from gateway.accounting import get_accountant, record_usage
+from gateway.models import ModelPreference
+from gateway.quotas import QuotaExceeded, QuotaTracker
+from users.models import UserSettings, UserUsage
+
+def quota_user(name, max_chats=100, max_cost='10.00', **usage):
+    user = make_user(name)
+    UserSettings.objects.update_or_create(user=user, defaults={'max_chats_per_day': max_chats})
+    ModelPreference.objects.update_or_create(user=user, defaults={'max_cost_per_day': Decimal(max_cost)})
+    if usage:
+        UserUsage.objects.create(user=user, date=timezone.localdate(), **usage)
+    return user
+
+class QuotaTrackerTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.quotas = QuotaTracker(interval=3600)
+        self.addCleanup(self.quotas.close)
+        self.enterContext(mock.patch('gateway.quotas._tracker', self.quotas))
+
+    def test_counters_exact_across_flushes(self):
+        make_model('bench/quota-model', input_price=1000, output_price=2000)
+        user = quota_user('quota-flush', messages_sent=3, tokens_used=300, cost_incurred=Decimal('0.5'))
+        self.assertEqual(self.quotas.check(user.id).messages, 3)
+        self.quotas.load_prices()
+
+        for _ in range(5):
+            record_usage(user.id, model='bench/quota-model', input_tokens=100, output_tokens=50, messages=1)
+        # 100 * 1000 / 1e6 + 50 * 2000 / 1e6 per call
+        expected = (8, 1050, Decimal('0.5') + 5 * Decimal('0.2'))
+        used = self.quotas.usage(user.id)
+        self.assertEqual((used.messages, used.tokens, used.cost), expected)
+
+        get_accountant().flush()
+        used = self.quotas.usage(user.id)
+        self.assertEqual((used.messages, used.tokens, used.cost), expected)
+
+        self.quotas.reconcile()
+        used = self.quotas.usage(user.id)
+        self.assertEqual((used.messages, used.tokens, used.cost), expected)
+        stored = UserUsage.objects.get(user=user, date=timezone.localdate())
+        self.assertEqual((stored.messages_sent, stored.tokens_used, stored.cost_incurred), expected)
+
+    def test_cost_of_unpriced_model_counted_at_flush(self):
+        user = quota_user('quota-unpriced')
+        self.quotas.check(user.id)
+        make_model('bench/new-model', input_price=1000, output_price=2000)  # Not in the cached prices
+
+        record_usage(user.id, model='bench/new-model', input_tokens=100, output_tokens=50, messages=1)
+        self.assertEqual(self.quotas.usage(user.id).cost, 0)
+        get_accountant().flush()
+        used = self.quotas.usage(user.id)
+        self.assertEqual((used.messages, used.cost), (1, Decimal('0.2')))
+        self.assertEqual(self.quotas._queued, {})
+        self.quotas.reconcile()
+        self.assertEqual(self.quotas.usage(user.id).cost, Decimal('0.2'))
+
+    def test_reconcile_picks_up_other_processes(self):
+        user = quota_user('quota-processes', max_chats=5, messages_sent=2)
+        self.quotas.check(user.id)
+        # Another worker process flushes its usage
+        UserUsage.objects.filter(user=user).update(messages_sent=5)
+        self.quotas.check(user.id)
+        self.quotas.reconcile()
+        with self.assertRaises(QuotaExceeded) as error:
+            self.quotas.check(user.id)
+        self.assertEqual((error.exception.quota, error.exception.limit), ('messages', 5))
+
+    def test_message_and_cost_limits(self):
+        user = quota_user('quota-limits', max_chats=3, max_cost='1.00', messages_sent=2)
+        self.quotas.check(user.id)
+        record_usage(user.id, messages=1)
+        with self.assertRaises(QuotaExceeded):
+            self.quotas.check(user.id)
+
+        # Raising the limit applies to the next check
+        settings = UserSettings.objects.get(user=user)
+        settings.max_chats_per_day = 10
+        settings.save()
+        self.quotas.check(user.id)
+
+        record_usage(user.id, messages=1, cost=Decimal('1.25'))
+        with self.assertRaises(QuotaExceeded) as error:
+            self.quotas.check(user.id)
+        self.assertEqual(error.exception.quota, 'cost')
+
+    def test_day_rollover(self):
+        user = quota_user('quota-rollover', max_chats=1, messages_sent=1)
+        with self.assertRaises(QuotaExceeded):
+            self.quotas.check(user.id)
+        UserUsage.objects.filter(user=user).update(date=timezone.localdate() - timedelta(days=1))
+        self.quotas.forget(user.id)
+        self.assertEqual(self.quotas.check(user.id).messages, 0)
+
+    def test_send_rejected_over_quota(self):
+        engine = FakeEngine(reply='Hi', usage=(5, 5))
+        self.enterContext(mock.patch.object(chat_views, 'get_async_client', engine.async_client))
+        client = login(quota_user('quota-send', max_chats=2, messages_sent=1))
+        body = fastjson.dumps({'message': 'Hello', 'model': 'openai/gpt-4'})
+
+        self.assertEqual(client.post('/api/chat/send/', body, content_type='application/json').status_code, 200)
+        for url in ('/api/chat/send/', '/api/chat/send/stream/'):
+            response = client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.json()['quota'], 'messages')
+            self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(len(engine.requests), 1)
+
+    def test_async_check_skips_thread_when_loaded(self):
+        user = quota_user('quota-async', messages_sent=4)
+
+        async def check_all():
+            return await asyncio.gather(*(self.quotas.acheck(user.id) for _ in range(20)))
+
+        self.assertTrue(all(used.messages == 4 for used in async_to_sync(check_all)()))
+        loads = self.quotas.stats['loads']
+        async_to_sync(check_all)()
+        self.assertEqual(self.quotas.stats['loads'], loads)
+
+    def test_async_check_after_forget(self):
+        """Counters dropped between loading and checking are not reloaded on the event loop"""
+        user = quota_user('quota-async-forget', messages_sent=3)
+        load = self.quotas.load
+
+        def load_then_forget(user_id, day):
+            counters = load(user_id, day)
+            self.quotas.forget(user_id)
+            return counters
+
+        with mock.patch.object(self.quotas, 'load', load_then_forget):
+            self.assertEqual(async_to_sync(self.quotas.acheck)(user.id).messages, 3)
@@ -0,0 +1,84 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from alpha_mind.testing import TestCase, login, make_model, make_user, usage_rows
+from gateway.models import HourlySystemMetrics, ModelUsage, SystemMetrics
+from gateway.rollup import rebuild_metrics, rollup_metrics
+
+USAGE_ROWS = 2000
+USAGE_DAYS = 30
+
+def raw_daily_metrics():
+    start = timezone.localdate() - timedelta(days=30)
+    return list(
+        ModelUsage.objects.filter(created_at__date__gte=start).order_by()
+        .annotate(day=TruncDate('created_at')).values('day').annotate(
+            total_requests=Count('id'),
+            successful_requests=Count('id', filter=Q(success=True)),
+            total_tokens=Sum(F('input_tokens') + F('output_tokens')),
+            total_cost=Sum('total_cost'),
+            total_response_time=Sum('response_time'),
+            unique_users=Count('user', distinct=True)
+        ).order_by('-day')
+    )
+
+class MetricsRollupTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.rng = random.Random(7)
+        self.users = [make_user(f'rollup-{n}') for n in range(10)]
+        self.models = [make_model()]
+        now = timezone.now()
+        span = timedelta(days=USAGE_DAYS - 1)
+        ModelUsage.objects.bulk_create(usage_rows(self.users, self.models, USAGE_ROWS, now - span, span, self.rng))
+        rollup_metrics()
+
+    def assertBucketsMatchRaw(self):
+        expected = {row['day']: row for row in raw_daily_metrics()}
+        buckets = {metric.date: metric for metric in SystemMetrics.objects.filter(date__in=expected)}
+        self.assertEqual(buckets.keys(), expected.keys())
+        for day, row in expected.items():
+            metric = buckets[day]
+            self.assertEqual(metric.total_requests, row['total_requests'])
+            self.assertEqual(metric.successful_requests, row['successful_requests'])
+            self.assertEqual(metric.failed_requests, row['total_requests'] - row['successful_requests'])
+            self.assertEqual(metric.total_tokens, row['total_tokens'])
+            self.assertEqual(metric.total_cost, Decimal(row['total_cost']).quantize(Decimal('0.0001')))
+            self.assertEqual(metric.unique_users, row['unique_users'])
+            self.assertAlmostEqual(metric.avg_response_time, row['total_response_time'] / row['total_requests'])
+
+    def test_rollup_matches_raw(self):
+        # Late-arriving usage for an old bucket lands in that bucket
+        late = usage_rows(self.users, self.models, 10, timezone.now() - timedelta(days=5), timedelta(hours=1), self.rng)
+        ModelUsage.objects.bulk_create(late)
+        self.assertEqual(rollup_metrics(batch_size=7), 10)
+        self.assertEqual(rollup_metrics(), 0)
+        self.assertBucketsMatchRaw()
+
+        hourly = HourlySystemMetrics.objects.aggregate(total=Sum('total_requests'))['total']
+        daily = SystemMetrics.objects.aggregate(total=Sum('total_requests'))['total']
+        self.assertEqual(hourly, daily)
+        self.assertEqual(daily, ModelUsage.objects.count())
+
+    def test_rebuild_matches_incremental(self):
+        before = list(SystemMetrics.objects.order_by('date').values_list('date', 'total_requests', 'unique_users'))
+        rebuild_metrics(timezone.localdate() - timedelta(days=10))
+        call_command('rollup_metrics', rebuild_since=(timezone.localdate() - timedelta(days=3)).isoformat(), verbosity=0)
+        after = list(SystemMetrics.objects.order_by('date').values_list('date', 'total_requests', 'unique_users'))
+        self.assertEqual(after, before)
+        self.assertBucketsMatchRaw()
+
+    def test_dashboard_weighted_average(self):
+        client = login(make_user('rollup-admin', is_staff=True))
+        data = client.get('/api/models/metrics/').json()
+        self.assertEqual(data['totals']['total_requests'], USAGE_ROWS)
+        metrics = SystemMetrics.objects.all()
+        expected = sum(m.total_response_time for m in metrics) / sum(m.total_requests for m in metrics)
+        self.assertAlmostEqual(data['totals']['avg_response_time'], expected)
+        self.assertEqual(client.get('/api/models/metrics/?granularity=hour').status_code, 200)
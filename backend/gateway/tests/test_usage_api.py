@@ -0,0 +1,78 @@
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from alpha_mind.testing import TestCase, login, make_model, make_user, usage_rows
+from gateway.models import ModelUsage
+
+USAGE_ROWS = 1000
+USAGE_DAYS = 30
+
+class ModelUsageApiTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('usage-api')
+        models = [
+            make_model('openai/gpt-4', 1, 2), make_model('anthropic/claude-3', 1, 2),
+            make_model('gemini-pro', 1, 2, provider='google'),
+        ]
+        span = timedelta(days=USAGE_DAYS - 1)
+        ModelUsage.objects.bulk_create(
+            usage_rows([self.user], models, USAGE_ROWS, timezone.now() - span, span, random.Random(11))
+        )
+        self.client = login(self.user)
+
+    def test_listing_pages(self):
+        seen, cursor = 0, None
+        previous = None
+        while True:
+            params = {'limit': 200, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get('/api/models/usage/', params).json()
+            stamps = [row['created_at'] for row in data['usage']]
+            self.assertEqual(stamps, sorted(stamps, reverse=True))
+            if previous is not None and stamps:
+                self.assertLessEqual(stamps[0], previous)
+            previous = stamps[-1] if stamps else previous
+            seen += len(stamps)
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, USAGE_ROWS)
+        self.assertEqual(data['statistics']['total_requests'], USAGE_ROWS)
+        self.assertEqual(self.client.get('/api/models/usage/', {'cursor': 'garbage'}).status_code, 400)
+
+    def test_series_matches_raw(self):
+        for bucket in ('hour', 'day', 'week'):
+            for group_by in ('model', 'provider'):
+                with self.subTest(bucket=bucket, group_by=group_by):
+                    self.check_series(bucket, group_by)
+
+    def check_series(self, bucket, group_by):
+        data = self.client.get('/api/models/usage/series/', {
+            'bucket': bucket, 'group_by': group_by, 'days': 400
+        }).json()
+        self.assertEqual(data['days'], {'hour': 7, 'day': 365, 'week': 400}[bucket])
+
+        rows = ModelUsage.objects.filter(user=self.user).select_related('model')
+        if bucket == 'hour':
+            rows = rows.filter(created_at__gte=timezone.now() - timedelta(days=8))
+        expected = {}
+        for row in rows:
+            key = row.model_id if group_by == 'model' else row.model.provider
+            expected[key] = expected.get(key, 0) + 1
+
+        totals = {series['key']: sum(p['requests'] for p in series['points']) for series in data['series']}
+        if bucket == 'hour':
+            # The hourly window starts at midnight seven days back
+            self.assertTrue(all(totals[key] <= expected[key] for key in totals))
+        else:
+            self.assertEqual(totals, expected)
+        for series in data['series']:
+            buckets = [point['bucket'] for point in series['points']]
+            self.assertEqual(buckets, sorted(buckets))
+
+    def test_series_rejects_bad_params(self):
+        for params in ({'bucket': 'minute'}, {'group_by': 'user'}, {'days': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/models/usage/series/', params).status_code, 400)
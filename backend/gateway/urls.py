@@ -6,5 +6,8 @@ urlpatterns = [
     path('switch/', views.SwitchModelView.as_view(), name='switch-model'),
     path('preferences/', views.ModelPreferencesView.as_view(), name='model-preferences'),
     path('usage/', views.ModelUsageView.as_view(), name='model-usage'),
+    path('usage/series/', views.ModelUsageSeriesView.as_view(), name='model-usage-series'),
     path('metrics/', views.SystemMetricsView.as_view(), name='system-metrics'),
+    path('metrics/prometheus/', views.PrometheusMetricsView.as_view(), name='prometheus-metrics'),
+    path('metrics/slow-requests/', views.SlowRequestsView.as_view(), name='slow-requests'),
 ]
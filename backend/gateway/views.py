@@ -1,64 +1,40 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
-from django.db.models import Q, Count, Avg, Sum
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Count, Avg, Sum, F
+from django.db.models.functions import TruncDate, TruncHour, TruncWeek
 from django.utils import timezone
-import json
-import requests
+from django.utils.cache import get_conditional_response
 from datetime import datetime, timedelta
+import hashlib
 
-from .models import AIModel, ModelUsage, ModelPreference, SystemMetrics
+from alpha_mind import fastjson
+from alpha_mind.instrumentation import render_prometheus, slow_profiles
+from alpha_mind.fastjson import JsonResponse
+from alpha_mind.pagination import InvalidCursor, get_page_size, paginate_keyset
+from alpha_mind.response_cache import cached_response
+from .catalog import get_catalog
+from .models import AIModel, HourlySystemMetrics, ModelUsage, ModelPreference, SystemMetrics
 
 @permission_classes([IsAuthenticated])
 class ModelListView(View):
+    """Models from the cached catalog; answers If-None-Match with 304"""
+    
     def get(self, request):
         try:
-            # Get available models from AI Engine
-            models = []
-            
-            try:
-                ai_engine_url = 'http://localhost:4000/models'
-                response = requests.get(ai_engine_url, timeout=10)
-                response.raise_for_status()
-                engine_models = response.json()
-                
-                for model_data in engine_models:
-                    models.append({
-                        'id': model_data['id'],
-                        'name': model_data['name'],
-                        'provider': model_data['provider'],
-                        'description': model_data['description'],
-                        'context_window': model_data['context_window'],
-                        'pricing': model_data['pricing'],
-                        'capabilities': model_data['capabilities'],
-                        'is_available': model_data['is_available'],
-                        'is_local': model_data['is_local']
-                    })
-                    
-            except requests.RequestException:
-                # Fallback to database models
-                db_models = AIModel.objects.filter(is_available=True)
-                for model in db_models:
-                    models.append({
-                        'id': model.id,
-                        'name': model.name,
-                        'provider': model.provider,
-                        'description': model.description,
-                        'context_window': model.context_window,
-                        'pricing': {
-                            'input': float(model.input_price),
-                            'output': float(model.output_price)
-                        },
-                        'capabilities': model.capabilities,
-                        'is_available': model.is_available,
-                        'is_local': model.is_local
-                    })
+            catalog = get_catalog().current()
             
-            return JsonResponse({'models': models})
+            # The body is prebuilt, so a 304 can take its headers from the full response
+            response = HttpResponse(catalog.body, content_type='application/json')
+            response['ETag'] = catalog.etag
+            response['Cache-Control'] = 'private, no-cache'
+            return get_conditional_response(request, etag=catalog.etag, response=response)
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -68,62 +44,41 @@ class ModelListView(View):
 class SwitchModelView(View):
     def post(self, request):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             model_id = data.get('model_id')
             
             if not model_id:
                 return JsonResponse({'error': 'Model ID is required'}, status=400)
             
             # Verify model exists and is available
-            try:
-                ai_engine_url = f'http://localhost:4000/models'
-                response = requests.get(ai_engine_url, timeout=10)
-                response.raise_for_status()
-                available_models = response.json()
-                
-                model_exists = any(m['id'] == model_id for m in available_models)
-                if not model_exists:
-                    return JsonResponse({'error': 'Model not found or unavailable'}, status=404)
-                    
-            except requests.RequestException:
-                # Check database
-                if not AIModel.objects.filter(id=model_id, is_available=True).exists():
-                    return JsonResponse({'error': 'Model not found or unavailable'}, status=404)
-            
-            # Update user preference
-            preference, created = ModelPreference.objects.get_or_create(
-                user=request.user
+            entry = get_catalog().get(model_id)
+            if entry is None or not entry['is_available']:
+                return JsonResponse({'error': 'Model not found or unavailable'}, status=404)
+            
+            # Update user preference; catalog refreshes upsert engine models,
+            # so the row normally exists already
+            model, created = AIModel.objects.get_or_create(id=model_id, defaults={
+                'name': entry['name'],
+                'provider': entry['provider']
+            })
+            ModelPreference.objects.update_or_create(
+                user=request.user,
+                defaults={'preferred_model': model}
             )
             
-            # Update preferred model
-            try:
-                if AIModel.objects.filter(id=model_id).exists():
-                    preference.preferred_model = AIModel.objects.get(id=model_id)
-                else:
-                    # Create model in database if it doesn't exist
-                    new_model = AIModel.objects.create(
-                        id=model_id,
-                        name=model_id,
-                        provider='openrouter'  # Default provider
-                    )
-                    preference.preferred_model = new_model
-            except:
-                pass
-            
-            preference.save()
-            
             return JsonResponse({
                 'message': 'Model switched successfully',
                 'model_id': model_id
             })
             
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 @permission_classes([IsAuthenticated])
 class ModelPreferencesView(View):
+    @cached_response('model-preferences')
     def get(self, request):
         try:
             preference, created = ModelPreference.objects.get_or_create(
@@ -158,7 +113,7 @@ class ModelPreferencesView(View):
     
     def put(self, request):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             preference, created = ModelPreference.objects.get_or_create(
                 user=request.user
             )
@@ -186,27 +141,49 @@ class ModelPreferencesView(View):
             
             return JsonResponse({'message': 'Preferences updated successfully'})
             
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
+def usage_period(days):
+    """Aware datetime range covering the last ``days`` days, for index range scans"""
+    end = timezone.now()
+    start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=days), datetime.min.time()))
+    return start, end
+
+def cached_usage(user, name, params, compute):
+    """Cache a computed usage payload per user for USAGE_CACHE_TIMEOUT seconds"""
+    raw = f"{name}:{user.id}:{sorted(params.items())}"
+    key = f"usage:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.USAGE_CACHE_TIMEOUT)
+    return data
+
 @permission_classes([IsAuthenticated])
 class ModelUsageView(View):
+    """Keyset-paginated usage records with statistics for the last 30 days"""
+    
     def get(self, request):
         try:
-            # Get usage for last 30 days
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=30)
-            
+            start, end = usage_period(30)
             usage_records = ModelUsage.objects.filter(
-                user=request.user,
-                created_at__date__gte=start_date,
-                created_at__date__lte=end_date
-            ).select_related('model').order_by('-created_at')
+                user=request.user, created_at__gte=start, created_at__lte=end
+            )
+            
+            limit = get_page_size(request.GET.get('limit'))
+            page, next_cursor = paginate_keyset(
+                usage_records.select_related('model'),
+                'created_at',
+                limit,
+                after=request.GET.get('cursor'),
+                descending=True
+            )
             
             usage_data = []
-            for record in usage_records:
+            for record in page:
                 usage_data.append({
                     'model': {
                         'id': record.model.id,
@@ -222,53 +199,150 @@ class ModelUsageView(View):
                     'created_at': record.created_at.isoformat()
                 })
             
-            # Calculate statistics
-            total_requests = usage_records.count()
-            successful_requests = usage_records.filter(success=True).count()
-            total_cost = sum(r.total_cost for r in usage_records)
-            avg_response_time = usage_records.aggregate(
-                avg_time=Avg('response_time')
-            )['avg_time'] or 0
+            # Calculate statistics in one aggregate query
+            statistics = cached_usage(request.user, 'statistics', {}, lambda: self.get_statistics(usage_records))
             
             return JsonResponse({
                 'usage': usage_data,
-                'statistics': {
-                    'total_requests': total_requests,
-                    'successful_requests': successful_requests,
-                    'success_rate': (successful_requests / total_requests * 100) if total_requests > 0 else 0,
-                    'total_cost': float(total_cost),
-                    'avg_response_time': avg_response_time
-                },
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'statistics': statistics,
                 'period': {
-                    'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat()
+                    'start_date': start.date().isoformat(),
+                    'end_date': end.date().isoformat()
                 }
             })
             
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+    
+    def get_statistics(self, usage_records):
+        stats = usage_records.aggregate(
+            total_requests=Count('id'),
+            successful_requests=Count('id', filter=Q(success=True)),
+            total_cost=Sum('total_cost'),
+            avg_response_time=Avg('response_time')
+        )
+        total_requests = stats['total_requests']
+        successful_requests = stats['successful_requests']
+        return {
+            'total_requests': total_requests,
+            'successful_requests': successful_requests,
+            'success_rate': (successful_requests / total_requests * 100) if total_requests > 0 else 0,
+            'total_cost': float(stats['total_cost'] or 0),
+            'avg_response_time': stats['avg_response_time'] or 0
+        }
+
+@permission_classes([IsAuthenticated])
+class ModelUsageSeriesView(View):
+    """Usage time series bucketed by hour, day or week, per model or provider.
+    
+    ``bucket`` is ``hour``, ``day`` (default) or ``week``; ``group_by`` is
+    ``model`` (default) or ``provider``; ``days`` is the lookback, capped per
+    bucket size.
+    """
+    
+    BUCKETS = {
+        'hour': (TruncHour, 7),
+        'day': (TruncDate, 365),
+        'week': (TruncWeek, 730),
+    }
+    GROUPS = {
+        'model': 'model_id',
+        'provider': 'model__provider',
+    }
+    
+    def get(self, request):
+        try:
+            bucket = request.GET.get('bucket', 'day')
+            group_by = request.GET.get('group_by', 'model')
+            if bucket not in self.BUCKETS:
+                return JsonResponse({'error': f'Invalid bucket: {bucket}'}, status=400)
+            if group_by not in self.GROUPS:
+                return JsonResponse({'error': f'Invalid group_by: {group_by}'}, status=400)
+            trunc, max_days = self.BUCKETS[bucket]
+            try:
+                days = max(1, min(int(request.GET.get('days', 30)), max_days))
+            except ValueError:
+                return JsonResponse({'error': 'Invalid days'}, status=400)
+            
+            params = {'bucket': bucket, 'group_by': group_by, 'days': days}
+            data = cached_usage(
+                request.user, 'series', params,
+                lambda: self.get_series(request.user, trunc, self.GROUPS[group_by], days)
+            )
+            return JsonResponse({**params, **data})
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    def get_series(self, user, trunc, group_field, days):
+        """Aggregate the series in a single grouped query"""
+        start, end = usage_period(days)
+        rows = ModelUsage.objects.filter(
+            user=user, created_at__gte=start, created_at__lte=end
+        ).order_by().annotate(
+            bucket=trunc('created_at'), group=F(group_field)
+        ).values('bucket', 'group').annotate(
+            requests=Count('id'),
+            successful_requests=Count('id', filter=Q(success=True)),
+            input_tokens=Sum('input_tokens'),
+            output_tokens=Sum('output_tokens'),
+            total_cost=Sum('total_cost'),
+            avg_response_time=Avg('response_time')
+        ).order_by('group', 'bucket')
+        
+        series = {}
+        for row in rows:
+            series.setdefault(row['group'], []).append({
+                'bucket': row['bucket'].isoformat(),
+                'requests': row['requests'],
+                'successful_requests': row['successful_requests'],
+                'input_tokens': row['input_tokens'],
+                'output_tokens': row['output_tokens'],
+                'total_cost': float(row['total_cost']),
+                'avg_response_time': row['avg_response_time']
+            })
+        return {
+            'series': [{'key': key, 'points': points} for key, points in series.items()],
+            'period': {'start_date': start.date().isoformat(), 'end_date': end.date().isoformat()}
+        }
 
 @permission_classes([IsAuthenticated])
 class SystemMetricsView(View):
+    """Precomputed metric buckets maintained by ``manage.py rollup_metrics``.
+    
+    ``granularity=day`` (default) returns the last 30 days, ``hour`` the
+    last 48 hours.
+    """
+    
     def get(self, request):
         try:
             # Only admin users can access system metrics
             if not request.user.is_staff:
                 return JsonResponse({'error': 'Admin access required'}, status=403)
             
-            # Get metrics for last 30 days
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=30)
-            
-            metrics = SystemMetrics.objects.filter(
-                date__gte=start_date,
-                date__lte=end_date
-            ).order_by('-date')
+            granularity = request.GET.get('granularity', 'day')
+            if granularity == 'hour':
+                end = timezone.now()
+                start = end - timedelta(hours=48)
+                metrics = HourlySystemMetrics.objects.filter(hour__gte=start).order_by('-hour')
+                bucket_field = 'hour'
+            elif granularity == 'day':
+                end = timezone.now().date()
+                start = end - timedelta(days=30)
+                metrics = SystemMetrics.objects.filter(date__gte=start, date__lte=end).order_by('-date')
+                bucket_field = 'date'
+            else:
+                return JsonResponse({'error': f'Invalid granularity: {granularity}'}, status=400)
+            metrics = list(metrics)
             
             metrics_data = []
             for metric in metrics:
                 metrics_data.append({
-                    'date': metric.date.isoformat(),
+                    bucket_field: getattr(metric, bucket_field).isoformat(),
                     'total_requests': metric.total_requests,
                     'successful_requests': metric.successful_requests,
                     'failed_requests': metric.failed_requests,
@@ -278,14 +352,17 @@ class SystemMetricsView(View):
                     'unique_users': metric.unique_users
                 })
             
-            # Calculate totals
+            # Calculate totals; the average is weighted by requests per bucket
+            total_requests = sum(m.total_requests for m in metrics)
             totals = {
-                'total_requests': sum(m.total_requests for m in metrics),
+                'total_requests': total_requests,
                 'successful_requests': sum(m.successful_requests for m in metrics),
                 'failed_requests': sum(m.failed_requests for m in metrics),
                 'total_tokens': sum(m.total_tokens for m in metrics),
                 'total_cost': sum(m.total_cost for m in metrics),
-                'avg_response_time': sum(m.avg_response_time for m in metrics) / len(metrics) if metrics else 0,
+                'avg_response_time': (
+                    sum(m.total_response_time for m in metrics) / total_requests if total_requests else 0
+                ),
                 'total_unique_users': sum(m.unique_users for m in metrics)
             }
             
@@ -293,10 +370,34 @@ class SystemMetricsView(View):
                 'metrics': metrics_data,
                 'totals': totals,
                 'period': {
-                    'start_date': start_date.isoformat(),
-                    'end_date': end_date.isoformat()
+                    'start_date': start.isoformat(),
+                    'end_date': end.isoformat()
                 }
             })
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+@permission_classes([IsAuthenticated])
+class PrometheusMetricsView(View):
+    """Per-endpoint latency histograms of this process in the Prometheus text format"""
+    
+    def get(self, request):
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@permission_classes([IsAuthenticated])
+class SlowRequestsView(View):
+    """cProfile captures of the slowest sampled requests of this process"""
+    
+    def get(self, request):
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        
+        return JsonResponse({
+            'sample_rate': settings.PERF_PROFILE_SAMPLE_RATE,
+            'threshold': settings.PERF_SLOW_REQUEST_SECONDS,
+            'requests': slow_profiles.snapshot()
+        })
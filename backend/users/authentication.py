@@ -0,0 +1,358 @@
+"""
+Firebase ID token authentication.
+
+Tokens are verified locally against Google's signing certificates, which
+are fetched from ``settings.FIREBASE_CERTS_URL`` and cached for as long as
+the response's ``Cache-Control``/``Expires`` headers allow. A verified token
+is remembered (by its SHA-256 hash) in an LRU until the token's ``exp``, and
+the Firebase uid -> user id mapping is kept in the Django cache, so a
+request with a known token makes no network calls and one primary-key query
+for the user.
+
+Three entry points share this path:
+
+* ``FirebaseAuthenticationMiddleware`` sets ``request.user`` for requests
+  with an ``Authorization: Bearer <token>`` header and answers 401 when the
+  token is invalid
+* ``FirebaseAuthentication``, the DRF authentication class
+* ``FirebaseBackend``, for ``django.contrib.auth.authenticate(request,
+  firebase_token=...)``
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+import httpx
+import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from cryptography.x509 import load_pem_x509_certificate
+from django.conf import settings
+from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from rest_framework import authentication, exceptions
+
+from alpha_mind.fastjson import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Used when Google's response carries no cache headers
+DEFAULT_KEYS_TTL = 3600
+# An unknown key id triggers at most one refetch per this many seconds
+REFETCH_INTERVAL = 60
+# Allowed clock skew when checking iat/exp
+CLOCK_SKEW = 60
+
+class InvalidToken(Exception):
+    """Raised when a Firebase ID token cannot be verified"""
+
+def cache_lifetime(headers, now):
+    """Seconds a response may be cached for, from Cache-Control or Expires"""
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name.lower() in ('no-store', 'no-cache'):
+            return 0
+        if name.lower() == 'max-age' and value.isdigit():
+            return max(0, int(value) - int(headers.get('Age', '0') or 0))
+    if 'Expires' in headers:
+        try:
+            return max(0, parsedate_to_datetime(headers['Expires']).timestamp() - now)
+        except (TypeError, ValueError):
+            return 0
+    return DEFAULT_KEYS_TTL
+
+class SigningKeys:
+    """Google's token signing keys, cached as the certificate endpoint allows"""
+
+    def __init__(self, url=None, transport=None):
+        self.url = url or settings.FIREBASE_CERTS_URL
+        self.client = httpx.Client(transport=transport, timeout=10.0)
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self.fetches = 0
+
+    def get(self, kid):
+        """Public key for a key id, refetching when the cache has expired"""
+        if self.stale(kid):
+            with self._lock:
+                if self.stale(kid):
+                    self.refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken('Token signed with an unknown key')
+        return key
+
+    def stale(self, kid):
+        """Expired, or missing the key id and not refetched recently (key rotation)"""
+        now = time.time()
+        return now >= self._expires_at or (
+            kid not in self._keys and now - self._fetched_at >= REFETCH_INTERVAL
+        )
+
+    def refresh(self):
+        try:
+            response = self.client.get(self.url)
+            response.raise_for_status()
+            certificates = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            if not self._keys:
+                raise InvalidToken(f'Could not fetch signing keys: {e}') from e
+            # Keep serving the previous keys and retry after REFETCH_INTERVAL
+            logger.warning(f"Could not refresh Firebase signing keys, using cached keys: {e}")
+            self._fetched_at = time.time()
+            self._expires_at = self._fetched_at + REFETCH_INTERVAL
+            return
+        now = time.time()
+        self._keys = {
+            kid: load_pem_x509_certificate(pem.encode('utf-8')).public_key()
+            for kid, pem in certificates.items()
+        }
+        self._fetched_at = now
+        self._expires_at = now + cache_lifetime(response.headers, now)
+        self.fetches += 1
+
+class VerifiedTokens:
+    """LRU of verified token hashes and their claims, each kept until exp"""
+
+    def __init__(self, size=None):
+        self.size = size if size is not None else settings.FIREBASE_TOKEN_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()
+
+    def get(self, digest):
+        with self._lock:
+            claims = self._tokens.get(digest)
+            if claims is None:
+                return None
+            if claims['exp'] <= time.time():
+                del self._tokens[digest]
+                return None
+            self._tokens.move_to_end(digest)
+            return claims
+
+    def add(self, digest, claims):
+        with self._lock:
+            self._tokens[digest] = claims
+            self._tokens.move_to_end(digest)
+            while len(self._tokens) > self.size:
+                self._tokens.popitem(last=False)
+
+class FirebaseVerifier:
+    """Verifies Firebase ID tokens, remembering the ones already verified"""
+
+    def __init__(self, project_id=None, keys=None, tokens=None):
+        self.project_id = project_id if project_id is not None else settings.FIREBASE_PROJECT_ID
+        self.keys = keys or SigningKeys()
+        self.tokens = tokens or VerifiedTokens()
+
+    def verify(self, token):
+        """Return the token's claims, or raise InvalidToken"""
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        claims = self.tokens.get(digest)
+        if claims is not None:
+            return claims
+        claims = self.decode(token)
+        self.tokens.add(digest, claims)
+        return claims
+
+    def decode(self, token):
+        if not self.project_id:
+            raise InvalidToken('FIREBASE_PROJECT_ID is not configured')
+        try:
+            header = jwt.get_unverified_header(token)
+            if header.get('alg') != 'RS256':
+                raise InvalidToken('Token must be signed with RS256')
+            claims = jwt.decode(
+                token,
+                self.keys.get(header.get('kid')),
+                algorithms=['RS256'],
+                audience=self.project_id,
+                issuer=f'https://securetoken.google.com/{self.project_id}',
+                leeway=CLOCK_SKEW,
+                options={'require': ['exp', 'iat', 'sub']}
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e)) from e
+        if not claims['sub'] or len(claims['sub']) > 128:
+            raise InvalidToken('Token has an invalid subject')
+        if claims.get('auth_time', 0) > time.time() + CLOCK_SKEW:
+            raise InvalidToken('Token auth_time is in the future')
+        claims['uid'] = claims['sub']
+        return claims
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+def get_verifier():
+    """Return the process-wide token verifier"""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = FirebaseVerifier()
+    return _verifier
+
+def user_cache_key(uid):
+    return f"firebase-uid:{hashlib.sha256(uid.encode('utf-8')).hexdigest()}"
+
+def get_or_create_user(claims):
+    """Django user for a Firebase account, created on first sign-in"""
+    from .models import UserProfile, UserSettings
+
+    firebase_uid = claims['uid']
+    email = claims.get('email')
+    # Check if user profile exists, outside the transaction: it takes the
+    # SQLite write lock, and most sign-ins are of existing users
+    try:
+        return UserProfile.objects.select_related('user').get(firebase_uid=firebase_uid).user
+    except UserProfile.DoesNotExist:
+        pass
+
+    with transaction.atomic():
+        # Create new user
+        username = email.split('@')[0] if email else f"user_{firebase_uid[:8]}"
+
+        # Ensure unique username
+        counter = 1
+        original_username = username
+        while User.objects.filter(username=username).exists():
+            username = f"{original_username}_{counter}"
+            counter += 1
+
+        user = User.objects.create_user(
+            username=username,
+            email=email,
+            password=None  # No password for Firebase users
+        )
+
+        # Create user profile
+        UserProfile.objects.create(
+            user=user,
+            firebase_uid=firebase_uid,
+            display_name=claims.get('display_name') or claims.get('name', ''),
+            photo_url=claims.get('photo_url') or claims.get('picture', ''),
+            email_verified=claims.get('email_verified', True)
+        )
+
+        # Create user settings
+        UserSettings.objects.create(user=user)
+
+        return user
+
+def user_for_claims(claims):
+    """Django user for verified claims, through the cached uid mapping"""
+    key = user_cache_key(claims['uid'])
+    user_id = cache.get(key)
+    if user_id is not None:
+        try:
+            return User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            cache.delete(key)
+    try:
+        user = get_or_create_user(claims)
+    except IntegrityError:
+        # Created concurrently by another request for the same account
+        user = get_or_create_user(claims)
+    cache.set(key, user.pk, settings.FIREBASE_USER_CACHE_TIMEOUT)
+    return user
+
+def authenticate_token(token):
+    """Return ``(user, claims)`` for a Firebase ID token, or raise InvalidToken"""
+    claims = get_verifier().verify(token)
+    user = user_for_claims(claims)
+    if not user.is_active:
+        raise InvalidToken('User account is disabled')
+    return user, claims
+
+def bearer_token(request):
+    """The bearer token in a request's Authorization header, if any"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+class FirebaseAuthentication(authentication.BaseAuthentication):
+    """DRF authentication with ``Authorization: Bearer <Firebase ID token>``"""
+
+    def authenticate(self, request):
+        token = bearer_token(request)
+        if token is None:
+            return None
+        try:
+            return authenticate_token(token)
+        except InvalidToken as e:
+            raise exceptions.AuthenticationFailed(f'Invalid token: {e}')
+
+    def authenticate_header(self, request):
+        return 'Bearer'
+
+class FirebaseBackend(BaseBackend):
+    """Django authentication backend accepting ``firebase_token``"""
+
+    def authenticate(self, request, firebase_token=None, **kwargs):
+        if firebase_token is None:
+            return None
+        try:
+            return authenticate_token(firebase_token)[0]
+        except InvalidToken:
+            return None
+
+    def get_user(self, user_id):
+        try:
+            return User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+
+class FirebaseAuthenticationMiddleware:
+    """Authenticate plain Django views from a Firebase bearer token"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = bearer_token(request)
+        if token is not None:
+            try:
+                self.set_user(request, authenticate_token(token)[0])
+            except InvalidToken as e:
+                return self.unauthorized(e)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        token = bearer_token(request)
+        if token is not None:
+            try:
+                user, claims = await sync_to_async(authenticate_token)(token)
+                self.set_user(request, user)
+            except InvalidToken as e:
+                return self.unauthorized(e)
+        return await self.get_response(request)
+
+    @staticmethod
+    def set_user(request, user):
+        async def auser():
+            return user
+
+        request.user = user
+        request.auser = auser
+
+    @staticmethod
+    def unauthorized(error):
+        response = JsonResponse({'error': f'Invalid token: {error}'}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from alpha_mind.response_cache import invalidate
+from .models import UserProfile, UserSettings
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate(instance.pk, 'profile')
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate(instance.user_id, 'profile')
+
+@receiver(post_save, sender=UserSettings)
+def settings_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate(instance.user_id, 'settings')
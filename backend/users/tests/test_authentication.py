@@ -0,0 +1,73 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from alpha_mind.testing import CertificateServer, TestCase, make_token, make_verifier
+from users import authentication
+from users.authentication import InvalidToken, authenticate_token
+
+class FirebaseAuthenticationTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = CertificateServer()
+        self.verifier = make_verifier(self.server)
+        self.enterContext(mock.patch.object(authentication, 'get_verifier', lambda: self.verifier))
+
+    def test_one_indexed_query_when_warm(self):
+        token = make_token(uid='query-uid')
+        authenticate_token(token)
+        requests = self.server.requests
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = authenticate_token(token)
+        self.assertEqual(self.server.requests, requests)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('auth_user', queries[0]['sql'])
+        # A new token for a known uid is verified locally, still one query
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate_token(make_token(uid='query-uid', extra=1))[0], user)
+        self.assertEqual(self.server.requests, requests)
+
+    def test_rejects_bad_tokens(self):
+        for token in (
+            make_token(expires_in=-3600),
+            make_token(audience='another-project'),
+            make_token(kid='unknown-key'),
+            make_token().rsplit('.', 1)[0] + '.c2lnbmF0dXJl',
+            'not-a-token',
+        ):
+            with self.subTest(token=token[-20:]), self.assertRaises(InvalidToken):
+                authenticate_token(token)
+
+    def test_verified_token_kept_until_exp(self):
+        claims = self.verifier.verify(make_token(expires_in=2))
+        digest = next(iter(self.verifier.tokens._tokens))
+        self.assertIs(self.verifier.tokens.get(digest), claims)
+        claims['exp'] = time.time() - 1
+        self.assertIsNone(self.verifier.tokens.get(digest))
+
+    def test_keys_follow_cache_headers(self):
+        self.server.cache_control = 'public, max-age=0'
+        self.verifier.decode(make_token())
+        self.verifier.decode(make_token(extra=1))
+        self.assertEqual(self.server.requests, 2)
+        self.server.cache_control = 'public, max-age=600'
+        self.verifier.decode(make_token(extra=2))
+        self.verifier.decode(make_token(extra=3))
+        self.assertEqual(self.server.requests, 3)
+
+    def test_middleware_sets_user(self):
+        client = Client()
+        token = make_token(uid='middleware-uid')
+        response = client.get('/api/chat/sessions/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(profile__firebase_uid='middleware-uid')
+        response = client.post('/api/auth/check/', {'token': token}, content_type='application/json')
+        self.assertEqual(response.json()['user_id'], user.id)
+
+        response = client.get('/api/chat/sessions/', HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
@@ -1,101 +1,52 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
-from django.contrib.auth.models import User
-from django.db import transaction
-import json
-import firebase_admin
-from firebase_admin import auth
 from datetime import datetime, date
 
+from alpha_mind import fastjson
+from alpha_mind.fastjson import JsonResponse
+from alpha_mind.response_cache import cached_response
+from .authentication import InvalidToken, authenticate_token
 from .models import UserProfile, UserSettings, UserUsage
 
 @method_decorator(csrf_exempt, name='dispatch')
 class CheckTokenView(View):
     def post(self, request):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             token = data.get('token')
             
             if not token:
                 return JsonResponse({'error': 'Token is required'}, status=400)
             
-            # Verify Firebase token
+            # Verify Firebase token and get or create the user
             try:
-                decoded_token = auth.verify_id_token(token)
-                firebase_uid = decoded_token['uid']
-                email = decoded_token.get('email')
-                display_name = decoded_token.get('display_name', '')
-                photo_url = decoded_token.get('photo_url', '')
-                
-                # Get or create user
-                user = self.get_or_create_user(firebase_uid, email, display_name, photo_url)
-                
-                # Generate Django token or use existing
-                # For now, return user info (in production, use JWT)
-                return JsonResponse({
-                    'valid': True,
-                    'user_id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'display_name': user.profile.display_name,
-                    'photo_url': user.profile.photo_url
-                })
-                
-            except firebase_admin.exceptions.FirebaseError as e:
+                user, claims = authenticate_token(token)
+            except InvalidToken as e:
                 return JsonResponse({'error': f'Invalid token: {str(e)}'}, status=401)
+            
+            # Generate Django token or use existing
+            # For now, return user info (in production, use JWT)
+            return JsonResponse({
+                'valid': True,
+                'user_id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'display_name': user.profile.display_name,
+                'photo_url': user.profile.photo_url
+            })
                 
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
-    
-    def get_or_create_user(self, firebase_uid, email, display_name, photo_url):
-        """Get or create Django user from Firebase data"""
-        with transaction.atomic():
-            # Check if user profile exists
-            try:
-                profile = UserProfile.objects.get(firebase_uid=firebase_uid)
-                return profile.user
-            except UserProfile.DoesNotExist:
-                pass
-            
-            # Create new user
-            username = email.split('@')[0] if email else f"user_{firebase_uid[:8]}"
-            
-            # Ensure unique username
-            counter = 1
-            original_username = username
-            while User.objects.filter(username=username).exists():
-                username = f"{original_username}_{counter}"
-                counter += 1
-            
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=None  # No password for Firebase users
-            )
-            
-            # Create user profile
-            UserProfile.objects.create(
-                user=user,
-                firebase_uid=firebase_uid,
-                display_name=display_name,
-                photo_url=photo_url,
-                email_verified=True
-            )
-            
-            # Create user settings
-            UserSettings.objects.create(user=user)
-            
-            return user
 
 @permission_classes([IsAuthenticated])
 class UserProfileView(View):
+    @cached_response('profile')
     def get(self, request):
         try:
             profile = request.user.profile
@@ -114,7 +65,7 @@ class UserProfileView(View):
     
     def put(self, request):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             profile = request.user.profile
             
             # Update profile fields
@@ -129,13 +80,14 @@ class UserProfileView(View):
             
             return JsonResponse({'message': 'Profile updated successfully'})
             
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 @permission_classes([IsAuthenticated])
 class UserSettingsView(View):
+    @cached_response('settings')
     def get(self, request):
         try:
             settings = request.user.settings
@@ -155,7 +107,7 @@ class UserSettingsView(View):
     
     def put(self, request):
         try:
-            data = json.loads(request.body)
+            data = fastjson.loads(request.body)
             settings = request.user.settings
             
             # Update settings fields
@@ -173,7 +125,7 @@ class UserSettingsView(View):
             
             return JsonResponse({'message': 'Settings updated successfully'})
             
-        except json.JSONDecodeError:
+        except fastjson.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+import django
+import pytest
+
+BACKEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'backend'
+)
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alpha_mind.settings')
+os.environ.setdefault('USAGE_JOURNAL_DIR', tempfile.mkdtemp(prefix='usage-journal-'))
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+@pytest.fixture(scope='session')
+def django_db(tmp_path_factory):
+    """Create a file-backed test database shared by every thread"""
+    for alias in connections:
+        if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+            test_name = str(tmp_path_factory.mktemp('db') / f'{alias}.sqlite3')
+            settings.DATABASES[alias].setdefault('TEST', {})['NAME'] = test_name
+    setup_test_environment()
+    old_names = [
+        (connections[alias], connections[alias].creation.create_test_db(verbosity=0))
+        for alias in connections
+    ]
+    yield
+    # Stop background threads while the test database still exists
+    from gateway.accounting import get_accountant
+    from gateway.catalog import get_catalog
+    from gateway.quotas import get_quotas
+    get_accountant().close()
+    get_catalog().close()
+    get_quotas().close()
+    for connection, old_name in old_names:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
@@ -0,0 +1,75 @@
+"""
+Compare chat send throughput under WSGI-style threads and a single ASGI loop.
+
+The engine is replaced by an in-process transport that answers after
+ENGINE_LATENCY seconds, so the numbers show how many chats a worker can keep
+in flight rather than model speed.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+
+from alpha_mind import fastjson
+from alpha_mind.testing import FakeEngine
+from chat import views as chat_views
+from users.models import UserSettings
+
+ENGINE_LATENCY = 0.5
+CONCURRENT_CHATS = 200
+WSGI_THREADS = 8
+
+@pytest.fixture
+def fake_engine_client(monkeypatch):
+    engine = FakeEngine(reply='Hello!', latency=ENGINE_LATENCY, usage=(10, 2))
+    monkeypatch.setattr(chat_views, 'get_async_client', engine.async_clients())
+
+@pytest.fixture
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-chat')
+    # Far more chats than the default daily quota
+    UserSettings.objects.update_or_create(user=user, defaults={'max_chats_per_day': 10**9})
+    return user
+
+def chat_body():
+    return fastjson.dumps({'message': 'Hello there', 'model': 'openai/gpt-4'})
+
+def report(benchmark):
+    benchmark.extra_info['chats'] = CONCURRENT_CHATS
+    benchmark.extra_info['engine_latency'] = ENGINE_LATENCY
+    if benchmark.stats:  # None with --benchmark-disable
+        benchmark.extra_info['chats_per_second'] = CONCURRENT_CHATS / benchmark.stats.stats.mean
+
+@pytest.mark.benchmark(group='chat-send-throughput')
+def test_wsgi_thread_pool(benchmark, user, fake_engine_client):
+    client = Client()
+    client.force_login(user)
+
+    def send(_):
+        return client.post('/api/chat/send/', chat_body(), content_type='application/json')
+
+    def run():
+        with ThreadPoolExecutor(max_workers=WSGI_THREADS) as pool:
+            return list(pool.map(send, range(CONCURRENT_CHATS)))
+
+    responses = benchmark.pedantic(run, rounds=2, iterations=1)
+    report(benchmark)
+    assert all(response.status_code == 200 for response in responses)
+
+@pytest.mark.benchmark(group='chat-send-throughput')
+def test_asgi_event_loop(benchmark, user, fake_engine_client):
+    client = AsyncClient()
+    client.force_login(user)
+
+    async def send_all():
+        return await asyncio.gather(*(
+            client.post('/api/chat/send/', chat_body(), content_type='application/json')
+            for _ in range(CONCURRENT_CHATS)
+        ))
+
+    responses = benchmark.pedantic(lambda: asyncio.run(send_all()), rounds=2, iterations=1)
+    report(benchmark)
+    assert all(response.status_code == 200 for response in responses)
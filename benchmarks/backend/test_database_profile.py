@@ -0,0 +1,186 @@
+"""
+SQLite write concurrency with the production database profile.
+
+Runs a chat-like write transaction (read the session, insert a message,
+bump the session's counter) from WRITER_THREADS threads while READER_THREADS
+threads read recent messages, against a scratch database with Django's
+previous defaults (rollback journal, deferred transactions, a new connection
+per request) and with the profile from settings (WAL and pragmas on connect,
+IMMEDIATE transactions, persistent connections). The 'deferred' profile is
+the same without IMMEDIATE transactions.
+
+IMMEDIATE applies to every atomic() block, so a read-only transaction also
+waits for the write lock; test_read_transactions measures what that costs
+readers that open one under the same write load.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+
+WRITER_THREADS = 8
+READER_THREADS = 4
+WRITES_PER_THREAD = 150
+SESSIONS = 20
+
+PROFILES = {
+    'default': {'options': {}, 'persistent': False},
+    'production': {
+        'options': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(settings.SQLITE_PRAGMAS),
+        },
+        'persistent': True,
+    },
+    'deferred': {
+        'options': {'init_command': ';'.join(settings.SQLITE_PRAGMAS)},
+        'persistent': True,
+    },
+}
+
+@pytest.fixture
+def database(tmp_path):
+    aliases = []
+
+    def create(profile):
+        alias = f'bench_{profile}_{len(aliases)}'
+        config = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(tmp_path / f'{alias}.sqlite3'),
+            'OPTIONS': PROFILES[profile]['options'],
+        }
+        connections.settings[alias] = connections.configure_settings({'default': config})['default']
+        aliases.append(alias)
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE session (id INTEGER PRIMARY KEY, message_count INTEGER NOT NULL)')
+            cursor.execute(
+                'CREATE TABLE message (id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL, '
+                'content TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            cursor.execute('CREATE INDEX message_session ON message (session_id, created_at)')
+            cursor.executemany('INSERT INTO session VALUES (%s, 0)', [(n,) for n in range(SESSIONS)])
+        connections[alias].close()
+        return alias
+
+    yield create
+    for alias in aliases:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+def send_message(alias, session_id, n):
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT message_count FROM session WHERE id = %s', [session_id])
+            cursor.fetchone()
+            cursor.execute(
+                'INSERT INTO message (session_id, content, created_at) VALUES (%s, %s, %s)',
+                [session_id, f'message {n} ' * 20, time.time()]
+            )
+            cursor.execute('UPDATE session SET message_count = message_count + 1 WHERE id = %s', [session_id])
+
+def read_messages(alias, session_id):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            'SELECT id, content FROM message WHERE session_id = %s ORDER BY created_at DESC LIMIT 50',
+            [session_id]
+        )
+        cursor.fetchall()
+
+def run_workload(alias, persistent, read_transactions=False):
+    errors = []
+    done = threading.Event()
+
+    def writer(worker):
+        try:
+            for n in range(WRITES_PER_THREAD):
+                try:
+                    send_message(alias, (worker * WRITES_PER_THREAD + n) % SESSIONS, n)
+                except OperationalError as e:
+                    errors.append(str(e))
+                if not persistent:
+                    connections[alias].close()  # CONN_MAX_AGE = 0
+        finally:
+            connections[alias].close()
+
+    def reader(worker):
+        reads = 0
+        try:
+            while not done.is_set():
+                try:
+                    if read_transactions:
+                        with transaction.atomic(using=alias):
+                            read_messages(alias, worker % SESSIONS)
+                            read_messages(alias, (worker + 1) % SESSIONS)
+                    else:
+                        read_messages(alias, worker % SESSIONS)
+                    reads += 1
+                except OperationalError as e:
+                    errors.append(str(e))
+                if not persistent:
+                    connections[alias].close()
+        finally:
+            connections[alias].close()
+        return reads
+
+    with ThreadPoolExecutor(max_workers=WRITER_THREADS + READER_THREADS) as pool:
+        readers = [pool.submit(reader, n) for n in range(READER_THREADS)]
+        list(pool.map(writer, range(WRITER_THREADS)))
+        done.set()
+        reads = sum(future.result() for future in readers)
+    return errors, reads
+
+def written(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM message')
+        count = cursor.fetchone()[0]
+        cursor.execute('SELECT SUM(message_count) FROM session')
+        return count, cursor.fetchone()[0]
+
+@pytest.mark.parametrize('profile', PROFILES)
+@pytest.mark.benchmark(group='database-write-concurrency')
+def test_write_concurrency(benchmark, database, profile):
+    results = []
+
+    def setup():
+        return (database(profile), PROFILES[profile]['persistent']), {}
+
+    def run(alias, persistent):
+        results.append((alias, run_workload(alias, persistent)))
+
+    benchmark.pedantic(run, setup=setup, rounds=3, iterations=1)
+    writes = WRITER_THREADS * WRITES_PER_THREAD
+    failed = sum(len(errors) for _, (errors, _) in results)
+    committed = writes - failed / len(results)
+    benchmark.extra_info['failed_writes_per_round'] = failed / len(results)
+    if benchmark.stats:  # None with --benchmark-disable
+        benchmark.extra_info['committed_writes_per_second'] = committed / benchmark.stats.stats.mean
+
+    for alias, (errors, reads) in results:
+        count, total = written(alias)
+        assert count == total == writes - len(errors)
+    if profile == 'production':
+        assert failed == 0
+
+@pytest.mark.parametrize('profile', ['deferred', 'production'])
+@pytest.mark.benchmark(group='database-read-transactions')
+def test_read_transactions(benchmark, database, profile):
+    results = []
+
+    def setup():
+        return (database(profile),), {}
+
+    def run(alias):
+        results.append(run_workload(alias, persistent=True, read_transactions=True))
+
+    benchmark.pedantic(run, setup=setup, rounds=3, iterations=1)
+    reads = sum(reads for _, reads in results) / len(results)
+    benchmark.extra_info['failed_writes_per_round'] = sum(len(errors) for errors, _ in results) / len(results)
+    if benchmark.stats:
+        benchmark.extra_info['read_transactions_per_second'] = reads / benchmark.stats.stats.mean
+    if profile == 'production':
+        assert all(not errors for errors, _ in results)
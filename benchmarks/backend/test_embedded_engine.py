@@ -0,0 +1,84 @@
+"""
+Compare the HTTP hop to the engine with the in-process embedded engine.
+
+Both sides run the real AIModelService with a stub provider, so the numbers
+are the per-request cost of the transport: JSON encode/decode, the local TCP
+hop and the extra pydantic round trip. CPU time per request is reported in
+extra_info (client and server share this process, so it covers both).
+"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+uvicorn = pytest.importorskip('uvicorn')
+
+from ai_engine import main as engine_main
+from alpha_mind.embedded_engine import EmbeddedEngine, EmbeddedEngineClient
+from alpha_mind.engine_client import EngineClient
+from alpha_mind.testing import engine_service
+
+HISTORY_LENGTH = 20
+CPU_SAMPLE_REQUESTS = 200
+
+@pytest.fixture(scope='module')
+def payload():
+    roles = ['user', 'assistant']
+    return {
+        'messages': [
+            {'role': roles[i % 2], 'content': f"Message {i}: " + "lorem ipsum dolor sit amet " * 20}
+            for i in range(HISTORY_LENGTH)
+        ],
+        'model': 'openai/gpt-4',
+        'max_tokens': 1000,
+        'temperature': 0.7
+    }
+
+@pytest.fixture(scope='module')
+def http_client():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    engine_main.app.state.ai_service = engine_service()
+    server = uvicorn.Server(uvicorn.Config(
+        engine_main.app, host='127.0.0.1', port=port, lifespan='off', log_level='warning'
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    client = EngineClient(base_url=f'http://127.0.0.1:{port}', uds='')
+    yield client
+    client.close()
+    server.should_exit = True
+    thread.join()
+
+@pytest.fixture(scope='module')
+def embedded_client():
+    engine = EmbeddedEngine(service=engine_service())
+    yield EmbeddedEngineClient(engine)
+    engine.close()
+
+def record_cpu(benchmark, client, payload):
+    start = time.process_time()
+    for _ in range(CPU_SAMPLE_REQUESTS):
+        client.chat(payload)
+    benchmark.extra_info['cpu_ms_per_request'] = (
+        (time.process_time() - start) / CPU_SAMPLE_REQUESTS * 1000
+    )
+
+@pytest.mark.benchmark(group='engine-transport')
+def test_http_engine_chat(benchmark, http_client, payload):
+    data = benchmark(http_client.chat, payload)
+    record_cpu(benchmark, http_client, payload)
+    assert data['usage']['total_tokens'] == 1000
+
+@pytest.mark.benchmark(group='engine-transport')
+def test_embedded_engine_chat(benchmark, embedded_client, payload):
+    data = benchmark(embedded_client.chat, payload)
+    record_cpu(benchmark, embedded_client, payload)
+    assert data['usage']['total_tokens'] == 1000
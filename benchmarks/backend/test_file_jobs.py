@@ -0,0 +1,66 @@
+"""
+Background file analysis jobs (files.jobs).
+
+Compares answering an analyze request after extraction and the engine call
+with queueing a job and answering 202 at once.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client, override_settings
+
+from alpha_mind import fastjson
+from alpha_mind.testing import FakeEngine, make_upload
+from files import analysis as files_analysis
+from files.models import AnalysisJob
+
+ENGINE_LATENCY = 0.2
+
+@pytest.fixture
+def engine(django_db, monkeypatch, tmp_path):
+    fake = FakeEngine(latency=ENGINE_LATENCY)
+    client = fake.client()
+    monkeypatch.setattr(files_analysis, 'get_client', lambda: client)
+    # Jobs left queued by other suites would be run by these workers
+    AnalysisJob.objects.filter(status__in=AnalysisJob.ACTIVE_STATUSES).delete()
+    with override_settings(MEDIA_ROOT=str(tmp_path), FILE_JOBS_RETRY_DELAY=0):
+        yield fake
+    client.close()
+
+@pytest.fixture
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-file-jobs')
+    return user
+
+@pytest.fixture
+def client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+def analyze(client, file_id, query='Summarize'):
+    return client.post(
+        '/api/files/analyze/', fastjson.dumps({'file_id': str(file_id), 'query': query, 'model': 'openai/gpt-4'}),
+        content_type='application/json'
+    )
+
+@pytest.mark.benchmark(group='file-analyze')
+def test_inline_analysis(benchmark, engine, user):
+    """The previous request path: extract, call the engine and save before answering"""
+    upload = make_upload(user)
+    analysis = benchmark(files_analysis.analyze_file, upload, 'Summarize', 'openai/gpt-4', lambda *args: None)
+    assert analysis.summary == 'A summary'
+
+@pytest.mark.benchmark(group='file-analyze')
+def test_enqueue_analysis(benchmark, engine, user, client):
+    uploads = iter([make_upload(user) for _ in range(200)])
+
+    def request():
+        response = analyze(client, next(uploads).id)
+        assert response.status_code == 202
+        return response
+
+    # Every round leaves a queued job
+    with override_settings(FILE_JOBS_MAX_QUEUED_PER_USER=1000):
+        benchmark.pedantic(request, rounds=50, iterations=1)
+    AnalysisJob.objects.filter(user=user, status=AnalysisJob.STATUS_QUEUED).delete()
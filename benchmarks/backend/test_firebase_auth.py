@@ -0,0 +1,49 @@
+"""
+Cached Firebase ID token authentication (users.authentication).
+
+Tokens are signed with a locally generated key whose certificate is served
+by an in-process transport standing in for Google's certificate endpoint.
+Compares a request authenticated from the verified-token and uid caches with
+full verification (key lookup, RS256 signature, profile lookup) on every
+request.
+"""
+
+import pytest
+from django.core.cache import cache
+
+from alpha_mind.testing import CertificateServer, make_token, make_verifier
+from users import authentication
+from users.authentication import authenticate_token, get_or_create_user
+from users.models import UserProfile
+
+@pytest.fixture
+def server():
+    return CertificateServer()
+
+@pytest.fixture
+def verifier(django_db, server, monkeypatch):
+    verifier = make_verifier(server)
+    monkeypatch.setattr(authentication, 'get_verifier', lambda: verifier)
+    cache.clear()
+    return verifier
+
+def uncached_authenticate(verifier, token):
+    """Full verification and profile lookup on every request"""
+    claims = verifier.decode(token)
+    return UserProfile.objects.select_related('user').get(firebase_uid=claims['uid']).user
+
+@pytest.mark.benchmark(group='firebase-auth')
+def test_cached_authentication(benchmark, verifier, server):
+    token = make_token()
+    authenticate_token(token)
+    requests = server.requests
+    user, claims = benchmark(authenticate_token, token)
+    assert claims['uid'] == 'bench-firebase-uid'
+    assert server.requests == requests  # No network calls once warm
+
+@pytest.mark.benchmark(group='firebase-auth')
+def test_uncached_verification(benchmark, verifier):
+    token = make_token()
+    get_or_create_user(verifier.decode(token))
+    user = benchmark(uncached_authenticate, verifier, token)
+    assert user.profile.firebase_uid == 'bench-firebase-uid'
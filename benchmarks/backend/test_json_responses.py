@@ -0,0 +1,80 @@
+"""
+Compare Django's JsonResponse with the fast JSON layer on large payloads
+"""
+
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from django.http import JsonResponse as DjangoJsonResponse
+
+from alpha_mind import fastjson
+
+HISTORY_LENGTH = 2000
+CATALOG_SIZE = 300
+
+RESPONSE_CLASSES = {
+    'django': DjangoJsonResponse,
+    'fastjson': fastjson.JsonResponse,
+}
+
+@pytest.fixture(scope='module')
+def chat_history():
+    created_at = datetime.now(timezone.utc)
+    roles = ['user', 'assistant']
+    return {
+        'session_id': str(uuid.uuid4()),
+        'title': 'Benchmark session',
+        'model': 'openai/gpt-4',
+        'created_at': created_at.isoformat(),
+        'messages': [
+            {
+                'id': str(uuid.uuid4()),
+                'role': roles[i % 2],
+                'content': f"Message {i}: " + "lorem ipsum dolor sit amet " * 20,
+                'token_count': 120,
+                'model': 'openai/gpt-4',
+                'created_at': created_at.isoformat()
+            }
+            for i in range(HISTORY_LENGTH)
+        ]
+    }
+
+@pytest.fixture(scope='module')
+def model_catalog():
+    return {
+        'models': [
+            {
+                'id': f"provider-{i % 5}/model-{i}",
+                'name': f"Model {i}",
+                'provider': 'openrouter',
+                'description': "A general purpose instruction-tuned model " * 4,
+                'context_window': 128000,
+                'pricing': {'input': Decimal('0.500000'), 'output': Decimal('1.500000')},
+                'capabilities': ['text-generation', 'function-calling', 'vision'],
+                'is_available': True,
+                'is_local': False
+            }
+            for i in range(CATALOG_SIZE)
+        ]
+    }
+
+@pytest.mark.benchmark(group='backend-response-history')
+@pytest.mark.parametrize('response_class', sorted(RESPONSE_CLASSES))
+def test_chat_history_response(benchmark, response_class, chat_history):
+    response = benchmark(RESPONSE_CLASSES[response_class], chat_history)
+    assert response.status_code == 200
+
+@pytest.mark.benchmark(group='backend-response-catalog')
+@pytest.mark.parametrize('response_class', sorted(RESPONSE_CLASSES))
+def test_model_catalog_response(benchmark, response_class, model_catalog):
+    response = benchmark(RESPONSE_CLASSES[response_class], model_catalog)
+    assert response.status_code == 200
+
+@pytest.mark.benchmark(group='backend-request-parsing')
+@pytest.mark.parametrize('backend', sorted(fastjson.BACKENDS))
+def test_request_body_parsing(benchmark, backend, chat_history):
+    _, loads = fastjson.BACKENDS[backend]
+    body = DjangoJsonResponse(chat_history).content
+    assert len(benchmark(loads, body)['messages']) == HISTORY_LENGTH
@@ -0,0 +1,63 @@
+"""
+Full-text message search through /api/chat/search/.
+
+Compares the FTS5 index with the ``content__icontains`` scan it replaces,
+over SEARCH_MESSAGES messages of random words.
+"""
+
+import random
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import Client
+
+from chat.importer import import_messages
+from chat.models import ChatSession
+from chat.search import FallbackSearchBackend
+
+SEARCH_MESSAGES = 50000
+SEARCH_SESSIONS = 50
+WORDS_PER_MESSAGE = 40
+
+rng = random.Random(42)
+VOCABULARY = sorted({
+    ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(5, 9))) for _ in range(5000)
+})
+# Each word appears in roughly 0.8% of messages
+QUERY = VOCABULARY[100]
+
+@pytest.fixture(scope='module')
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-search')
+    per_session = SEARCH_MESSAGES // SEARCH_SESSIONS
+    with transaction.atomic():
+        for n in range(SEARCH_SESSIONS):
+            session = ChatSession.objects.create(user=user, title=f"Session {n}", model='openai/gpt-4')
+            import_messages(session, (
+                {'role': 'user', 'content': ' '.join(rng.choices(VOCABULARY, k=WORDS_PER_MESSAGE))}
+                for _ in range(per_session)
+            ))
+    return user
+
+@pytest.fixture
+def client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+@pytest.mark.benchmark(group='message-search')
+def test_fts_search(benchmark, client):
+    response = benchmark(client.get, '/api/chat/search/', {'q': QUERY, 'limit': 20})
+    data = response.json()
+    assert response.status_code == 200
+    assert len(data['results']) == 20 and data['has_more']
+    assert '<mark>' in data['results'][0]['snippet']
+    scores = [result['score'] for result in data['results']]
+    assert scores == sorted(scores, reverse=True)
+
+@pytest.mark.benchmark(group='message-search')
+def test_icontains_scan(benchmark, user):
+    backend = FallbackSearchBackend()
+    hits = benchmark(backend.search, user, QUERY, None, 20, 0)
+    assert len(hits) == 20
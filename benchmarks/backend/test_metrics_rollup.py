@@ -0,0 +1,90 @@
+"""
+SystemMetrics rollup (gateway.rollup).
+
+Compares the dashboard reading precomputed daily buckets with aggregating
+the raw ModelUsage rows on every request, and measures an incremental rollup
+of newly added rows.
+"""
+
+import random
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.test import Client
+from django.utils import timezone
+
+from alpha_mind.testing import usage_rows
+from gateway.accounting import get_accountant
+from gateway.models import AIModel, ModelUsage
+from gateway.rollup import rollup_metrics
+
+USAGE_ROWS = 100000
+USAGE_DAYS = 30
+USAGE_USERS = 50
+INCREMENT_ROWS = 1000
+
+rng = random.Random(7)
+
+@pytest.fixture(scope='module')
+def usage(django_db):
+    # Write out usage queued by earlier suites so it cannot land mid-test
+    get_accountant().flush()
+    users = [User.objects.get_or_create(username=f'bench-rollup-{n}')[0] for n in range(USAGE_USERS)]
+    model, _ = AIModel.objects.get_or_create(id='openai/gpt-4', defaults={
+        'name': 'GPT-4', 'provider': 'openrouter', 'input_price': 30, 'output_price': 60
+    })
+    now = timezone.now()
+    ModelUsage.objects.bulk_create(
+        usage_rows(users, [model], USAGE_ROWS, now - timedelta(days=USAGE_DAYS - 1), timedelta(days=USAGE_DAYS - 1), rng),
+        batch_size=5000
+    )
+    rollup_metrics()
+    return users, model
+
+@pytest.fixture
+def staff_client(usage):
+    admin, _ = User.objects.get_or_create(username='bench-rollup-admin', defaults={'is_staff': True})
+    client = Client()
+    client.force_login(admin)
+    return client
+
+def raw_daily_metrics():
+    start = timezone.localdate() - timedelta(days=30)
+    return list(
+        ModelUsage.objects.filter(created_at__date__gte=start).order_by()
+        .annotate(day=TruncDate('created_at')).values('day').annotate(
+            total_requests=Count('id'),
+            successful_requests=Count('id', filter=Q(success=True)),
+            total_tokens=Sum(F('input_tokens') + F('output_tokens')),
+            total_cost=Sum('total_cost'),
+            total_response_time=Sum('response_time'),
+            unique_users=Count('user', distinct=True)
+        ).order_by('-day')
+    )
+
+@pytest.mark.benchmark(group='metrics-dashboard')
+def test_dashboard_precomputed(benchmark, staff_client):
+    response = benchmark(staff_client.get, '/api/models/metrics/')
+    assert response.status_code == 200
+    assert response.json()['totals']['total_requests'] >= USAGE_ROWS
+
+@pytest.mark.benchmark(group='metrics-dashboard')
+def test_dashboard_raw_scan(benchmark, usage):
+    rows = benchmark(raw_daily_metrics)
+    assert sum(row['total_requests'] for row in rows) >= USAGE_ROWS
+
+@pytest.mark.benchmark(group='metrics-rollup')
+def test_incremental_rollup(benchmark, usage):
+    users, model = usage
+
+    def add_rows():
+        now = timezone.now()
+        ModelUsage.objects.bulk_create(
+            usage_rows(users, [model], INCREMENT_ROWS, now - timedelta(hours=2), timedelta(hours=2), rng)
+        )
+
+    processed = benchmark.pedantic(rollup_metrics, setup=add_rows, rounds=5, iterations=1)
+    assert processed == INCREMENT_ROWS
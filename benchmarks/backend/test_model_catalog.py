@@ -0,0 +1,69 @@
+"""
+Cached model catalog (gateway.catalog) behind /api/models/list/ and switch/.
+
+The engine is an in-process transport that answers /models after
+ENGINE_LATENCY seconds. Compares listing models from the catalog, with and
+without a matching ETag, against a synchronous engine call per request.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from alpha_mind import fastjson
+from alpha_mind.testing import FakeEngine, engine_models
+from gateway import views as gateway_views
+from gateway.catalog import ModelCatalog
+
+ENGINE_LATENCY = 0.05
+CATALOG_MODELS = 300
+
+@pytest.fixture
+def engine():
+    return FakeEngine(models=engine_models(CATALOG_MODELS), latency=ENGINE_LATENCY)
+
+@pytest.fixture
+def engine_client(engine):
+    client = engine.client()
+    yield client
+    client.close()
+
+@pytest.fixture
+def catalog(django_db, engine_client, monkeypatch):
+    catalog = ModelCatalog(client=engine_client, interval=3600)
+    assert catalog.refresh()
+    monkeypatch.setattr(gateway_views, 'get_catalog', lambda: catalog)
+    return catalog
+
+@pytest.fixture
+def client(django_db):
+    user, _ = User.objects.get_or_create(username='bench-catalog')
+    client = Client()
+    client.force_login(user)
+    return client
+
+@pytest.mark.benchmark(group='model-list')
+def test_list_from_catalog(benchmark, client, catalog):
+    response = benchmark(client.get, '/api/models/list/')
+    assert response.status_code == 200
+    assert len(response.json()['models']) == CATALOG_MODELS
+
+@pytest.mark.benchmark(group='model-list')
+def test_list_not_modified(benchmark, client, catalog):
+    etag = client.get('/api/models/list/')['ETag']
+    response = benchmark(client.get, '/api/models/list/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304 and response.content == b''
+
+@pytest.mark.benchmark(group='model-list')
+def test_list_engine_per_request(benchmark, engine_client):
+    """The previous view: one synchronous engine call per listing"""
+    models = benchmark(engine_client.get_models)
+    assert len(models) == CATALOG_MODELS
+
+@pytest.mark.benchmark(group='model-switch')
+def test_switch_from_catalog(benchmark, client, catalog, engine):
+    body = fastjson.dumps({'model_id': f'bench/model-{CATALOG_MODELS - 1}'})
+    calls = len(engine.requests)
+    response = benchmark(client.post, '/api/models/switch/', body, content_type='application/json')
+    assert response.status_code == 200
+    assert len(engine.requests) == calls  # Never waits on the engine
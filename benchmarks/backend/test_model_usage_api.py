@@ -0,0 +1,107 @@
+"""
+Model usage listing and time series (/api/models/usage/).
+
+Compares the old per-row Python loop over a heavy user's last 30 days with
+the paginated endpoint and its single aggregate query, and measures the
+time-series endpoint with the cache cold and warm.
+"""
+
+import random
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Avg
+from django.test import Client
+from django.utils import timezone
+
+from alpha_mind.testing import usage_rows
+from gateway.accounting import get_accountant
+from gateway.models import AIModel, ModelUsage
+
+HEAVY_USER_ROWS = 50000
+USAGE_DAYS = 30
+
+rng = random.Random(11)
+
+@pytest.fixture(scope='module')
+def user(django_db):
+    get_accountant().flush()
+    user, _ = User.objects.get_or_create(username='bench-usage-api')
+    models = [
+        AIModel.objects.get_or_create(id=model_id, defaults={
+            'name': model_id, 'provider': provider, 'input_price': 1, 'output_price': 2
+        })[0]
+        for model_id, provider in (
+            ('openai/gpt-4', 'openrouter'), ('anthropic/claude-3', 'openrouter'), ('gemini-pro', 'google')
+        )
+    ]
+    now = timezone.now()
+    span = timedelta(days=USAGE_DAYS - 1)
+    ModelUsage.objects.bulk_create(
+        usage_rows([user], models, HEAVY_USER_ROWS, now - span, span, rng), batch_size=5000
+    )
+    return user
+
+@pytest.fixture
+def client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+def python_loop_usage(user):
+    """The previous implementation: every row materialised and summed in Python"""
+    start_date = timezone.now().date() - timedelta(days=30)
+    usage_records = ModelUsage.objects.filter(
+        user=user, created_at__date__gte=start_date
+    ).select_related('model').order_by('-created_at')
+    usage_data = [{
+        'model': {'id': r.model.id, 'name': r.model.name, 'provider': r.model.provider},
+        'input_tokens': r.input_tokens,
+        'output_tokens': r.output_tokens,
+        'total_cost': float(r.total_cost),
+        'response_time': r.response_time,
+        'success': r.success,
+        'error_message': r.error_message,
+        'created_at': r.created_at.isoformat()
+    } for r in usage_records]
+    return {
+        'usage': usage_data,
+        'total_requests': usage_records.count(),
+        'successful_requests': usage_records.filter(success=True).count(),
+        'total_cost': sum(float(r.total_cost) for r in usage_records),
+        'avg_response_time': usage_records.aggregate(avg=Avg('response_time'))['avg']
+    }
+
+@pytest.mark.benchmark(group='model-usage')
+def test_python_loop(benchmark, user):
+    data = benchmark.pedantic(python_loop_usage, args=(user,), rounds=3, iterations=1)
+    assert data['total_requests'] == len(data['usage']) == HEAVY_USER_ROWS
+
+@pytest.mark.benchmark(group='model-usage')
+def test_paginated_listing(benchmark, client):
+    def fetch():
+        cache.clear()
+        return client.get('/api/models/usage/', {'limit': 50})
+
+    response = benchmark(fetch)
+    data = response.json()
+    assert response.status_code == 200
+    assert len(data['usage']) == 50 and data['has_more']
+    assert data['statistics']['total_requests'] == HEAVY_USER_ROWS
+
+@pytest.mark.benchmark(group='model-usage-series')
+def test_series_cold(benchmark, client):
+    def fetch():
+        cache.clear()
+        return client.get('/api/models/usage/series/', {'bucket': 'day', 'group_by': 'model'})
+
+    response = benchmark(fetch)
+    assert response.status_code == 200
+
+@pytest.mark.benchmark(group='model-usage-series')
+def test_series_cached(benchmark, client):
+    client.get('/api/models/usage/series/', {'bucket': 'day', 'group_by': 'model'})
+    response = benchmark(client.get, '/api/models/usage/series/', {'bucket': 'day', 'group_by': 'model'})
+    assert response.status_code == 200
@@ -0,0 +1,59 @@
+"""
+Budgeted and page-parallel PDF text extraction (files.pdf).
+
+Compares the previous extraction, which concatenated the text of every page
+and then kept the first CONTENT_LIMIT characters, with reading pages until
+the budget is met, and times whole-document extraction to disk in one
+process and in a process pool. Checks that the outputs match.
+"""
+
+import PyPDF2
+import pytest
+
+from alpha_mind.testing import build_pdf
+from files import pdf
+from files.analysis import CONTENT_LIMIT
+
+PAGES = 500
+
+def previous_extraction(pdf_file):
+    """The extraction before files.pdf: every page, quadratic concatenation"""
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    content = ""
+    for page in pdf_reader.pages:
+        content += page.extract_text() + "\n"
+    return content[:CONTENT_LIMIT]
+
+@pytest.fixture(scope='module')
+def document(tmp_path_factory):
+    path = tmp_path_factory.mktemp('pdf') / 'report.pdf'
+    path.write_bytes(build_pdf(PAGES))
+    return str(path)
+
+@pytest.mark.benchmark(group='pdf-budgeted')
+def test_previous_extraction(benchmark, document):
+    with open(document, 'rb') as pdf_file:
+        content = benchmark(previous_extraction, pdf_file)
+    assert len(content) == CONTENT_LIMIT
+
+@pytest.mark.benchmark(group='pdf-budgeted')
+def test_budgeted_extraction(benchmark, document):
+    with open(document, 'rb') as pdf_file:
+        content = benchmark(pdf.extract_text, pdf_file, CONTENT_LIMIT)
+        assert content == previous_extraction(pdf_file)
+
+@pytest.fixture(scope='module')
+def full_text(document, tmp_path_factory):
+    destination = tmp_path_factory.mktemp('pdf-text') / 'serial.txt'
+    pdf.extract_to_path(document, str(destination), workers=1)
+    return destination.read_text(encoding='utf-8')
+
+@pytest.mark.parametrize('workers', [1, 4])
+@pytest.mark.benchmark(group='pdf-full-document')
+def test_full_document(benchmark, document, full_text, tmp_path, workers):
+    destination = tmp_path / 'text.txt'
+    summary = benchmark.pedantic(
+        pdf.extract_to_path, (document, str(destination)), {'workers': workers}, rounds=3, iterations=1
+    )
+    assert summary == {'pages': PAGES, 'chars': len(full_text)}
+    assert destination.read_text(encoding='utf-8') == full_text
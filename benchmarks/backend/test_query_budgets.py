@@ -0,0 +1,34 @@
+"""
+Latency for every API endpoint.
+
+Seeds a user with realistic volumes (sessions, messages, files with
+analyses, usage history) and calls each endpoint through the test client,
+with the engine and Firebase replaced by in-process fakes. The query count
+of each call is recorded in extra_info; the budgets themselves are checked
+by ``alpha_mind.tests.test_query_budgets``.
+"""
+
+import pytest
+from django.test import Client
+from django.test.utils import override_settings
+
+from alpha_mind.testing import ENDPOINTS, STAFF_ENDPOINTS, call_endpoint, fake_services, seed_endpoint_data
+from gateway.accounting import get_accountant
+
+@pytest.fixture(scope='module')
+def seeded(django_db, tmp_path_factory):
+    get_accountant().flush()
+    with override_settings(MEDIA_ROOT=str(tmp_path_factory.mktemp('media'))), fake_services():
+        yield seed_endpoint_data()
+
+@pytest.mark.parametrize('name', ENDPOINTS)
+@pytest.mark.benchmark(group='endpoint-latency')
+def test_endpoint_latency(benchmark, seeded, name):
+    client = Client()
+    client.force_login(seeded['staff'] if name in STAFF_ENDPOINTS else seeded['user'])
+
+    # Warm up process-wide state (imports, the model catalog) before timing
+    call_endpoint(client, seeded, name)
+    response, queries = benchmark.pedantic(call_endpoint, args=(client, seeded, name), rounds=5, iterations=1)
+    assert response.status_code < 400
+    benchmark.extra_info['queries'] = len(queries)
@@ -0,0 +1,61 @@
+"""
+Daily quota enforcement (gateway.quotas).
+
+Compares checking a chat against the user's quotas from the in-memory
+counters with reading the limits and today's usage from the database on
+every chat.
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from gateway.accounting import get_accountant
+from gateway.models import ModelPreference
+from gateway.quotas import QuotaExceeded, QuotaTracker
+from users.models import UserSettings, UserUsage
+
+@pytest.fixture
+def quotas(django_db, monkeypatch):
+    # Apply usage queued by earlier suites before counters are loaded
+    get_accountant().flush()
+    tracker = QuotaTracker(interval=3600)
+    monkeypatch.setattr('gateway.quotas._tracker', tracker)
+    yield tracker
+    tracker.close()
+
+def make_user(name, max_chats=100, max_cost='10.00', **usage):
+    user, _ = User.objects.get_or_create(username=name)
+    UserSettings.objects.update_or_create(user=user, defaults={'max_chats_per_day': max_chats})
+    ModelPreference.objects.update_or_create(user=user, defaults={'max_cost_per_day': Decimal(max_cost)})
+    UserUsage.objects.filter(user=user).delete()
+    if usage:
+        UserUsage.objects.create(user=user, date=timezone.localdate(), **usage)
+    return user
+
+def database_check(user_id):
+    """Limits and today's usage read from the database on every chat"""
+    settings = UserSettings.objects.get(user_id=user_id)
+    preference = ModelPreference.objects.get(user_id=user_id)
+    usage = UserUsage.objects.filter(user_id=user_id, date=timezone.localdate()).first()
+    if usage is not None and (
+        usage.messages_sent >= settings.max_chats_per_day
+        or usage.cost_incurred >= preference.max_cost_per_day
+    ):
+        raise QuotaExceeded('messages', usage.messages_sent, settings.max_chats_per_day, 0)
+    return usage
+
+@pytest.mark.benchmark(group='quota-check')
+def test_check_in_memory(benchmark, quotas):
+    user = make_user('bench-quota-memory', messages_sent=10)
+    quotas.check(user.id)
+    used = benchmark(quotas.check, user.id)
+    assert used.messages == 10
+
+@pytest.mark.benchmark(group='quota-check')
+def test_check_database(benchmark, quotas):
+    user = make_user('bench-quota-database', messages_sent=10)
+    usage = benchmark(database_check, user.id)
+    assert usage.messages_sent == 10
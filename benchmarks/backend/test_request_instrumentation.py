@@ -0,0 +1,32 @@
+"""
+Per-request instrumentation (alpha_mind.instrumentation).
+
+Measures the middleware's overhead on a cheap endpoint.
+"""
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test.utils import override_settings
+
+from alpha_mind.testing import login
+
+WITHOUT_MIDDLEWARE = [m for m in settings.MIDDLEWARE if m != 'alpha_mind.instrumentation.PerformanceMiddleware']
+
+@pytest.fixture
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-instrumentation')
+    return user
+
+@pytest.mark.benchmark(group='instrumentation-overhead')
+def test_with_middleware(benchmark, user):
+    client = login(user)
+    response = benchmark(client.get, '/api/chat/sessions/')
+    assert 'Server-Timing' in response
+
+@pytest.mark.benchmark(group='instrumentation-overhead')
+def test_without_middleware(benchmark, user):
+    with override_settings(MIDDLEWARE=WITHOUT_MIDDLEWARE):
+        client = login(user)
+        response = benchmark(client.get, '/api/chat/sessions/')
+    assert 'Server-Timing' not in response
@@ -0,0 +1,58 @@
+"""
+Per-user response cache (alpha_mind.response_cache).
+
+Compares polling the session list, profile and model preferences from the
+response cache with rebuilding them from the database. The queries of one
+call are recorded in extra_info.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from alpha_mind import response_cache
+from chat.models import ChatSession
+from users.models import UserProfile, UserSettings
+
+SESSIONS = 50
+
+@pytest.fixture(scope='module')
+def poller(django_db):
+    user, _ = User.objects.get_or_create(username='bench-response-cache')
+    UserProfile.objects.get_or_create(user=user, defaults={'display_name': 'Poller'})
+    UserSettings.objects.get_or_create(user=user)
+    if not user.chat_sessions.exists():
+        for n in range(SESSIONS):
+            ChatSession.objects.create(user=user, title=f'Session {n}')
+    return user
+
+@pytest.fixture
+def client(poller):
+    cache.clear()
+    response_cache.stats.reset()
+    client = Client()
+    client.force_login(poller)
+    return client
+
+@pytest.mark.parametrize('url', ['/api/chat/sessions/', '/api/auth/profile/', '/api/models/preferences/'])
+@pytest.mark.benchmark(group='response-cache')
+def test_cached_poll(benchmark, client, url):
+    client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    response = benchmark(client.get, url)
+    assert response.status_code == 200
+    benchmark.extra_info['queries'] = len(queries)
+
+@pytest.mark.parametrize('url', ['/api/chat/sessions/', '/api/auth/profile/', '/api/models/preferences/'])
+@pytest.mark.benchmark(group='response-cache')
+def test_uncached_poll(benchmark, client, url):
+    with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        response = benchmark(client.get, url)
+    assert response.status_code == 200
+    benchmark.extra_info['queries'] = len(queries)
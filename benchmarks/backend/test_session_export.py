@@ -0,0 +1,154 @@
+"""
+Streaming session export through /api/chat/export/.
+
+Exports EXPORT_SESSIONS sessions of MESSAGES_PER_SESSION messages in each
+format. Peak Python memory while consuming the stream is reported in
+extra_info as ``peak_kb``; it should stay flat as the message count grows.
+The ASGI benchmark runs the export through Django's ASGI handler, the
+production entry point, and checks that it is sent as it is read there too.
+"""
+
+import asyncio
+import gzip
+import io
+import time
+import tracemalloc
+import zipfile
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.db import transaction
+from django.test import Client
+
+from alpha_mind import fastjson
+from chat.importer import import_messages
+from chat.models import ChatSession
+
+EXPORT_SESSIONS = 20
+MESSAGES_PER_SESSION = 2500
+
+@pytest.fixture(scope='module')
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-export')
+    roles = ['user', 'assistant']
+    with transaction.atomic():
+        for n in range(EXPORT_SESSIONS):
+            session = ChatSession.objects.create(user=user, title=f"Session {n}", model='openai/gpt-4')
+            import_messages(session, (
+                {
+                    'role': roles[i % 2],
+                    'content': f"Message {i}: " + "lorem ipsum dolor sit amet " * 10,
+                    'model': 'openai/gpt-4',
+                    'token_count': 50
+                }
+                for i in range(MESSAGES_PER_SESSION)
+            ))
+    return user
+
+@pytest.fixture
+def client(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+def download(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+def report(benchmark, client, url):
+    benchmark.extra_info['messages'] = EXPORT_SESSIONS * MESSAGES_PER_SESSION
+    tracemalloc.start()
+    try:
+        response = client.get(url)
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        benchmark.extra_info['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info['size_kb'] = size // 1024
+
+@pytest.mark.benchmark(group='session-export')
+def test_export_ndjson(benchmark, client):
+    data = benchmark.pedantic(download, args=(client, '/api/chat/export/'), rounds=3, iterations=1)
+    report(benchmark, client, '/api/chat/export/')
+    lines = data.splitlines()
+    assert len(lines) == EXPORT_SESSIONS * (MESSAGES_PER_SESSION + 1)
+    assert fastjson.loads(lines[0])['type'] == 'session'
+
+@pytest.mark.benchmark(group='session-export')
+def test_export_ndjson_gzip(benchmark, client):
+    url = '/api/chat/export/?gzip=1'
+    data = benchmark.pedantic(download, args=(client, url), rounds=3, iterations=1)
+    report(benchmark, client, url)
+    assert len(gzip.decompress(data).splitlines()) == EXPORT_SESSIONS * (MESSAGES_PER_SESSION + 1)
+
+@pytest.mark.benchmark(group='session-export')
+def test_export_json_zip(benchmark, client):
+    url = '/api/chat/export/?format=json'
+    data = benchmark.pedantic(download, args=(client, url), rounds=3, iterations=1)
+    report(benchmark, client, url)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = archive.namelist()
+        assert len(names) == EXPORT_SESSIONS
+        session = fastjson.loads(archive.read(names[0]))
+    assert len(session['messages']) == MESSAGES_PER_SESSION
+
+@pytest.mark.benchmark(group='session-export')
+def test_export_markdown_zip(benchmark, client):
+    url = '/api/chat/export/?format=markdown'
+    data = benchmark.pedantic(download, args=(client, url), rounds=3, iterations=1)
+    report(benchmark, client, url)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        text = archive.read(archive.namelist()[0]).decode('utf-8')
+    assert text.startswith('# Session') and text.count('### ') == MESSAGES_PER_SESSION
+
+def asgi_download(client, path):
+    """GET through the ASGI handler, counting the body as it arrives.
+
+    Returns the body's size and lines and the seconds to its first chunk.
+    """
+    cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    body = {'size': 0, 'lines': 0, 'first_chunk': None}
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # The client never disconnects
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            assert message['status'] == 200
+        elif message.get('body'):
+            if body['first_chunk'] is None:
+                body['first_chunk'] = time.perf_counter() - started
+            body['size'] += len(message['body'])
+            body['lines'] += message['body'].count(b'\n')
+
+    started = time.perf_counter()
+    asyncio.run(ASGIHandler()(scope, receive, send))
+    return body
+
+@pytest.mark.benchmark(group='session-export')
+def test_export_ndjson_asgi(benchmark, client):
+    body = benchmark.pedantic(asgi_download, args=(client, '/api/chat/export/'), rounds=3, iterations=1)
+    assert body['lines'] == EXPORT_SESSIONS * (MESSAGES_PER_SESSION + 1)
+
+    tracemalloc.start()
+    try:
+        body = asgi_download(client, '/api/chat/export/')
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info['first_chunk_ms'] = round(body['first_chunk'] * 1000, 1)
+    benchmark.extra_info['peak_kb'] = peak // 1024
+    # A sync iterator would be collected into a list before the first chunk
+    assert peak < body['size'] / 4
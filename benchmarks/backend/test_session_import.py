@@ -0,0 +1,95 @@
+"""
+Bulk session import through /api/chat/save/.
+
+Compares the old per-row ``ChatMessage.objects.create`` loop with the
+streaming NDJSON and JSON array imports, which validate rows as they are read
+and insert them with batched ``bulk_create`` in one transaction. Rows per
+second are reported in extra_info.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from alpha_mind import fastjson
+from chat.models import ChatSession, ChatMessage
+
+IMPORT_ROWS = 10000
+PER_ROW_ROWS = 1000  # The per-row loop is too slow to run over every row
+
+@pytest.fixture
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-import')
+    return user
+
+@pytest.fixture(scope='module')
+def rows():
+    roles = ['user', 'assistant']
+    return [
+        {
+            'role': roles[i % 2],
+            'content': f"Message {i}: " + "lorem ipsum dolor sit amet " * 10,
+            'model': 'openai/gpt-4',
+            'token_count': 50
+        }
+        for i in range(IMPORT_ROWS)
+    ]
+
+def report(benchmark, count=IMPORT_ROWS):
+    benchmark.extra_info['rows'] = count
+    if benchmark.stats:  # None with --benchmark-disable
+        benchmark.extra_info['rows_per_second'] = count / benchmark.stats.stats.mean
+
+def check_session(session_id, count=IMPORT_ROWS):
+    session = ChatSession.objects.get(id=session_id)
+    assert session.message_count == count
+    assert session.total_tokens == count * 50
+    first, second = session.messages.order_by('created_at', 'id')[:2]
+    assert first.content.startswith('Message 0:') and second.content.startswith('Message 1:')
+
+@pytest.mark.benchmark(group='session-import')
+def test_per_row_create(benchmark, user, rows):
+    def run():
+        session = ChatSession.objects.create(user=user, title='Import', model='gpt-3.5-turbo')
+        for msg_data in rows[:PER_ROW_ROWS]:
+            ChatMessage.objects.create(
+                session=session,
+                role=msg_data['role'],
+                content=msg_data['content'],
+                model=msg_data.get('model', ''),
+                token_count=msg_data.get('token_count')
+            )
+        return session.id
+
+    session_id = benchmark.pedantic(run, rounds=1, iterations=1)
+    report(benchmark, PER_ROW_ROWS)
+    check_session(session_id, PER_ROW_ROWS)
+
+@pytest.mark.benchmark(group='session-import')
+def test_ndjson_import(benchmark, user, rows):
+    client = Client()
+    client.force_login(user)
+    body = b'\n'.join(fastjson.dumps(row) for row in rows)
+
+    response = benchmark.pedantic(
+        client.post, args=('/api/chat/save/?title=Import', body),
+        kwargs={'content_type': 'application/x-ndjson'}, rounds=3, iterations=1
+    )
+    report(benchmark)
+    assert response.status_code == 200
+    assert response.json()['imported'] == IMPORT_ROWS
+    check_session(response.json()['session_id'])
+
+@pytest.mark.benchmark(group='session-import')
+def test_json_array_import(benchmark, user, rows):
+    client = Client()
+    client.force_login(user)
+    body = fastjson.dumps(rows)
+
+    response = benchmark.pedantic(
+        client.post, args=('/api/chat/save/?title=Import', body),
+        kwargs={'content_type': 'application/json'}, rounds=3, iterations=1
+    )
+    report(benchmark)
+    assert response.status_code == 200
+    check_session(response.json()['session_id'])
@@ -0,0 +1,79 @@
+"""
+Chunked spreadsheet profiling (files.spreadsheet).
+
+Compares the previous extraction, which loaded the whole file with pandas
+to print its first 100 rows, with reading it in chunks and profiling every
+column, for time and peak traced memory.
+"""
+
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from alpha_mind.testing import Upload, make_frame, write_workbook
+from files import spreadsheet
+from files.analysis import CONTENT_LIMIT
+
+ROWS = 200000
+SHEET_ROWS = 20000
+CHUNK_ROWS = 10000
+
+@pytest.fixture(scope='module')
+def frame():
+    return make_frame(ROWS)
+
+@pytest.fixture(scope='module')
+def csv_path(frame, tmp_path_factory):
+    path = tmp_path_factory.mktemp('sheets') / 'orders.csv'
+    frame.to_csv(path, index=False)
+    return path
+
+@pytest.fixture(scope='module')
+def xlsx_path(tmp_path_factory):
+    return write_workbook(tmp_path_factory.mktemp('sheets') / 'orders.xlsx', SHEET_ROWS)
+
+def previous_extraction(excel_file):
+    """The extraction before files.spreadsheet: load everything, print 100 rows"""
+    if excel_file.name.endswith('.csv'):
+        df = pd.read_csv(excel_file)
+    else:
+        df = pd.read_excel(excel_file)
+    content = f"Excel file: {excel_file.name}\n"
+    content += f"Shape: {df.shape}\n"
+    content += f"Columns: {list(df.columns)}\n\n"
+    content += df.head(100).to_string()
+    return content[:CONTENT_LIMIT]
+
+def traced_peak(function, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.benchmark(group='spreadsheet-csv')
+def test_previous_csv(benchmark, csv_path):
+    benchmark.extra_info['peak_bytes'] = traced_peak(previous_extraction, Upload(csv_path))
+    benchmark(lambda: previous_extraction(Upload(csv_path)))
+
+@pytest.mark.benchmark(group='spreadsheet-csv')
+def test_chunked_csv(benchmark, csv_path):
+    benchmark.extra_info['peak_bytes'] = traced_peak(spreadsheet.summarize, Upload(csv_path), CONTENT_LIMIT, CHUNK_ROWS)
+    content = benchmark(lambda: spreadsheet.summarize(Upload(csv_path), CONTENT_LIMIT, CHUNK_ROWS))
+    assert content.startswith(f'Spreadsheet: {csv_path}')
+    assert f'Rows: {ROWS}, columns: 5' in content
+
+@pytest.mark.benchmark(group='spreadsheet-xlsx')
+def test_previous_xlsx(benchmark, xlsx_path):
+    benchmark.pedantic(lambda: previous_extraction(Upload(xlsx_path)), rounds=3, iterations=1)
+
+@pytest.mark.benchmark(group='spreadsheet-xlsx')
+def test_chunked_xlsx(benchmark, xlsx_path):
+    content = benchmark.pedantic(
+        lambda: spreadsheet.summarize(Upload(xlsx_path), CONTENT_LIMIT, CHUNK_ROWS), rounds=3, iterations=1
+    )
+    assert 'Sheets: 3' in content
+    # The previous extraction only ever saw the first sheet
+    assert 'Sheet: returns' in content
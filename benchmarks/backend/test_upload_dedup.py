@@ -0,0 +1,73 @@
+"""
+Content-addressed upload storage (files.blobs).
+
+Compares storing every upload under its own random path with storing its
+bytes once per SHA-256, for time and bytes on disk over repeated uploads
+of the same report.
+"""
+
+import hashlib
+import os
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from files import blobs
+from files.models import FileBlob, FileUpload
+
+REPORT = b'region,quarter,revenue\n' + b''.join(
+    b'region-%d,Q%d,%d\n' % (n % 7, n % 4 + 1, n * 37 % 1000) for n in range(200000)
+)
+UPLOADS = 20
+
+@pytest.fixture
+def media(django_db, tmp_path):
+    with override_settings(MEDIA_ROOT=str(tmp_path)):
+        yield tmp_path
+
+@pytest.fixture
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-upload-dedup')
+    return user
+
+def disk_usage(root):
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(root) for name in names
+    )
+
+def report_file(content=REPORT, name='q3-report.csv'):
+    return SimpleUploadedFile(name, content, content_type='text/csv')
+
+def upload_fields(uploaded_file):
+    return {'original_name': uploaded_file.name, 'file_type': 'excel', 'mime_type': 'text/csv'}
+
+def previous_upload(user, uploaded_file):
+    """Storage before files.blobs: a new copy under a random path per upload"""
+    return FileUpload.objects.create(
+        user=user, file=uploaded_file, file_size=uploaded_file.size, **upload_fields(uploaded_file)
+    )
+
+@pytest.mark.benchmark(group='upload-storage')
+def test_previous_storage(benchmark, media, user):
+    benchmark.pedantic(lambda: previous_upload(user, report_file()), rounds=UPLOADS, iterations=1)
+    benchmark.extra_info['disk_bytes'] = disk_usage(media)
+    uploads = FileUpload.objects.filter(user=user, blob__isnull=True)
+    assert disk_usage(media) == uploads.count() * len(REPORT)
+    uploads.delete()
+
+@pytest.mark.benchmark(group='upload-storage')
+def test_content_addressed_storage(benchmark, media, user):
+    def upload():
+        uploaded_file = report_file()
+        return blobs.create_upload(user, uploaded_file, **upload_fields(uploaded_file))
+
+    benchmark.pedantic(upload, rounds=UPLOADS, iterations=1)
+    benchmark.extra_info['disk_bytes'] = disk_usage(media)
+    assert disk_usage(media) == len(REPORT)
+    sha256 = hashlib.sha256(REPORT).hexdigest()
+    assert FileBlob.objects.get(pk=sha256).ref_count == FileUpload.objects.filter(blob_id=sha256).count()
+    FileUpload.objects.filter(blob_id=sha256).delete()
+    assert not FileBlob.objects.filter(pk=sha256).exists()
@@ -0,0 +1,75 @@
+"""
+Write-behind usage accounting (gateway.accounting).
+
+Compares the request-path cost of queueing a usage event with a synchronous
+read-modify-write of UserUsage plus a ModelUsage insert per chat, and
+measures flush throughput.
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils import timezone
+
+from alpha_mind.testing import usage_event
+from gateway.accounting import UsageAccountant, apply_events
+from gateway.models import AIModel, ModelUsage
+from users.models import UserUsage
+
+FLUSH_EVENTS = 10000
+
+@pytest.fixture
+def user(django_db):
+    user, _ = User.objects.get_or_create(username='bench-usage')
+    AIModel.objects.get_or_create(id='openai/gpt-4', defaults={
+        'name': 'GPT-4', 'provider': 'openrouter', 'input_price': 30, 'output_price': 60
+    })
+    return user
+
+@pytest.fixture
+def accountant(tmp_path):
+    # Long interval, so the benchmarks control when flushes happen
+    accountant = UsageAccountant(journal_dir=tmp_path, interval=3600)
+    yield accountant
+    accountant.close()
+
+def today_usage(user):
+    return UserUsage.objects.filter(user=user, date=timezone.localdate()).first()
+
+@pytest.mark.benchmark(group='usage-accounting')
+def test_write_behind_record(benchmark, user, accountant):
+    event = usage_event(user)
+    benchmark(accountant.record, event)
+
+@pytest.mark.benchmark(group='usage-accounting')
+def test_synchronous_read_modify_write(benchmark, user):
+    model = AIModel.objects.get(id='openai/gpt-4')
+
+    def record():
+        usage, _ = UserUsage.objects.get_or_create(user=user, date=timezone.localdate())
+        UserUsage.objects.filter(id=usage.id).update(
+            messages_sent=F('messages_sent') + 1,
+            tokens_used=F('tokens_used') + 1000,
+            cost_incurred=F('cost_incurred') + Decimal('0.036')
+        )
+        ModelUsage.objects.create(
+            user=user, model=model, input_tokens=800, output_tokens=200,
+            total_cost=Decimal('0.036'), response_time=1.2
+        )
+
+    benchmark(record)
+
+@pytest.mark.benchmark(group='usage-flush')
+def test_flush_batch(benchmark, user):
+    events = [usage_event(user) for _ in range(FLUSH_EVENTS)]
+    before = today_usage(user)
+    messages_before = before.messages_sent if before else 0
+
+    benchmark.pedantic(apply_events, args=(events,), rounds=1, iterations=1)
+    if benchmark.stats:  # None with --benchmark-disable
+        benchmark.extra_info['events_per_second'] = FLUSH_EVENTS / benchmark.stats.stats.mean
+
+    usage = today_usage(user)
+    assert usage.messages_sent == messages_before + FLUSH_EVENTS
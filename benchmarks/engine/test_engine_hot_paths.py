@@ -0,0 +1,127 @@
+"""
+Micro-benchmarks for the per-request hot paths of the AI engine
+"""
+
+import json
+import time
+
+import pytest
+
+from ai_engine.models import (
+    ChatRequest, ChatResponse, StreamChunk, ModelInfo, ModelProvider
+)
+from ai_engine.providers import build_chat_payload, parse_sse_line, SSE_DONE
+from ai_engine.services import AIModelService, StreamingService
+
+HISTORY_LENGTH = 50
+CATALOG_SIZE = 200
+
+def make_messages(count):
+    roles = ['user', 'assistant']
+    return [
+        {'role': roles[i % 2], 'content': f"Message {i}: " + "lorem ipsum dolor sit amet " * 20}
+        for i in range(count)
+    ]
+
+@pytest.fixture
+def chat_request_data():
+    return {
+        'messages': make_messages(HISTORY_LENGTH),
+        'model': 'openai/gpt-4',
+        'max_tokens': 1000,
+        'temperature': 0.7
+    }
+
+@pytest.fixture
+def chat_request(chat_request_data):
+    return ChatRequest(**chat_request_data)
+
+@pytest.fixture
+def chat_response_data():
+    return {
+        'id': 'chatcmpl-123',
+        'created': int(time.time()),
+        'model': 'openai/gpt-4',
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': "lorem ipsum dolor sit amet " * 80},
+            'finish_reason': 'stop'
+        }],
+        'usage': {'prompt_tokens': 1200, 'completion_tokens': 400, 'total_tokens': 1600}
+    }
+
+@pytest.fixture
+def chunk_data():
+    return {
+        'id': 'chatcmpl-123',
+        'created': int(time.time()),
+        'model': 'openai/gpt-4',
+        'choices': [{'index': 0, 'delta': {'content': 'Hello'}, 'finish_reason': None}]
+    }
+
+@pytest.fixture
+def model_service():
+    service = AIModelService()
+    for i in range(CATALOG_SIZE):
+        model = ModelInfo(
+            id=f"provider-{i % 5}/model-{i}",
+            name=f"Model {i}",
+            provider=ModelProvider.OPENROUTER if i % 2 else ModelProvider.LITELLM,
+            description="Benchmark model",
+            context_window=8192,
+            max_tokens=8192,
+            pricing={'input': 0.5, 'output': 1.5},
+            capabilities=['text-generation'],
+            is_local=not i % 2
+        )
+        service.models_cache[model.id] = model
+    return service
+
+# Models
+
+def test_chat_request_validation(benchmark, chat_request_data):
+    request = benchmark(lambda: ChatRequest(**chat_request_data))
+    assert len(request.messages) == HISTORY_LENGTH
+
+def test_chat_request_serialization(benchmark, chat_request):
+    data = benchmark(chat_request.dict)
+    assert data['model'] == 'openai/gpt-4'
+
+def test_chat_response_validation(benchmark, chat_response_data):
+    response = benchmark(lambda: ChatResponse(**chat_response_data))
+    assert response.usage.total_tokens == 1600
+
+def test_chat_response_serialization(benchmark, chat_response_data):
+    response = ChatResponse(**chat_response_data)
+    data = benchmark(lambda: json.dumps(response.dict()))
+    assert 'chatcmpl-123' in data
+
+def test_stream_chunk_validation(benchmark, chunk_data):
+    chunk = benchmark(lambda: StreamChunk(**chunk_data))
+    assert chunk.choices[0]['delta']['content'] == 'Hello'
+
+# Providers
+
+def test_build_chat_payload(benchmark, chat_request):
+    payload = benchmark(build_chat_payload, chat_request, chat_request.model, True)
+    assert len(payload['messages']) == HISTORY_LENGTH
+
+def test_parse_sse_line(benchmark, chunk_data):
+    line = f"data: {json.dumps(chunk_data)}\n".encode('utf-8')
+    chunk = benchmark(parse_sse_line, line, 'openai/gpt-4')
+    assert chunk.id == 'chatcmpl-123'
+
+def test_parse_sse_done_line(benchmark):
+    assert benchmark(parse_sse_line, b"data: [DONE]\n", 'openai/gpt-4') is SSE_DONE
+
+# Services
+
+def test_models_cache_lookup(benchmark, model_service):
+    model_id = f"provider-3/model-{CATALOG_SIZE - 2}"
+    model_info = benchmark(model_service.models_cache.get, model_id)
+    assert model_info.id == model_id
+
+def test_stream_frame_formatting(benchmark, chunk_data):
+    chunk = StreamChunk(**chunk_data)
+    frame = benchmark(StreamingService.format_frame, chunk)
+    assert frame.startswith(b'data: ') and frame.endswith(b'\n\n')
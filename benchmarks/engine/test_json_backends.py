@@ -0,0 +1,57 @@
+"""
+Compare the JSON backends on large chat histories and model catalogs
+"""
+
+import pytest
+
+from ai_engine.fastjson import BACKENDS
+from ai_engine.models import ChatRequest, ModelInfo, ModelProvider
+
+HISTORY_LENGTH = 2000
+CATALOG_SIZE = 300
+
+@pytest.fixture(scope='module')
+def chat_history():
+    roles = ['user', 'assistant']
+    return ChatRequest(
+        messages=[
+            {'role': roles[i % 2], 'content': f"Message {i}: " + "lorem ipsum dolor sit amet " * 20}
+            for i in range(HISTORY_LENGTH)
+        ],
+        model='openai/gpt-4'
+    ).model_dump(mode='json')
+
+@pytest.fixture(scope='module')
+def model_catalog():
+    return [
+        ModelInfo(
+            id=f"provider-{i % 5}/model-{i}",
+            name=f"Model {i}",
+            provider=ModelProvider.OPENROUTER,
+            description="A general purpose instruction-tuned model " * 4,
+            context_window=128000,
+            max_tokens=4096,
+            pricing={'input': 0.5, 'output': 1.5},
+            capabilities=['text-generation', 'function-calling', 'vision']
+        ).model_dump(mode='json')
+        for i in range(CATALOG_SIZE)
+    ]
+
+@pytest.mark.benchmark(group='engine-dumps-history')
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_dumps_chat_history(benchmark, backend, chat_history):
+    dumps, _ = BACKENDS[backend]
+    assert benchmark(dumps, chat_history)
+
+@pytest.mark.benchmark(group='engine-loads-history')
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_loads_chat_history(benchmark, backend, chat_history):
+    dumps, loads = BACKENDS[backend]
+    data = dumps(chat_history)
+    assert len(benchmark(loads, data)['messages']) == HISTORY_LENGTH
+
+@pytest.mark.benchmark(group='engine-dumps-catalog')
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_dumps_model_catalog(benchmark, backend, model_catalog):
+    dumps, _ = BACKENDS[backend]
+    assert benchmark(dumps, model_catalog)